@@ -0,0 +1,358 @@
+import itertools
+import math
+import multiprocessing
+import queue
+import threading
+import time
+from typing import Dict, List, Optional
+
+import state
+from erg_worker import ErgCommand
+from fastapi import HTTPException
+from models import Sensor
+from openant.devices.common import DeviceType
+from registry import registry
+from sessions import AntSession, Sample
+from shm_ring import SampleRing
+
+RING_CAPACITY = 16384
+CALL_TIMEOUT_SECONDS = 10.0
+READY_TIMEOUT_SECONDS = 20.0
+POLL_SECONDS = 0.005
+
+# The ANT process owns the nodes, discovery, device sessions, ERG workers and
+# the watchdog. Samples come back through a shared-memory ring; everything
+# else is a (request id, op, args) message on `commands`, answered on
+# `replies`, which also carries unsolicited events (sessions opened/closed,
+# ERG outcomes).
+
+
+def _child_main(ring_name: str, commands, replies, simulate: bool) -> None:
+    import erg_service
+    import node_manager
+    import sensor_service
+    from discovery import discovery
+    from known_devices import known_devices, reconnect_known, watchdog
+    from node_pool import pool
+
+    ring = SampleRing.attach(ring_name)
+    slots: Dict[str, int] = {}
+
+    def slot_for(name: str) -> int:
+        return slots.setdefault(name, len(slots))
+
+    class PublishingSession(AntSession):
+        # history, metrics and recording happen in the API process
+        def __init__(self, dev, sensor=None):
+            self.slot = slot_for(sensor.name)
+            super().__init__(dev, sensor)
+
+        def _store(self, now, power, cadence, heart_rate) -> None:
+            ring.write(self.slot, now, power, cadence, heart_rate)
+
+    def announce(session) -> None:
+        replies.put(("event", "opened", (session.slot, session.sensor.model_dump(), session.channel)))
+
+    def retire(session) -> None:
+        replies.put(("event", "closed", (session.sensor_name,)))
+
+    sensor_service.session_factory = PublishingSession
+    registry.on_connect(announce)
+    registry.on_release(retire)
+
+    def connect(name: str) -> dict:
+        result = sensor_service.connect_sensor(name)
+        session = result["session"]
+        return {"slot": session.slot, "sensor": session.sensor.model_dump(),
+                "channel": session.channel, "created": result["created"]}
+
+    def submit_erg(command_id: int, name: str, watts: Optional[int]) -> str:
+        session = sensor_service.get_session_by_identifier(name)
+        command = erg_service.submit_erg_target(session, watts)
+
+        def report():
+            command.wait()
+            replies.put(("event", "erg", (command_id, command.status, command.attempts,
+                                          command.error, command.ack_latency)))
+
+        threading.Thread(target=report, name=f"erg-report-{command_id}", daemon=True).start()
+        return command.status
+
+    def sim_stats() -> List[dict]:
+        return [pooled.node.stats() for pooled in pool.nodes if hasattr(pooled.node, "stats")]
+
+    handlers = {
+        "devices": lambda: [sensor.model_dump() for sensor in sensor_service.scan_sensors()],
+        "changes": sensor_service.sensor_changes,
+        "connect": connect,
+        "disconnect": lambda identifier: sensor_service.disconnect_sensor(identifier),
+        "close_all": sensor_service.close_all_sensors,
+        "nodes": pool.stats,
+        "rescan": node_manager.add_new_sticks,
+        "known": lambda: {"devices": [s.model_dump() for s in known_devices.sensors()],
+                          "watchdog": watchdog.stats()},
+        "forget": known_devices.forget,
+        "erg": submit_erg,
+        "erg_stats": erg_service.get_erg_stats,
+        "sim_stats": sim_stats,
+    }
+
+    if simulate:
+        node_manager.use_simulator()
+    discovery.start(node_manager.start_node())
+    reconnect_known()
+    watchdog.start()
+    replies.put(("event", "ready", ()))
+
+    while True:
+        message = commands.get()
+        if message is None:
+            break
+        request_id, op, args = message
+        try:
+            replies.put(("reply", request_id, True, handlers[op](*args)))
+        except HTTPException as exc:
+            replies.put(("reply", request_id, False, (exc.status_code, exc.detail)))
+        except Exception as exc:
+            replies.put(("reply", request_id, False, (500, f"{type(exc).__name__}: {exc}")))
+    watchdog.stop()
+    pool.stop()
+    ring.close()
+
+
+class ProxyDevice:
+    # stands in for the openant device living in the ANT process
+    def __init__(self, sensor: Sensor):
+        self.device_id = sensor.id
+        self.device_type = sensor.type
+        self.channel = None
+        self.on_device_data = None
+
+    def close_channel(self):
+        pass
+
+
+class ProxyTrainer(ProxyDevice):
+    def set_target_power(self, watts: int):
+        raise RuntimeError("Targets for trainers in the ANT process go through erg_service")
+
+
+class ProxySession(AntSession):
+    remote = True
+
+    def __init__(self, sensor: Sensor, slot: int, channel: Optional[int]):
+        trainer = sensor.type == DeviceType.FitnessEquipment.value
+        super().__init__(ProxyTrainer(sensor) if trainer else ProxyDevice(sensor), sensor)
+        self.slot = slot
+        self._channel = channel
+
+    @property
+    def channel(self) -> Optional[int]:
+        return self._channel
+
+
+class _Call:
+    __slots__ = ("done", "ok", "result")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.ok = False
+        self.result = None
+
+
+class AntProcessClient:
+    def __init__(self):
+        self.ring: Optional[SampleRing] = None
+        self.process = None
+        self.samples = 0
+        self.dropped = 0
+        self._commands = None
+        self._replies = None
+        self._ids = itertools.count(1)
+        self._calls: Dict[int, _Call] = {}
+        self._slots: Dict[int, ProxySession] = {}
+        self._erg: Dict[int, ErgCommand] = {}
+        self._erg_lock = threading.Lock()
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self._reader: Optional[threading.Thread] = None
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.is_alive()
+
+    def start(self, simulate: bool = False) -> None:
+        context = multiprocessing.get_context("spawn")
+        self.ring = SampleRing.create(RING_CAPACITY)
+        self._commands = context.Queue()
+        self._replies = context.Queue()
+        self.process = context.Process(
+            target=_child_main,
+            args=(self.ring.name, self._commands, self._replies, simulate),
+            name="ant-process",
+            daemon=True,
+        )
+        self.process.start()
+        threading.Thread(target=self._dispatch, name="ant-process-replies", daemon=True).start()
+        self._reader = threading.Thread(target=self._read_ring, name="ant-process-ring", daemon=True)
+        self._reader.start()
+        deadline = time.monotonic() + READY_TIMEOUT_SECONDS
+        while not self._ready.wait(0.1):
+            if not self.process.is_alive() or time.monotonic() > deadline:
+                self.stop()
+                raise RuntimeError("ANT process did not start")
+        print(f"[ant-process] started pid {self.process.pid}")
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._commands is not None:
+            self._commands.put(None)
+        if self.process is not None:
+            self.process.join(5)
+            if self.process.is_alive():
+                self.process.terminate()
+        if self._reader is not None:
+            self._reader.join()
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+
+    def call(self, op: str, *args):
+        if not self.alive:
+            raise HTTPException(status_code=503, detail="ANT process is not running")
+        request_id = next(self._ids)
+        pending = self._calls[request_id] = _Call()
+        self._commands.put((request_id, op, args))
+        try:
+            if not pending.done.wait(CALL_TIMEOUT_SECONDS):
+                raise HTTPException(status_code=504, detail=f"ANT process did not answer {op}")
+        finally:
+            self._calls.pop(request_id, None)
+        if not pending.ok:
+            status_code, detail = pending.result
+            raise HTTPException(status_code=status_code, detail=detail)
+        return pending.result
+
+    def _dispatch(self) -> None:
+        while not self._stop.is_set():
+            try:
+                message = self._replies.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                return
+            if message[0] == "reply":
+                _, request_id, ok, result = message
+                pending = self._calls.get(request_id)
+                if pending is not None:
+                    pending.ok, pending.result = ok, result
+                    pending.done.set()
+                continue
+            _, kind, payload = message
+            if kind == "opened":
+                self._open(*payload)
+            elif kind == "closed":
+                self._close(*payload)
+            elif kind == "erg":
+                self._erg_done(*payload)
+            elif kind == "ready":
+                self._ready.set()
+
+    def _open(self, slot: int, sensor: dict, channel: Optional[int]) -> ProxySession:
+        info = Sensor(**sensor)
+        session = self._slots.get(slot)
+        if session is None or state.sessions.get(info.name) is not session:
+            session = ProxySession(info, slot, channel)
+            self._slots[slot] = session
+            state.sessions[info.name] = session
+        session._channel = channel
+        return session
+
+    def _close(self, name: str) -> None:
+        session = state.sessions.get(name)
+        if isinstance(session, ProxySession):
+            del state.sessions[name]
+            # rows still in the ring for this slot must not reach a detached
+            # session (or the recorder through it)
+            if self._slots.get(session.slot) is session:
+                del self._slots[session.slot]
+
+    def _read_ring(self) -> None:
+        cursor = 0
+        while not self._stop.wait(POLL_SECONDS):
+            ring = self.ring
+            if ring is None:
+                return
+            rows, cursor, dropped = ring.read_new(cursor)
+            self.dropped += dropped
+            if not len(rows):
+                continue
+            self.samples += len(rows)
+            for t, power, cadence, heart_rate, slot in zip(
+                rows["t"].tolist(), rows["power"].tolist(), rows["cadence"].tolist(),
+                rows["heart_rate"].tolist(), rows["slot"].tolist(),
+            ):
+                session = self._slots.get(slot)
+                if session is None:
+                    continue
+                session._ingest(Sample(
+                    t,
+                    power=None if math.isnan(power) else int(power),
+                    cadence=None if math.isnan(cadence) else int(cadence),
+                    heart_rate=None if math.isnan(heart_rate) else int(heart_rate),
+                ))
+
+    def connect(self, name: str) -> dict:
+        result = self.call("connect", name)
+        session = self._open(result["slot"], result["sensor"], result["channel"])
+        return {"session": session, "sensor": session.sensor, "channel": result["channel"],
+                "created": result["created"]}
+
+    def submit_erg(self, session: ProxySession, watts: Optional[int]) -> ErgCommand:
+        command = ErgCommand(session.sensor_name, watts)
+        self._erg[command.id] = command
+        try:
+            status = self.call("erg", command.id, session.sensor_name, watts)
+        except HTTPException:
+            self._erg.pop(command.id, None)
+            raise
+        with self._erg_lock:
+            # a command that failed or was superseded at once can report back
+            # before this reply; its final status wins over "queued"
+            if not command.finished.is_set():
+                command.status = status
+        return command
+
+    def _erg_done(self, command_id: int, status: str, attempts: int, error, latency) -> None:
+        command = self._erg.pop(command_id, None)
+        if command is None:
+            return
+        with self._erg_lock:
+            command.status, command.attempts, command.error = status, attempts, error
+            if latency is not None:
+                # acked_at as seen here, so batch skew includes the IPC hop; the
+                # latency itself is the trainer's, measured in the ANT process
+                command.acked_at = time.monotonic()
+                command.sent_at = command.acked_at - latency
+            command.finished.set()
+
+    def stats(self) -> dict:
+        return {
+            "pid": self.process.pid if self.process else None,
+            "alive": self.alive,
+            "ring_capacity": self.ring.capacity if self.ring else None,
+            "ring_head": self.ring.head if self.ring else None,
+            "samples": self.samples,
+            "dropped": self.dropped,
+        }
+
+
+client: Optional[AntProcessClient] = None
+
+
+def start_client(simulate: bool = False) -> AntProcessClient:
+    global client
+    if client is None:
+        client = AntProcessClient()
+        client.start(simulate)
+    return client
@@ -1,13 +1,16 @@
-from typing import List
+import threading
+import time
 
-from erg_service import set_erg_mode
-from fastapi import FastAPI
+import startup
+import telemetry
+from fastapi import FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from models import Sensor
-from node_manager import start_node
-from sensor_service import (connect_sensor, get_all_sensor_data,
-                            get_sensor_data, scan_sensors)
+from fastapi.responses import PlainTextResponse
 
+# Only FastAPI and telemetry are imported up front, so the server listens and
+# answers /health quickly; the endpoints live in routes and are mounted once
+# their (much heavier) modules are loaded.
 app = FastAPI()
 app.add_middleware(
     CORSMiddleware,
@@ -17,41 +20,104 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# longest a request waits for the startup thread before being served anyway
+STARTUP_WAIT_SECONDS = 30.0
+
+_mount_lock = threading.Lock()
+_mounted = threading.Event()
+
+
+def mount_routes() -> None:
+    with _mount_lock:
+        if _mounted.is_set():
+            return
+        import routes
+
+        app.include_router(routes.router)
+        _mounted.set()
+
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    started = time.perf_counter()
+    if not startup.runner.ready.is_set() and request.url.path != "/health":
+        # requests that beat the startup thread are held until nodes are up,
+        # as they were when startup finished before the server listened
+        await run_in_threadpool(_before_first_request)
+    response = await call_next(request)
+    route = request.scope.get("route")
+    # label by route template so /sensors/{name}/data stays one series
+    path = getattr(route, "path", "unmatched")
+    if path != "/sensors/stream":
+        telemetry.HTTP_SECONDS.labels(request.method, path).observe(time.perf_counter() - started)
+    telemetry.HTTP_REQUESTS.labels(request.method, path, response.status_code).inc()
+    return response
+
+
+def _before_first_request() -> None:
+    startup.runner.wait(STARTUP_WAIT_SECONDS)
+    mount_routes()
+
+
+def _start_nodes() -> None:
+    import routes
+
+    routes.start_nodes()
+
+
+def _start_sensors() -> None:
+    import routes
+
+    routes.start_sensors()
+
+
+def _sync_catalog() -> None:
+    from ride_catalog import catalog
+
+    catalog.sync()
+
 
 @app.on_event("startup")
 def startup_event():
-    start_node()
+    # no ANT stick fails "nodes"; the catalog of earlier rides is still synced
+    startup.runner.run([
+        ("routes", mount_routes, ()),
+        ("nodes", _start_nodes, ("routes",)),
+        ("sensors", _start_sensors, ("nodes",)),
+        ("catalog", _sync_catalog, ()),
+    ])
+
+
+@app.on_event("shutdown")
+def shutdown_event():
+    if not _mounted.is_set():
+        return
+    import ant_process
+
+    if ant_process.client is not None:
+        ant_process.client.stop()
+
 
 @app.get("/health")
 def health():
-    return {"ok": True}
-
-@app.get("/sensors", response_model=List[Sensor])
-def list_sensors():
-    return scan_sensors(5.0)
+    return startup.runner.status()
 
 
-@app.post("/sensors/{sensor_name}/connect")
-def connect_sensor_endpoint(sensor_name: str):
-    result = connect_sensor(sensor_name)
-    sensor_info = result["sensor"]
-    return {
-        "status": "connected",
-        "sensor": sensor_info.pretty,
-        "channel": result["channel"],
-    }
+@app.get("/metrics")
+def metrics_endpoint():
+    return PlainTextResponse(telemetry.render(), media_type="text/plain; version=0.0.4")
 
 
-@app.get("/sensors/{sensor_name}/data")
-def get_sensor_data_endpoint(sensor_name: str):
-    return get_sensor_data(sensor_name)
+@app.post("/debug/profiler/start")
+def start_profiler_endpoint(interval_ms: float = 10.0):
+    return telemetry.profiler.start(interval_ms)
 
 
-@app.get("/sensors/data")
-def get_all_sensor_data_endpoint():
-    return get_all_sensor_data()
+@app.post("/debug/profiler/stop")
+def stop_profiler_endpoint():
+    return telemetry.profiler.stop()
 
 
-@app.post("/sensors/{sensor_identifier}/erg/{target_watts}")
-def set_erg_mode_endpoint(sensor_identifier: str, target_watts: int):
-    return set_erg_mode(sensor_identifier, target_watts)
+@app.get("/debug/profiler")
+def profiler_report_endpoint(limit: int = 500):
+    return PlainTextResponse(telemetry.profiler.folded(limit))
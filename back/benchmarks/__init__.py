@@ -0,0 +1 @@
+"""Benchmarks for the backend; run from back/ with `python -m benchmarks.<name>`."""
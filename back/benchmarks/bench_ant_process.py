@@ -0,0 +1,147 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+
+def _percentile(values, q: float):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def _ms(value):
+    return None if value is None else round(value * 1000, 3)
+
+
+def run_once(args) -> dict:
+    # one configuration per interpreter: node_manager and the pool are singletons
+    os.environ.update(
+        ICM_DATA_DIR=tempfile.mkdtemp(prefix="icm-bench-"),
+        ANT_SIM_HR=str(args.hr),
+        ANT_SIM_FE=str(args.fe),
+        ANT_SIM_RATE_HZ=str(args.rate),
+        ANT_SIM_CHANNELS=str(args.hr + args.fe + 1),
+    )
+    import ant_process
+    import node_manager
+    import state
+    from fastapi.testclient import TestClient
+
+    node_manager.use_simulator()
+    if args.mode == "process":
+        node_manager.use_ant_process()
+    from api import app
+    from node_pool import pool
+
+    def sim_stats():
+        if ant_process.client is not None:
+            return ant_process.client.call("sim_stats")
+        return [pooled.node.stats() for pooled in pool.nodes]
+
+    with TestClient(app) as client:
+        wanted = args.hr + args.fe
+        deadline = time.monotonic() + 10
+        sensors = []
+        while len(sensors) < wanted and time.monotonic() < deadline:
+            sensors = client.get("/sensors").json()
+            time.sleep(0.2)
+        for sensor in sensors:
+            client.post(f"/sensors/{sensor['name']}/connect")
+        names = [sensor["name"] for sensor in sensors]
+        time.sleep(args.warmup)
+
+        stop = threading.Event()
+        requests = []
+        ages = []
+
+        def load():
+            # history and metrics are the heaviest handlers the UI polls
+            i = 0
+            while not stop.is_set():
+                started = time.perf_counter()
+                if i % 3 == 0:
+                    client.get("/metrics")
+                else:
+                    client.get(f"/sensors/{names[i % len(names)]}/history", params={"window": 60})
+                requests.append(time.perf_counter() - started)
+                i += 1
+
+        def probe():
+            # how old a sample is when a reader in the API process first sees it
+            versions = {}
+            while not stop.is_set():
+                now = time.time()
+                for name, session in state.sessions.items():
+                    seen = versions.get(name)
+                    if session.version != seen and session.last_sample is not None:
+                        versions[name] = session.version
+                        if seen is not None:
+                            ages.append(now - session.last_sample.timestamp)
+                time.sleep(0.001)
+
+        threads = [threading.Thread(target=load, daemon=True) for _ in range(args.clients)]
+        threads.append(threading.Thread(target=probe, daemon=True))
+        for thread in threads:
+            thread.start()
+        time.sleep(args.duration)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        nodes = sim_stats()
+
+    lags_p50 = [node["lag_p50_ms"] for node in nodes if node["lag_p50_ms"] is not None]
+    lags_p99 = [node["lag_p99_ms"] for node in nodes if node["lag_p99_ms"] is not None]
+    return {
+        "mode": args.mode,
+        "clients": args.clients,
+        "devices": len(names),
+        "requests": len(requests),
+        "request_p50_ms": _ms(_percentile(requests, 0.5)),
+        "callback_lag_p50_ms": max(lags_p50) if lags_p50 else None,
+        "callback_lag_p99_ms": max(lags_p99) if lags_p99 else None,
+        "callback_lag_max_ms": max(node["max_lag_ms"] for node in nodes),
+        "sample_age_p50_ms": _ms(_percentile(ages, 0.5)),
+        "sample_age_p99_ms": _ms(_percentile(ages, 0.99)),
+        "samples_seen": len(ages),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="ANT callback jitter with the node in-process vs in a separate process"
+    )
+    parser.add_argument("--hr", type=int, default=3)
+    parser.add_argument("--fe", type=int, default=3)
+    parser.add_argument("--rate", type=float, default=8.0, help="pages per second per device")
+    parser.add_argument("--clients", type=int, default=8, help="request threads for the loaded runs")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--mode", choices=("inprocess", "process"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode is not None:
+        print(json.dumps(run_once(args)))
+        return
+
+    results = []
+    for mode in ("inprocess", "process"):
+        for clients in (0, args.clients):
+            command = [
+                sys.executable, "-m", "benchmarks.bench_ant_process", "--mode", mode,
+                "--hr", str(args.hr), "--fe", str(args.fe), "--rate", str(args.rate),
+                "--clients", str(clients), "--duration", str(args.duration),
+                "--warmup", str(args.warmup),
+            ]
+            output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+            results.append(json.loads(output.strip().splitlines()[-1]))
+    print(json.dumps({"runs": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
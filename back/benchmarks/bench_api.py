@@ -0,0 +1,287 @@
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import platform
+import random
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+from typing import Dict, List
+
+
+def _percentile(values: List[float], q: float):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def _ms(value):
+    return None if value is None else round(value * 1000, 3)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+class StubTrainer:
+    # acknowledges every target immediately, the way ErgCommandWorker checks for it
+    def __init__(self, sensor):
+        from openant.devices.fitness_equipment import ResistenceMode
+
+        self.device_id = sensor.id
+        self.device_type = sensor.type
+        self.channel = None
+        self.on_device_data = None
+        self._mode = ResistenceMode.TargetPower
+        self.data = {"fe": SimpleNamespace(resistance_mode=None, resistance=0)}
+
+    def set_target_power(self, watts: int):
+        fe = self.data["fe"]
+        fe.resistance, fe.resistance_mode = watts, self._mode
+
+    def close_channel(self):
+        pass
+
+
+class Feeder:
+    # pushes synthetic pages through AntSession._on_data and remembers when
+    # each version was injected, keyed by the (serial, version) the ETag carries
+    def __init__(self, sessions: list, rate_hz: float):
+        self.sessions = sessions
+        self.period = 1.0 / rate_hz
+        self.injected: Dict[tuple, float] = {}
+        self.pages = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="bench-feeder", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        from openant.devices.heart_rate import HeartRateData
+        from openant.devices.power_meter import PowerData
+
+        # stagger sensors across the period like independent devices
+        due = [time.monotonic() + i * self.period / len(self.sessions) for i in range(len(self.sessions))]
+        while not self._stop.is_set():
+            index = min(range(len(due)), key=due.__getitem__)
+            delay = due[index] - time.monotonic()
+            if delay > 0 and self._stop.wait(delay):
+                return
+            due[index] += self.period
+            session = self.sessions[index]
+            if isinstance(session.dev, StubTrainer):
+                page = PowerData(instantaneous_power=random.randint(150, 250), cadence=90)
+                name = "standard_power"
+            else:
+                page = HeartRateData(heart_rate=random.randint(110, 160))
+                name = "heart_rate"
+            injected_at = time.time()
+            session._on_data(session.dev, name, page)
+            self.injected[(session.serial, session.version)] = injected_at
+            self.pages += 1
+
+
+def _client_worker(port: int, paths: List[str], method: str, revalidate: bool, stop_at: float, results) -> None:
+    connection = http.client.HTTPConnection("127.0.0.1", port)
+    etags: Dict[str, str] = {}
+    latencies, ages, errors, not_modified = [], [], 0, 0
+    i = random.randrange(len(paths))
+    while time.time() < stop_at:
+        path = paths[i % len(paths)]
+        i += 1
+        headers = {"If-None-Match": etags[path]} if revalidate and path in etags else {}
+        started = time.perf_counter()
+        try:
+            connection.request(method, path, headers=headers)
+            response = connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            connection.close()
+            connection = http.client.HTTPConnection("127.0.0.1", port)
+            continue
+        received_at = time.time()
+        latencies.append(time.perf_counter() - started)
+        if response.status == 304:
+            not_modified += 1
+        elif response.status >= 400:
+            errors += 1
+        etag = response.getheader("ETag")
+        if etag:
+            etags[path] = etag
+            ages.append((etag, received_at))
+    connection.close()
+    results.put((latencies, ages, errors, not_modified))
+
+
+def _client_process(port: int, paths: List[str], method: str, clients: int, revalidate: bool,
+                    stop_at: float, out) -> None:
+    # clients run outside the server process so they do not compete for its GIL
+    import queue
+
+    results: "queue.Queue" = queue.Queue()
+    threads = [
+        threading.Thread(target=_client_worker, args=(port, paths, method, revalidate, stop_at, results))
+        for _ in range(clients)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    latencies, ages, errors, not_modified = [], [], 0, 0
+    while not results.empty():
+        worker_latencies, worker_ages, worker_errors, worker_not_modified = results.get()
+        latencies += worker_latencies
+        ages += worker_ages
+        errors += worker_errors
+        not_modified += worker_not_modified
+    out.put((latencies, ages, errors, not_modified))
+
+
+def _data_ages(feeder: Feeder, ages: list, boot: str) -> List[float]:
+    # ETag '"<boot>-<serial>-<version>"' -> time since that version was injected
+    values = []
+    for etag, received_at in ages:
+        parts = etag.strip('"').split("-")
+        if len(parts) != 3 or parts[0] != boot:
+            continue
+        injected_at = feeder.injected.get((int(parts[1]), int(parts[2])))
+        if injected_at is not None:
+            values.append(received_at - injected_at)
+    return values
+
+
+def run(args) -> dict:
+    os.environ.setdefault("ICM_DATA_DIR", tempfile.mkdtemp(prefix="icm-bench-"))
+    import state
+    import uvicorn
+    from api import app
+    from models import Sensor
+    from replay import ReplayDevice
+    from sensor_service import _BOOT
+    from sessions import AntSession
+
+    sessions = []
+    for i in range(args.hr):
+        sensor = Sensor(name=f"HeartRate_1_{1000 + i}", id=1000 + i, type=120, trans=1, pretty=f"HeartRate:{1000 + i}")
+        sessions.append(AntSession(ReplayDevice(sensor), sensor))
+    for i in range(args.fe):
+        sensor = Sensor(name=f"FitnessEquipment_5_{2000 + i}", id=2000 + i, type=17, trans=5,
+                        pretty=f"FitnessEquipment:{2000 + i}")
+        sessions.append(AntSession(StubTrainer(sensor), sensor))
+    for session in sessions:
+        state.sessions[session.sensor_name] = session
+
+    # lifespan off: the startup hook would open real (or simulated) ANT nodes
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="off"))
+    threading.Thread(target=server.run, name="bench-uvicorn", daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+
+    feeder = Feeder(sessions, args.rate)
+    feeder.start()
+    time.sleep(1.0)
+
+    trainers = [s.sensor_name for s in sessions if isinstance(s.dev, StubTrainer)]
+    scenarios = {
+        "all_data": ("GET", ["/sensors/data"]),
+        "sensor_data": ("GET", [f"/sensors/{s.sensor_name}/data" for s in sessions]),
+        "erg": ("POST", [f"/sensors/{name}/erg/{watts}" for name in trainers for watts in (180, 200, 220)]),
+    }
+    context = multiprocessing.get_context("spawn")
+    runs = []
+    for scenario in args.scenarios:
+        method, paths = scenarios[scenario]
+        if not paths:
+            continue
+        for clients in args.clients:
+            out = context.Queue()
+            stop_at = time.time() + args.duration
+            process = context.Process(
+                target=_client_process,
+                args=(port, paths, method, clients, args.revalidate, stop_at, out),
+            )
+            process.start()
+            latencies, ages, errors, not_modified = out.get()
+            process.join()
+            data_ages = _data_ages(feeder, ages, _BOOT)
+            runs.append({
+                "scenario": scenario,
+                "clients": clients,
+                "requests": len(latencies),
+                "throughput_rps": round(len(latencies) / args.duration, 1),
+                "p50_ms": _ms(_percentile(latencies, 0.5)),
+                "p99_ms": _ms(_percentile(latencies, 0.99)),
+                "max_ms": _ms(max(latencies) if latencies else None),
+                "errors": errors,
+                "not_modified": not_modified,
+                "data_age_p50_ms": _ms(_percentile(data_ages, 0.5)),
+                "data_age_p99_ms": _ms(_percentile(data_ages, 0.99)),
+            })
+
+    feeder.stop()
+    server.should_exit = True
+    return {
+        "benchmark": "api",
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "started_at": round(time.time()),
+        "config": {
+            "hr": args.hr,
+            "fe": args.fe,
+            "rate_hz": args.rate,
+            "duration_s": args.duration,
+            "revalidate": args.revalidate,
+        },
+        "pages_injected": feeder.pages,
+        "runs": runs,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="HTTP load benchmark for the backend API with stubbed sensors")
+    parser.add_argument("--hr", type=int, default=4)
+    parser.add_argument("--fe", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=4.0, help="pages per second per sensor")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 32], help="concurrent clients per run")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per run")
+    parser.add_argument(
+        "--scenarios", nargs="+", choices=("all_data", "sensor_data", "erg"),
+        default=["all_data", "sensor_data", "erg"],
+    )
+    parser.add_argument("--revalidate", action="store_true", help="send If-None-Match like a polling client")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args()
+    report = run(args)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as handle:
+            handle.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
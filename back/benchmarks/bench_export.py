@@ -0,0 +1,98 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+
+def write_ride(directory: Path, ride_id: str, hours: float, rate: float) -> int:
+    # a trainer and a heart rate strap at `rate` pages per second each, on a
+    # workout with a new step every five minutes, written the way
+    # RideRecorder lays out rows
+    import numpy as np
+    from recorder import FORMAT_VERSION, HEADER, MAGIC, RECORD_DTYPE
+
+    count = int(hours * 3600 * rate)
+    rng = np.random.default_rng(7)
+    started = time.time() - hours * 3600
+    rows = np.zeros(2 * count, dtype=RECORD_DTYPE)
+    t = started + np.arange(count) / rate
+    lap = (np.arange(count) / rate // 300).astype(np.int16)
+    target = 150 + 25 * (lap % 4)
+    for sensor, offset in ((0, 0.0), (1, 0.013)):
+        part = rows[sensor::2]
+        part["t"] = t + offset
+        part["sensor"] = sensor
+        part["lap"] = lap
+        part["target"] = target
+        part["power"] = np.nan
+        part["cadence"] = np.nan
+        part["heart_rate"] = np.nan
+    rows["power"][0::2] = target + rng.normal(0, 12, count)
+    rows["cadence"][0::2] = rng.normal(90, 3, count)
+    rows["heart_rate"][1::2] = 120 + lap % 4 * 8 + rng.normal(0, 2, count)
+
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / f"{ride_id}.ride", "wb") as handle:
+        handle.write(HEADER.pack(MAGIC, FORMAT_VERSION, RECORD_DTYPE.itemsize))
+        handle.write(rows.tobytes())
+    meta = {
+        "id": ride_id,
+        "started_at": None,
+        "ended_at": None,
+        "sensors": [{"index": 0, "name": "FitnessEquipment_5_2000"}, {"index": 1, "name": "HeartRate_1_1000"}],
+        "samples": len(rows),
+    }
+    (directory / f"{ride_id}.json").write_text(json.dumps(meta))
+    return len(rows)
+
+
+def measure(ride_id: str, file_format: str, directory: Path) -> dict:
+    from exporters import EXPORTERS, RideTimeline
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    first_chunk = None
+    size = chunks = 0
+    for chunk in EXPORTERS[file_format](RideTimeline(ride_id, directory)):
+        if first_chunk is None:
+            first_chunk = time.perf_counter() - started
+        size += len(chunk)
+        chunks += 1
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "format": file_format,
+        "seconds": round(elapsed, 3),
+        "first_chunk_ms": round(first_chunk * 1000, 1),
+        "bytes": size,
+        "chunks": chunks,
+        "peak_memory_kb": round(peak / 1024, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Ride export time and peak memory against ride length")
+    parser.add_argument("--hours", type=float, nargs="+", default=[0.5, 1, 2, 4, 8])
+    parser.add_argument("--rate", type=float, default=4.0, help="pages per second per sensor")
+    parser.add_argument("--formats", nargs="+", choices=("fit", "tcx", "csv"), default=["fit", "tcx", "csv"])
+    args = parser.parse_args()
+
+    os.environ.setdefault("ICM_DATA_DIR", tempfile.mkdtemp(prefix="icm-bench-"))
+    directory = Path(tempfile.mkdtemp(prefix="icm-export-"))
+    runs = []
+    for hours in args.hours:
+        ride_id = f"bench-{hours:g}h"
+        rows = write_ride(directory, ride_id, hours, args.rate)
+        file_size = (directory / f"{ride_id}.ride").stat().st_size
+        for file_format in args.formats:
+            runs.append({"hours": hours, "rows": rows, "ride_kb": round(file_size / 1024, 1),
+                         **measure(ride_id, file_format, directory)})
+    print(json.dumps({"rate_hz": args.rate, "runs": runs}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
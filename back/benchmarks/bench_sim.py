@@ -0,0 +1,112 @@
+import argparse
+import json
+import statistics
+import threading
+import time
+
+import state
+from erg_worker import ErgCommandWorker
+from models import Sensor
+from openant.devices.fitness_equipment import FitnessEquipment
+from openant.devices.heart_rate import HeartRate
+from sensor_service import get_all_sensor_data
+from sessions import AntSession
+from sim_node import SimFitnessEquipment, SimHeartRate, SimulatedNode
+
+
+def run(args) -> dict:
+    devices = []
+    for i in range(args.hr):
+        devices.append(SimHeartRate(1000 + i, args.rate))
+    for i in range(args.fe):
+        devices.append(SimFitnessEquipment(2000 + i, args.rate))
+    node = SimulatedNode(
+        devices,
+        ack_delay=args.ack_delay_ms / 1000,
+        ack_failure_rate=args.ack_failure,
+        max_channels=len(devices),
+    )
+    threading.Thread(target=node.start, daemon=True).start()
+    started_at = time.monotonic()
+
+    sessions = []
+    for device in devices:
+        if isinstance(device, SimHeartRate):
+            dev = HeartRate(node, device_id=device.device_id)
+            sensor = Sensor(name=f"HeartRate_1_{device.device_id}", id=device.device_id, type=120, trans=1,
+                            pretty=f"HeartRate:{device.device_id}")
+        else:
+            dev = FitnessEquipment(node, device_id=device.device_id, trans_type=5)
+            sensor = Sensor(name=f"FitnessEquipment_5_{device.device_id}", id=device.device_id, type=17, trans=5,
+                            pretty=f"FitnessEquipment:{device.device_id}")
+        session = AntSession(dev, sensor)
+        # registered like a connected sensor so the read path below sees it
+        state.sessions[session.sensor_name] = session
+        sessions.append(session)
+
+    # callback -> API read path while the node is streaming
+    read_latencies = []
+    read_sensors = 0
+    deadline = time.monotonic() + args.duration
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        data = get_all_sensor_data()
+        read_latencies.append(time.perf_counter() - started)
+        read_sensors = max(read_sensors, len(data["data"]))
+        time.sleep(0.01)
+
+    # ERG round trips with injected delays and failures
+    ack_latencies = []
+    statuses = {}
+    trainers = [s for s in sessions if hasattr(s.dev, "set_target_power")]
+    for session in trainers:
+        worker = ErgCommandWorker(f"trainer-{session.dev.device_id}", session.dev)
+        for target in range(150, 150 + 10 * args.erg_commands, 10):
+            command = worker.submit(target)
+            while command.status in ("queued", "sending"):
+                time.sleep(0.005)
+            statuses[command.status] = statuses.get(command.status, 0) + 1
+            if command.ack_latency is not None:
+                ack_latencies.append(command.ack_latency)
+        worker.stop()
+
+    node.stop()
+    for session in sessions:
+        state.sessions.pop(session.sensor_name, None)
+    elapsed = time.monotonic() - started_at
+    stats = node.stats()
+    return {
+        "devices": len(devices),
+        "rate_hz": args.rate,
+        "duration_s": args.duration,
+        "pages_per_s": round(stats["pages_sent"] / elapsed, 1),
+        "callback_us_per_page": round(
+            stats["callback_seconds"] / max(stats["pages_sent"], 1) * 1e6, 2
+        ),
+        "max_dispatch_lag_ms": stats["max_lag_ms"],
+        "read_p50_us": round(statistics.median(read_latencies) * 1e6, 2),
+        "read_max_us": round(max(read_latencies) * 1e6, 2),
+        "read_sensors": read_sensors,
+        "erg_statuses": statuses,
+        "erg_ack_p50_ms": round(statistics.median(ack_latencies) * 1000, 2)
+        if ack_latencies
+        else None,
+        "erg_acks_failed": stats["acks_failed"],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Simulated ANT node benchmark")
+    parser.add_argument("--hr", type=int, default=4)
+    parser.add_argument("--fe", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=4.0, help="pages per second per device")
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--erg-commands", type=int, default=5)
+    parser.add_argument("--ack-delay-ms", type=float, default=0.0)
+    parser.add_argument("--ack-failure", type=float, default=0.0)
+    args = parser.parse_args()
+    print(json.dumps(run(args), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import argparse
+import http.client
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Optional
+
+BACK_DIR = Path(__file__).resolve().parent.parent
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _median(values: List[float]) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def _ms(value: Optional[float]):
+    return None if value is None else round(value * 1000, 1)
+
+
+def _health(port: int) -> Optional[dict]:
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+    try:
+        connection.request("GET", "/health")
+        response = connection.getresponse()
+        body = response.read()
+        if response.status != 200:
+            return None
+        return json.loads(body)
+    except (OSError, http.client.HTTPException, ValueError):
+        return None
+    finally:
+        connection.close()
+
+
+def import_times(module: str, runs: int) -> dict:
+    # fresh interpreter per run; the top self-time entries of -X importtime
+    # from the last run show where the time goes
+    totals = []
+    report = ""
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=BACK_DIR, capture_output=True, text=True, check=True,
+        )
+        totals.append(time.perf_counter() - started)
+        report = result.stderr
+    modules = {}
+    for line in report.splitlines():
+        match = re.match(r"import time:\s+(\d+) \|\s+(\d+) \|(\s+)(\S+)", line)
+        if match and len(match.group(3)) <= 3:
+            modules[match.group(4)] = int(match.group(2)) / 1000
+    top = sorted(modules.items(), key=lambda item: item[1], reverse=True)[:10]
+    return {
+        "module": module,
+        "interpreter_plus_import_ms": _ms(_median(totals)),
+        "top_level_imports_ms": {name: round(ms, 1) for name, ms in top},
+    }
+
+
+def cold_start(timeout: float, env: dict) -> dict:
+    # time from spawning main_desktop.py to the first /health answer and to
+    # the backend reporting ready (simulated ANT nodes)
+    port = _free_port()
+    env = {**os.environ, **env, "APP_PORT": str(port)}
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "main_desktop.py"], cwd=BACK_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    first_answer = ready_at = None
+    health = None
+    try:
+        while time.perf_counter() - started < timeout:
+            health = _health(port)
+            now = time.perf_counter() - started
+            if health is not None:
+                if first_answer is None:
+                    first_answer = now
+                # older backends answer {"ok": true} only once fully started
+                if health.get("ready", True):
+                    ready_at = now
+                    break
+            time.sleep(0.01)
+    finally:
+        process.terminate()
+        process.wait(10)
+    return {
+        "first_health_ms": _ms(first_answer),
+        "ready_ms": _ms(ready_at),
+        "phases": (health or {}).get("phases"),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Backend import time and cold start to /health")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--process", action="store_true", help="run ANT nodes in a separate process (ANT_PROCESS)")
+    args = parser.parse_args()
+
+    env = {
+        "ANT_SIMULATOR": "1",
+        "ICM_DATA_DIR": tempfile.mkdtemp(prefix="icm-bench-"),
+    }
+    if args.process:
+        env["ANT_PROCESS"] = "1"
+    starts = [cold_start(args.timeout, env) for _ in range(args.runs)]
+    first = [run["first_health_ms"] for run in starts if run["first_health_ms"] is not None]
+    ready = [run["ready_ms"] for run in starts if run["ready_ms"] is not None]
+    report = {
+        "python": sys.version.split()[0],
+        "imports": [import_times(module, args.runs) for module in ("main_desktop", "api")],
+        "cold_start": {
+            "runs": args.runs,
+            "ant_process": args.process,
+            "first_health_ms_median": _median(first),
+            "ready_ms_median": _median(ready),
+            "last_phases": starts[-1]["phases"],
+        },
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
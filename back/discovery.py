@@ -0,0 +1,144 @@
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import state
+from models import Sensor
+from openant.devices.common import DeviceType
+from openant.devices.scanner import Scanner
+
+# a device that has not broadcast for this long is considered gone
+DEVICE_TTL_SECONDS = 30.0
+# removals are remembered this long so incremental clients can see them
+TOMBSTONE_SECONDS = 600.0
+
+
+def _sensor_key(dev_type: int, trans: int, dev_id: int) -> str:
+    return f"{DeviceType(dev_type).name}_{trans}_{dev_id}"
+
+
+def _sensor_label(dev_type: int, dev_id: int) -> str:
+    return f"{DeviceType(dev_type).name}:{dev_id}"
+
+
+class _TrackingScanner(Scanner):
+    def __init__(self, node, on_seen: Callable[[int, int, int], None]):
+        self._on_seen = on_seen
+        super().__init__(node, device_id=0, device_type=0)
+
+    def _on_data(self, data):
+        # extended messages carry the transmitting device id; record every
+        # sighting so silent devices can be expired
+        if len(data) > 8:
+            self._on_seen(data[9] + (data[10] << 8), data[11], data[12])
+        super()._on_data(data)
+
+
+class _DeviceEntry:
+    __slots__ = ("sensor", "first_seen", "last_seen", "seq")
+
+    def __init__(self, sensor: Sensor, now: float, seq: int):
+        self.sensor = sensor
+        self.first_seen = now
+        self.last_seen = now
+        self.seq = seq
+
+    def to_dict(self, now: float) -> dict:
+        return {
+            **self.sensor.model_dump(),
+            "age": round(now - self.last_seen, 3),
+            "seen_for": round(now - self.first_seen, 3),
+        }
+
+
+class DiscoveryService:
+    def __init__(self, ttl: float = DEVICE_TTL_SECONDS):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._devices: Dict[str, _DeviceEntry] = {}
+        self._removed: Dict[str, tuple] = {}  # key -> (seq, removed_at)
+        self._seq = 0
+        self._floor = 0  # cursors older than this missed pruned removals
+        self._scanner: Optional[Scanner] = None
+
+    @property
+    def running(self) -> bool:
+        return self._scanner is not None
+
+    def start(self, ant_node) -> None:
+        with self._lock:
+            if self._scanner is not None:
+                return
+            self._scanner = _TrackingScanner(ant_node, self._on_seen)
+        print("[discovery] background scanner started")
+
+    def stop(self) -> None:
+        with self._lock:
+            scanner, self._scanner = self._scanner, None
+        if scanner is not None:
+            scanner.close_channel()
+
+    def _on_seen(self, dev_id: int, dev_type: int, dev_trans: int) -> None:
+        now = time.monotonic()
+        key = _sensor_key(dev_type, dev_trans, dev_id)
+        entry = self._devices.get(key)
+        if entry is not None:
+            entry.last_seen = now
+            return
+
+        sensor = Sensor(
+            name=key,
+            id=dev_id,
+            type=dev_type,
+            trans=dev_trans,
+            pretty=_sensor_label(dev_type, dev_id),
+        )
+        with self._lock:
+            if key in self._devices:
+                return
+            self._seq += 1
+            self._devices[key] = _DeviceEntry(sensor, now, self._seq)
+            self._removed.pop(key, None)
+            state.last_discovered[key] = sensor
+        print(f"[discovery] found {sensor.pretty} → key={key}")
+
+    def _expire(self, now: float) -> None:
+        for key, entry in list(self._devices.items()):
+            if now - entry.last_seen <= self.ttl or state.sessions.by_id(entry.sensor.id) is not None:
+                continue
+            self._seq += 1
+            del self._devices[key]
+            self._removed[key] = (self._seq, now)
+            state.last_discovered.pop(key, None)
+            print(f"[discovery] lost {entry.sensor.pretty}")
+
+        for key, (seq, removed_at) in list(self._removed.items()):
+            if now - removed_at > TOMBSTONE_SECONDS:
+                del self._removed[key]
+                self._floor = max(self._floor, seq)
+
+    def devices(self) -> List[Sensor]:
+        with self._lock:
+            self._expire(time.monotonic())
+            return [entry.sensor for entry in self._devices.values()]
+
+    def changes(self, since: int = 0) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            reset = since < self._floor or since > self._seq
+            return {
+                "cursor": self._seq,
+                "reset": reset,
+                "changed": [
+                    entry.to_dict(now)
+                    for entry in self._devices.values()
+                    if reset or entry.seq > since
+                ],
+                "removed": []
+                if reset
+                else [key for key, (seq, _) in self._removed.items() if seq > since],
+            }
+
+
+discovery = DiscoveryService()
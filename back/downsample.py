@@ -0,0 +1,340 @@
+import math
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from fastapi import HTTPException
+from history import VALUE_FIELDS, ring_segments
+
+# bucket widths of the pre-aggregated tiers, each nesting in the next
+TIER_SECONDS = (1, 4, 16, 64, 256)
+TIER_CAPACITY = 4096
+DEFAULT_POINTS = 800
+MAX_POINTS = 10000
+# a source (raw samples or one tier) is used when it has at most this many
+# entries per requested point, so reducing it stays O(points)
+SOURCE_FACTOR = 4
+METHODS = ("minmax", "lttb")
+
+# rows of a tier's per-field block; times are offsets from the bucket start
+MEAN, MIN, T_MIN, MAX, T_MAX = range(5)
+
+
+class _OpenBucket:
+    # the bucket still being filled, as plain floats so an append stays cheap;
+    # per field: [count, sum, min, time of min, max, time of max]
+    __slots__ = ("key", "fields")
+
+    def __init__(self, key: int):
+        self.key = key
+        self.fields = [[0, 0.0, math.inf, 0.0, -math.inf, 0.0] for _ in VALUE_FIELDS]
+
+    def add(self, timestamp: float, values) -> None:
+        for stats, value in zip(self.fields, values):
+            if value is None or value != value:
+                continue
+            stats[0] += 1
+            stats[1] += value
+            if value < stats[2]:
+                stats[2], stats[3] = value, timestamp
+            if value > stats[4]:
+                stats[4], stats[5] = value, timestamp
+
+    def merge(self, other: "_OpenBucket") -> None:
+        for stats, theirs in zip(self.fields, other.fields):
+            if not theirs[0]:
+                continue
+            stats[0] += theirs[0]
+            stats[1] += theirs[1]
+            if theirs[2] < stats[2]:
+                stats[2], stats[3] = theirs[2], theirs[3]
+            if theirs[4] > stats[4]:
+                stats[4], stats[5] = theirs[4], theirs[5]
+
+
+def _summary(stats: list, base: float) -> tuple:
+    if not stats[0]:
+        return (math.nan,) * 5
+    return (stats[1] / stats[0], stats[2], stats[3] - base, stats[4], stats[5] - base)
+
+
+class _Tier:
+    def __init__(self, width: int, capacity: int):
+        self.width = width
+        self.capacity = capacity
+        self.key = np.zeros(capacity, dtype=np.int64)
+        # one row per bucket: fields x (MEAN, MIN, T_MIN, MAX, T_MAX)
+        self.rows = np.full((capacity, len(VALUE_FIELDS), 5), np.nan, dtype=np.float32)
+        self.written = 0
+        self.open: Optional[_OpenBucket] = None
+
+    def store(self, bucket: _OpenBucket) -> None:
+        # single writer; the counter is bumped last, as in SampleHistory
+        i = self.written % self.capacity
+        base = bucket.key * self.width
+        self.key[i] = bucket.key
+        self.rows[i] = [_summary(stats, base) for stats in bucket.fields]
+        self.written += 1
+
+    def oldest_start(self) -> Optional[float]:
+        if self.written == 0:
+            return None
+        return float(self.key[max(0, self.written - self.capacity) % self.capacity] * self.width)
+
+    def closed(self, lo_key: int, hi_key: int, field: str) -> Tuple[np.ndarray, np.ndarray]:
+        # stored buckets with lo_key <= key <= hi_key, copied out of the ring
+        # as keys and a (5, buckets) block for one field
+        stop = self.written
+        start = max(0, stop - self.capacity)
+        index = VALUE_FIELDS.index(field)
+        keys, blocks = [], []
+        for lo, hi in ring_segments(start, stop, self.capacity):
+            segment = self.key[lo:hi]
+            first = lo + int(np.searchsorted(segment, lo_key, side="left"))
+            last = lo + int(np.searchsorted(segment, hi_key, side="right"))
+            if first < last:
+                keys.append(self.key[first:last])
+                blocks.append(self.rows[first:last, index])
+        if not keys:
+            return np.zeros(0, dtype=np.int64), np.zeros((5, 0))
+        return np.concatenate(keys), np.concatenate(blocks).T.astype(np.float64)
+
+
+class ChartTiers:
+    # Multi-resolution min/max/mean buckets of a sensor's history. A sample only
+    # touches the finest open bucket; a bucket is folded into the next tier when
+    # it closes, so appends are O(1) amortised and a query reads at most a few
+    # thousand buckets of whichever tier fits the range.
+    def __init__(self, widths=TIER_SECONDS, capacity: int = TIER_CAPACITY):
+        self.tiers = [_Tier(width, capacity) for width in widths]
+
+    def append(
+        self,
+        timestamp: float,
+        power: Optional[float],
+        cadence: Optional[float],
+        heart_rate: Optional[float],
+    ) -> None:
+        finest = self.tiers[0]
+        key = int(timestamp // finest.width)
+        bucket = finest.open
+        if bucket is None or bucket.key != key:
+            if bucket is not None:
+                self._close(0)
+            bucket = _OpenBucket(key)
+            finest.open = bucket
+        bucket.add(timestamp, (power, cadence, heart_rate))
+
+    def _close(self, level: int) -> None:
+        tier = self.tiers[level]
+        bucket = tier.open
+        tier.store(bucket)
+        if level + 1 == len(self.tiers):
+            return
+        upper = self.tiers[level + 1]
+        key = bucket.key * tier.width // upper.width
+        if upper.open is not None and upper.open.key != key:
+            self._close(level + 1)
+            upper.open = None
+        if upper.open is None:
+            upper.open = _OpenBucket(key)
+        upper.open.merge(bucket)
+
+    def open_buckets(self, level: int) -> List[_OpenBucket]:
+        # buckets at this tier's width not stored yet, rebuilt from the open
+        # bucket of every tier at or below it (at most two keys)
+        width = self.tiers[level].width
+        merged: Dict[int, _OpenBucket] = {}
+        for tier in self.tiers[:level + 1]:
+            bucket = tier.open
+            if bucket is None:
+                continue
+            key = bucket.key * tier.width // width
+            if key not in merged:
+                merged[key] = _OpenBucket(key)
+            merged[key].merge(bucket)
+        return [merged[key] for key in sorted(merged)]
+
+    def oldest_start(self) -> Optional[float]:
+        return self.tiers[-1].oldest_start()
+
+
+def _tier_series(
+    tiers: ChartTiers, level: int, field: str, start: float, end: float, latest: float
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # -> (bucket start, block rows MEAN..T_MAX with absolute times, mean time)
+    tier = tiers.tiers[level]
+    width = tier.width
+    lo_key, hi_key = int(start // width), int(end // width)
+    keys, block = tier.closed(lo_key, hi_key, field)
+    extra_keys, extra = [], []
+    for bucket in tiers.open_buckets(level):
+        if not lo_key <= bucket.key <= hi_key or (len(keys) and bucket.key <= keys[-1]):
+            continue
+        extra_keys.append(bucket.key)
+        extra.append(_summary(bucket.fields[VALUE_FIELDS.index(field)], bucket.key * width))
+    if extra:
+        keys = np.concatenate([keys, np.array(extra_keys, dtype=np.int64)])
+        block = np.concatenate([block, np.array(extra, dtype=np.float64).T], axis=1)
+    starts = keys * float(width)
+    block[T_MIN] += starts
+    block[T_MAX] += starts
+    # a bucket's mean is drawn at its middle, never past the newest sample
+    middle = np.minimum(starts + width / 2, latest)
+    keep = ~np.isnan(block[MEAN])
+    return starts[keep], block[:, keep], middle[keep]
+
+
+def _raw_series(history, field: str, start: float, end: float) -> Tuple[np.ndarray, np.ndarray]:
+    columns = history.window(since=start)
+    t_parts, v_parts = [], []
+    for t, v in zip(columns["timestamp"], columns[field]):
+        stop = int(np.searchsorted(t, end, side="right"))
+        t_parts.append(t[:stop])
+        v_parts.append(v[:stop])
+    if not t_parts:
+        return np.zeros(0), np.zeros(0)
+    t = np.concatenate(t_parts)
+    v = np.concatenate(v_parts).astype(np.float64)
+    keep = ~np.isnan(v)
+    return t[keep], v[keep]
+
+
+def _raw_count(history, start: float, end: float) -> int:
+    columns = history.window(since=start)
+    return sum(int(np.searchsorted(t, end, side="right")) for t in columns["timestamp"])
+
+
+def min_max(
+    position: np.ndarray,
+    t_low: np.ndarray,
+    low: np.ndarray,
+    t_high: np.ndarray,
+    high: np.ndarray,
+    start: float,
+    end: float,
+    columns: int,
+) -> Tuple[np.ndarray, np.ndarray]:
+    # keep the lowest and highest point of each of `columns` equal time slices,
+    # in time order, so spikes survive at any zoom
+    if len(position) == 0:
+        return np.zeros(0), np.zeros(0)
+    span = max(end - start, 1e-9)
+    pixel = np.clip(((position - start) / span * columns).astype(np.int64), 0, columns - 1)
+    first = np.flatnonzero(np.r_[True, pixel[1:] != pixel[:-1]])
+    # slices are contiguous, so sorting by (slice, value) keeps each slice in
+    # place and its extreme lands on the slice's first position
+    lowest = np.lexsort((low, pixel))[first]
+    highest = np.lexsort((-high, pixel))[first]
+    ta, va = t_low[lowest], low[lowest]
+    tb, vb = t_high[highest], high[highest]
+    swap = tb < ta
+    ta, tb = np.where(swap, tb, ta), np.where(swap, ta, tb)
+    va, vb = np.where(swap, vb, va), np.where(swap, va, vb)
+    t = np.column_stack((ta, tb)).ravel()
+    v = np.column_stack((va, vb)).ravel()
+    # a slice whose low and high are the same point contributes it once
+    single = np.column_stack((np.zeros(len(ta), dtype=bool), (ta == tb) & (va == vb))).ravel()
+    return t[~single], v[~single]
+
+
+def lttb(t: np.ndarray, v: np.ndarray, threshold: int) -> np.ndarray:
+    # Largest-Triangle-Three-Buckets: indices of the points to keep
+    n = len(t)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    t = t - t[0]  # keeps the prefix sums precise with epoch timestamps
+    every = (n - 2) / (threshold - 2)
+    edges = (np.arange(threshold - 1) * every).astype(np.int64) + 1
+    edges[-1] = n - 1
+    # mean of every bucket up front; the chosen point only depends on the next one's
+    t_sum = np.r_[0.0, np.cumsum(t)]
+    v_sum = np.r_[0.0, np.cumsum(v)]
+    next_lo = edges[1:]
+    next_hi = np.r_[edges[2:], n]
+    counts = next_hi - next_lo
+    avg_t = (t_sum[next_hi] - t_sum[next_lo]) / counts
+    avg_v = (v_sum[next_hi] - v_sum[next_lo]) / counts
+
+    chosen = np.empty(threshold, dtype=np.int64)
+    chosen[0], chosen[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        area = np.abs((t[a] - avg_t[i]) * (v[lo:hi] - v[a]) - (t[a] - t[lo:hi]) * (avg_v[i] - v[a]))
+        a = lo + int(area.argmax())
+        chosen[i + 1] = a
+    return chosen
+
+
+def _rounded(values: np.ndarray, digits: int) -> List[float]:
+    return np.round(values, digits).tolist()
+
+
+def chart_series(
+    session,
+    field: str = "power",
+    points: int = DEFAULT_POINTS,
+    method: str = "minmax",
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    window: Optional[float] = None,
+) -> dict:
+    if field not in VALUE_FIELDS:
+        raise HTTPException(status_code=400, detail=f"field must be one of {', '.join(VALUE_FIELDS)}")
+    if method not in METHODS:
+        raise HTTPException(status_code=400, detail=f"method must be one of {', '.join(METHODS)}")
+    if points < 10 or points > MAX_POINTS:
+        raise HTTPException(status_code=400, detail=f"points must be between 10 and {MAX_POINTS}")
+    if window is not None and window <= 0:
+        raise HTTPException(status_code=400, detail="Window must be positive")
+
+    history, tiers = session.history, session.tiers
+    latest = history.latest_timestamp()
+    result = {"sensor": session.sensor_name, "field": field, "method": method, "resolution": 0}
+    if latest is None:
+        return {**result, "start": start, "end": end, "t": [], "values": []}
+    if end is None:
+        end = latest
+    if start is None:
+        if window is not None:
+            start = end - window
+        else:
+            oldest = [t for t in (history.oldest_timestamp(), tiers.oldest_start()) if t is not None]
+            start = min(oldest)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+
+    budget = points * SOURCE_FACTOR
+    # the finest source that still covers the range and fits the budget
+    raw_from = history.oldest_timestamp()
+    if raw_from <= start or len(history) < history.capacity:
+        if _raw_count(history, start, end) <= budget:
+            t, v = _raw_series(history, field, start, end)
+            if method == "lttb":
+                keep = lttb(t, v, points)
+                t, v = t[keep], v[keep]
+            elif len(t) > points:
+                t, v = min_max(t, t, v, t, v, start, end, points // 2)
+            return {**result, "start": start, "end": end, "t": _rounded(t, 3), "values": _rounded(v, 1)}
+
+    level = len(tiers.tiers) - 1
+    for candidate, tier in enumerate(tiers.tiers):
+        oldest = tier.oldest_start()
+        covers = oldest is None or oldest <= start or tier.written < tier.capacity
+        if covers and (end - start) / tier.width <= budget:
+            level = candidate
+            break
+    position, block, middle = _tier_series(tiers, level, field, start, end, latest)
+    if method == "lttb":
+        keep = lttb(middle, block[MEAN], points)
+        t, v = middle[keep], block[MEAN][keep]
+    else:
+        t, v = min_max(position, block[T_MIN], block[MIN], block[T_MAX], block[MAX], start, end, points // 2)
+    return {
+        **result,
+        "resolution": tiers.tiers[level].width,
+        "start": start,
+        "end": end,
+        "t": _rounded(t, 3),
+        "values": _rounded(v, 1),
+    }
@@ -1,33 +1,21 @@
+import threading
 import time
+from typing import Dict, List, Optional
 
+import ant_process
 import state
+from erg_worker import CommandLog, ErgCommandWorker
 from fastapi import HTTPException
-from openant.devices.fitness_equipment import FitnessEquipment
+from models import ErgBatch
+from registry import registry
 from sensor_service import get_session_by_identifier
 
+MAX_TARGET_WATTS = 4000
+MAX_BATCH_DEADLINE_MS = 10000
 
-def _send_erg_command(trainer: FitnessEquipment, target_watts: int) -> None:
-    retries = 3
-
-    for attempt in range(1, retries + 1):
-        try:
-            if attempt == 1 and hasattr(trainer, "set_basic_resistance"):
-                try:
-                    trainer.set_basic_resistance(0)
-                except Exception:
-                    pass
-
-            trainer.set_target_power(target_watts)
-            return
-        except Exception as exc:
-            error_text = str(exc)
-            should_retry = (
-                "Timed out while waiting for message" in error_text
-                or "Failed to get acknowledgement" in error_text
-            )
-            if not should_retry or attempt == retries:
-                raise
-            time.sleep(0.4 * attempt)
+_workers: Dict[str, ErgCommandWorker] = {}
+_workers_lock = threading.Lock()
+_commands = CommandLog()
 
 
 def _get_trainer_capable_session(preferred_identifier: str):
@@ -45,6 +33,49 @@ def _get_trainer_capable_session(preferred_identifier: str):
     )
 
 
+def _worker_for(session) -> ErgCommandWorker:
+    with _workers_lock:
+        worker = _workers.get(session.sensor_name)
+        if worker is None or worker.trainer is not session.dev:
+            if worker is not None:
+                worker.stop()
+            worker = ErgCommandWorker(session.sensor_name, session.dev)
+            _workers[session.sensor_name] = worker
+        return worker
+
+
+def _release_worker(session) -> None:
+    with _workers_lock:
+        worker = _workers.get(session.sensor_name)
+        if worker is not None and worker.trainer is session.dev:
+            del _workers[session.sensor_name]
+        else:
+            worker = None
+    if worker is not None:
+        worker.stop()
+
+
+registry.on_release(_release_worker)
+
+
+def submit_erg_target(session, target_watts: Optional[int]):
+    if ant_process.client is not None:
+        command = ant_process.client.submit_erg(session, target_watts)
+    else:
+        command = _worker_for(session).submit(target_watts)
+    _commands.add(command)
+    return command
+
+
+def find_trainer_session(identifier: Optional[str] = None):
+    if identifier is not None:
+        return _get_trainer_capable_session(identifier)
+    for candidate in state.sessions.values():
+        if hasattr(candidate.dev, "set_target_power"):
+            return candidate
+    return None
+
+
 def set_erg_mode(sensor_identifier: str, target_watts: int):
     session = _get_trainer_capable_session(sensor_identifier)
 
@@ -59,19 +90,101 @@ def set_erg_mode(sensor_identifier: str, target_watts: int):
         raise HTTPException(
             status_code=400, detail="Target power must be a positive integer"
         )
-
-    try:
-        _send_erg_command(trainer, target_watts)
-    except ValueError as exc:
-        raise HTTPException(status_code=400, detail=str(exc)) from exc
-    except Exception as exc:  # pragma: no cover - hardware/USB issues
+    if target_watts > MAX_TARGET_WATTS:
         raise HTTPException(
-            status_code=500, detail=f"Failed to set ERG mode: {exc}"
-        ) from exc
+            status_code=400,
+            detail=f"Target power cannot exceed {MAX_TARGET_WATTS} W",
+        )
+
+    command = submit_erg_target(session, target_watts)
 
     return {
-        "status": "ok",
+        "status": command.status,
+        "command_id": command.id,
         "sensor": sensor_identifier,
+        "trainer": session.sensor_name,
         "mode": "ERG",
         "target_watts": target_watts,
     }
+
+
+def _batch_trainers(identifiers: Optional[List[str]]) -> list:
+    if identifiers is None:
+        sessions = [s for s in state.sessions.values() if hasattr(s.dev, "set_target_power")]
+        if not sessions:
+            raise HTTPException(status_code=400, detail="No connected Fitness Equipment device supports ERG control")
+        return [(s.sensor_name, s) for s in sessions]
+
+    trainers, seen = [], set()
+    for identifier in identifiers:
+        session = get_session_by_identifier(identifier)
+        if not hasattr(session.dev, "set_target_power"):
+            raise HTTPException(status_code=400, detail=f"{identifier} does not support ERG mode / target power")
+        if session.sensor_name not in seen:
+            seen.add(session.sensor_name)
+            trainers.append((identifier, session))
+    return trainers
+
+
+def set_erg_batch(batch: ErgBatch) -> dict:
+    if (batch.target_watts is None) == (batch.ftp_percent is None):
+        raise HTTPException(status_code=400, detail="Give exactly one of target_watts or ftp_percent")
+    if batch.deadline_ms <= 0 or batch.deadline_ms > MAX_BATCH_DEADLINE_MS:
+        raise HTTPException(status_code=400, detail=f"deadline_ms must be between 1 and {MAX_BATCH_DEADLINE_MS}")
+    rider_ftp = batch.rider_ftp or {}
+
+    targets = []
+    for identifier, session in _batch_trainers(batch.trainers):
+        if batch.ftp_percent is not None:
+            ftp = rider_ftp.get(identifier, rider_ftp.get(session.sensor_name, state.ftp))
+            watts = round(ftp * batch.ftp_percent / 100)
+        else:
+            watts = batch.target_watts
+        if watts < 0 or watts > MAX_TARGET_WATTS:
+            raise HTTPException(status_code=400, detail=f"Target for {identifier} must be between 0 and {MAX_TARGET_WATTS} W")
+        targets.append((session, watts))
+
+    # every trainer has its own worker thread, so submitting is non-blocking
+    # and the sends overlap; then wait for all of them on one shared deadline
+    started = time.monotonic()
+    commands = [(session, submit_erg_target(session, watts)) for session, watts in targets]
+    deadline = started + batch.deadline_ms / 1000
+    for _, command in commands:
+        command.wait(max(0.0, deadline - time.monotonic()))
+
+    results = []
+    for session, command in commands:
+        result = command.to_dict()
+        result["trainer"] = session.sensor_name
+        result["acked_after_ms"] = (
+            None if command.acked_at is None else round((command.acked_at - started) * 1000, 1)
+        )
+        results.append(result)
+    acked = [command.acked_at for _, command in commands if command.acked_at is not None]
+    skew = round((max(acked) - min(acked)) * 1000, 1) if acked else None
+    return {
+        "trainers": results,
+        "acked": len(acked),
+        "pending": sum(1 for _, command in commands if not command.finished.is_set()),
+        "total": len(commands),
+        "skew_ms": skew,
+        "elapsed_ms": round((time.monotonic() - started) * 1000, 1),
+    }
+
+
+def get_erg_command(command_id: int) -> dict:
+    command = _commands.get(command_id)
+    if command is None:
+        raise HTTPException(status_code=404, detail="Unknown ERG command")
+    return command.to_dict()
+
+
+def get_erg_stats() -> dict:
+    if ant_process.client is not None:
+        return ant_process.client.call("erg_stats")
+    with _workers_lock:
+        workers = list(_workers.values())
+    return {
+        "trainers": [worker.stats() for worker in workers],
+        "queue_depth": sum(worker.queue_depth for worker in workers),
+    }
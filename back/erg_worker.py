@@ -0,0 +1,275 @@
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from openant.devices.fitness_equipment import ResistenceMode
+from telemetry import ERG_ACK_SECONDS, ERG_COMMANDS, ERG_RETRIES
+
+MAX_RETRIES = 3
+ACK_TIMEOUT_SECONDS = 1.0
+ACK_POLL_SECONDS = 0.02
+RETRY_BACKOFF_SECONDS = 0.4
+COMMAND_HISTORY = 256
+# basic resistance a released trainer (target None, e.g. free ride) is left at
+RELEASE_RESISTANCE_PERCENT = 0
+
+_command_ids = itertools.count(1)
+
+
+def _is_retryable(exc: Exception) -> bool:
+    error_text = str(exc)
+    return (
+        "Timed out while waiting for message" in error_text
+        or "Failed to get acknowledgement" in error_text
+    )
+
+
+class ErgCommand:
+    __slots__ = (
+        "id", "sensor", "target_watts", "status", "attempts", "error",
+        "created_at", "sent_at", "acked_at", "finished",
+    )
+
+    def __init__(self, sensor: str, target_watts: Optional[int]):
+        self.id = next(_command_ids)
+        self.sensor = sensor
+        # None releases the trainer from ERG to basic resistance
+        self.target_watts = target_watts
+        # queued -> sending -> acked | unconfirmed | released | failed, or superseded
+        self.status = "queued"
+        self.attempts = 0
+        self.error: Optional[str] = None
+        self.created_at = time.monotonic()
+        self.sent_at: Optional[float] = None
+        self.acked_at: Optional[float] = None
+        self.finished = threading.Event()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self.finished.wait(timeout)
+
+    @property
+    def ack_latency(self) -> Optional[float]:
+        if self.acked_at is None or self.sent_at is None:
+            return None
+        return self.acked_at - self.sent_at
+
+    def to_dict(self) -> dict:
+        latency = self.ack_latency
+        return {
+            "command_id": self.id,
+            "sensor": self.sensor,
+            "target_watts": self.target_watts,
+            "status": self.status,
+            "attempts": self.attempts,
+            "error": self.error,
+            "ack_latency_ms": None if latency is None else round(latency * 1000, 1),
+        }
+
+
+class ErgCommandWorker:
+    def __init__(self, sensor: str, trainer):
+        self.sensor = sensor
+        self.trainer = trainer
+        self._cond = threading.Condition()
+        self._pending: Optional[ErgCommand] = None
+        self._in_flight: Optional[ErgCommand] = None
+        self._target_power_mode = False
+        self._stopped = False
+        self.submitted = 0
+        self.superseded = 0
+        self.acked = 0
+        self.unconfirmed = 0
+        self.released = 0
+        self.failed = 0
+        self.retries = 0
+        self._ack_latency_total = 0.0
+        self.last_ack_latency: Optional[float] = None
+        self._ack_seconds = ERG_ACK_SECONDS.labels(sensor)
+        self._retries = ERG_RETRIES.labels(sensor)
+        self._thread = threading.Thread(
+            target=self._run, name=f"erg-{sensor}", daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def queue_depth(self) -> int:
+        return int(self._pending is not None) + int(self._in_flight is not None)
+
+    def submit(self, target_watts: Optional[int]) -> ErgCommand:
+        command = ErgCommand(self.sensor, target_watts)
+        with self._cond:
+            # only the newest target matters: anything still waiting is stale
+            if self._pending is not None:
+                self._pending.status = "superseded"
+                self._pending.finished.set()
+                ERG_COMMANDS.labels(self.sensor, "superseded").inc()
+                self.superseded += 1
+            self._pending = command
+            self.submitted += 1
+            self._cond.notify()
+        return command
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stopped = True
+            if self._pending is not None:
+                self._pending.status = "superseded"
+                self._pending.finished.set()
+                ERG_COMMANDS.labels(self.sensor, "superseded").inc()
+                self._pending = None
+            self._cond.notify()
+
+    def reset_mode(self) -> None:
+        # next command re-sends the basic resistance reset before target power
+        self._target_power_mode = False
+
+    def stats(self) -> dict:
+        return {
+            "sensor": self.sensor,
+            "queue_depth": self.queue_depth,
+            "submitted": self.submitted,
+            "superseded": self.superseded,
+            "acked": self.acked,
+            "unconfirmed": self.unconfirmed,
+            "released": self.released,
+            "failed": self.failed,
+            "retries": self.retries,
+            "last_ack_latency_ms": None
+            if self.last_ack_latency is None
+            else round(self.last_ack_latency * 1000, 1),
+            "avg_ack_latency_ms": round(self._ack_latency_total / self.acked * 1000, 1)
+            if self.acked
+            else None,
+        }
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while self._pending is None and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                command, self._pending = self._pending, None
+                self._in_flight = command
+            try:
+                self._execute(command)
+            finally:
+                self._in_flight = None
+                command.finished.set()
+                ERG_COMMANDS.labels(self.sensor, command.status).inc()
+                if command.ack_latency is not None:
+                    self._ack_seconds.observe(command.ack_latency)
+
+    def _superseded(self) -> bool:
+        return self._pending is not None or self._stopped
+
+    def _execute(self, command: ErgCommand) -> None:
+        command.status = "sending"
+        if command.target_watts is None:
+            self._release(command)
+            return
+        if not self._target_power_mode and hasattr(self.trainer, "set_basic_resistance"):
+            try:
+                self.trainer.set_basic_resistance(0)
+            except Exception:
+                pass
+            self._target_power_mode = True
+
+        for attempt in range(1, MAX_RETRIES + 1):
+            command.attempts = attempt
+            self._clear_ack_state()
+            command.sent_at = time.monotonic()
+            try:
+                self.trainer.set_target_power(command.target_watts)
+            except Exception as exc:
+                command.error = str(exc)
+                if not _is_retryable(exc) or attempt == MAX_RETRIES:
+                    command.status = "failed"
+                    self.failed += 1
+                    return
+            else:
+                if self._wait_for_ack(command.target_watts):
+                    command.acked_at = time.monotonic()
+                    command.status = "acked"
+                    command.error = None
+                    self.acked += 1
+                    self.last_ack_latency = command.ack_latency
+                    self._ack_latency_total += self.last_ack_latency
+                    return
+
+            if self._superseded():
+                command.status = "superseded"
+                self.superseded += 1
+                return
+            if attempt < MAX_RETRIES:
+                self.retries += 1
+                self._retries.inc()
+                # back off, but wake immediately if a newer target arrives
+                with self._cond:
+                    self._cond.wait_for(self._superseded, RETRY_BACKOFF_SECONDS * attempt)
+                if self._superseded():
+                    command.status = "superseded"
+                    self.superseded += 1
+                    return
+
+        command.status = "unconfirmed"
+        self.unconfirmed += 1
+
+    def _release(self, command: ErgCommand) -> None:
+        # basic resistance takes the trainer out of target power mode; page 71
+        # has no target to match, so this is not acknowledged like a target
+        command.attempts = 1
+        command.sent_at = time.monotonic()
+        try:
+            self.trainer.set_basic_resistance(RELEASE_RESISTANCE_PERCENT)
+        except Exception as exc:
+            command.error = str(exc)
+            command.status = "failed"
+            self.failed += 1
+            return
+        self._target_power_mode = False
+        command.status = "released"
+        self.released += 1
+
+    def _clear_ack_state(self) -> None:
+        # forget the previous page 71 so an old echo of the same target is not
+        # mistaken for this command's acknowledgement
+        fe = getattr(self.trainer, "data", {}).get("fe")
+        if fe is not None:
+            fe.resistance_mode = ResistenceMode.Unknown
+
+    def _wait_for_ack(self, target_watts: int) -> bool:
+        # set_target_power requests page 71 (command status); the trainer
+        # echoes the active mode and target there once it has applied it
+        fe = getattr(self.trainer, "data", {}).get("fe")
+        if fe is None:
+            return False
+        deadline = time.monotonic() + ACK_TIMEOUT_SECONDS
+        while time.monotonic() < deadline:
+            if (
+                getattr(fe, "resistance_mode", None) == ResistenceMode.TargetPower
+                and abs(getattr(fe, "resistance", -1) - target_watts) < 0.5
+            ):
+                return True
+            if self._superseded():
+                return False
+            time.sleep(ACK_POLL_SECONDS)
+        return False
+
+
+class CommandLog:
+    def __init__(self, size: int = COMMAND_HISTORY):
+        self._size = size
+        self._commands: "OrderedDict[int, ErgCommand]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, command: ErgCommand) -> None:
+        with self._lock:
+            self._commands[command.id] = command
+            while len(self._commands) > self._size:
+                self._commands.popitem(last=False)
+
+    def get(self, command_id: int) -> Optional[ErgCommand]:
+        return self._commands.get(command_id)
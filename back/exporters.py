@@ -0,0 +1,514 @@
+import math
+import queue
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+from fastapi import HTTPException
+from paths import RECORDINGS_DIR
+from recorder import RideReader
+
+# recording rows read, merged and encoded per chunk, so memory stays flat
+# however long the ride is
+CHUNK_ROWS = 8192
+# encoded chunks buffered per export before the worker waits for the client
+QUEUE_CHUNKS = 8
+EXPORT_WORKERS = 2
+FORMATS = ("fit", "tcx", "csv")
+MEDIA_TYPES = {
+    "fit": "application/vnd.ant.fit",
+    "tcx": "application/vnd.garmin.tcx+xml",
+    "csv": "text/csv",
+}
+
+SECOND_DTYPE = np.dtype(
+    [
+        ("t", "<i8"),
+        ("lap", "<i2"),
+        ("power", "<f4"),
+        ("cadence", "<f4"),
+        ("heart_rate", "<f4"),
+        ("target", "<f4"),
+    ]
+)
+
+
+def _means(groups: np.ndarray, count: int, values: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    keep = mask & ~np.isnan(values)
+    counts = np.bincount(groups[keep], minlength=count)
+    sums = np.bincount(groups[keep], weights=values[keep], minlength=count)
+    out = np.full(count, np.nan, dtype=np.float32)
+    have = counts > 0
+    out[have] = sums[have] / counts[have]
+    return out
+
+
+class RideTimeline:
+    # A recording merged into one row per second: power and cadence from the
+    # sensor that sent the most power, heart rate from the one that sent the
+    # most heart rate, plus the ERG target and workout lap stamped on the rows.
+    def __init__(self, ride_id: str, directory: Path = RECORDINGS_DIR):
+        self.reader = RideReader(ride_id, directory)
+        self.ride_id = ride_id
+        records = self.reader.records
+        if len(records) == 0:
+            raise HTTPException(status_code=404, detail="Ride has no samples")
+        self.first = int(math.floor(records["t"][0]))
+        self.last = int(math.floor(records["t"][-1]))
+        self.power_sensor: Optional[int] = None
+        self.hr_sensor: Optional[int] = None
+        self.laps: List[dict] = []
+        self.seconds = 0
+
+    def prepare(self, laps: bool = True) -> None:
+        # the passes over the whole file; exporters run this on the export
+        # worker, not on the request thread
+        counts = self._sensor_counts()
+        self.power_sensor = max(counts, key=lambda index: counts[index][0])
+        self.hr_sensor = max(counts, key=lambda index: counts[index][1])
+        if laps:
+            self.laps = self._lap_summaries()
+            self.seconds = sum(lap["seconds"] for lap in self.laps)
+
+    def _row_chunks(self) -> Iterator[np.ndarray]:
+        # fixed-size slices of the memmap; the last second of a slice may
+        # continue in the next one, so it is carried over to keep seconds whole
+        records = self.reader.records
+        carry = None
+        for lo in range(0, len(records), CHUNK_ROWS):
+            rows = np.asarray(records[lo:lo + CHUNK_ROWS])
+            if carry is not None:
+                rows = np.concatenate((carry, rows))
+            if lo + CHUNK_ROWS < len(records):
+                cut = int(np.searchsorted(rows["t"], math.floor(rows["t"][-1]), side="left"))
+                rows, carry = rows[:cut], rows[cut:]
+            if len(rows):
+                yield rows
+
+    def _sensor_counts(self) -> Dict[int, List[int]]:
+        counts: Dict[int, List[int]] = {}
+        for rows in self._row_chunks():
+            for index in np.unique(rows["sensor"]).tolist():
+                mine = rows[rows["sensor"] == index]
+                found = counts.setdefault(index, [0, 0])
+                found[0] += int(np.count_nonzero(~np.isnan(mine["power"])))
+                found[1] += int(np.count_nonzero(~np.isnan(mine["heart_rate"])))
+        return counts
+
+    def chunks(self) -> Iterator[np.ndarray]:
+        for rows in self._row_chunks():
+            seconds = np.floor(rows["t"]).astype(np.int64)
+            unique, groups = np.unique(seconds, return_inverse=True)
+            count = len(unique)
+            sensor = rows["sensor"]
+            out = np.zeros(count, dtype=SECOND_DTYPE)
+            out["t"] = unique
+            trainer = sensor == self.power_sensor
+            out["power"] = _means(groups, count, rows["power"], trainer)
+            cadence = _means(groups, count, rows["cadence"], trainer)
+            # a cadence-only sensor still counts when the power source has none
+            fallback = _means(groups, count, rows["cadence"], np.ones(len(rows), dtype=bool))
+            out["cadence"] = np.where(np.isnan(cadence), fallback, cadence)
+            out["heart_rate"] = _means(groups, count, rows["heart_rate"], sensor == self.hr_sensor)
+            target = np.full(count, np.nan, dtype=np.float32)
+            np.fmax.at(target, groups, rows["target"])
+            out["target"] = target
+            lap = np.full(count, -1, dtype=np.int16)
+            np.maximum.at(lap, groups, rows["lap"])
+            out["lap"] = lap
+            yield out
+
+    def _lap_summaries(self) -> List[dict]:
+        # one lap per run of seconds on the same workout step; FIT and TCX
+        # need each lap's totals before (or right after) its samples
+        laps: List[dict] = []
+        for rows in self.chunks():
+            change = np.flatnonzero(np.diff(rows["lap"])) + 1
+            for part in np.split(rows, change):
+                lap = laps[-1] if laps and laps[-1]["lap"] == int(part["lap"][0]) else None
+                if lap is None:
+                    lap = {
+                        "lap": int(part["lap"][0]), "start": int(part["t"][0]), "end": 0, "seconds": 0,
+                        "power_sum": 0.0, "power_count": 0, "max_power": None,
+                        "hr_sum": 0.0, "hr_count": 0, "max_hr": None,
+                        "cadence_sum": 0.0, "cadence_count": 0,
+                    }
+                    laps.append(lap)
+                lap["end"] = int(part["t"][-1])
+                lap["seconds"] += len(part)
+                for field, prefix, top in (("power", "power", "max_power"), ("heart_rate", "hr", "max_hr"),
+                                           ("cadence", "cadence", None)):
+                    values = part[field][~np.isnan(part[field])]
+                    if len(values):
+                        lap[f"{prefix}_sum"] += float(values.sum())
+                        lap[f"{prefix}_count"] += len(values)
+                        if top is not None:
+                            lap[top] = max(lap[top] or 0.0, float(values.max()))
+        for lap in laps:
+            lap["avg_power"] = lap["power_sum"] / lap["power_count"] if lap["power_count"] else None
+            lap["avg_hr"] = lap["hr_sum"] / lap["hr_count"] if lap["hr_count"] else None
+            lap["avg_cadence"] = lap["cadence_sum"] / lap["cadence_count"] if lap["cadence_count"] else None
+            # power is held per second, so the sum is joules; 1 kJ ~ 1 kcal on a bike
+            lap["kilojoules"] = lap["power_sum"] / 1000
+        return laps
+
+
+def _iso(seconds: np.ndarray) -> np.ndarray:
+    return np.char.add(np.datetime_as_string(seconds.astype("datetime64[s]"), unit="s"), "Z")
+
+
+def _text(values: np.ndarray, digits: int = 0) -> List[str]:
+    if digits:
+        return ["" if v != v else f"{v:.{digits}f}" for v in values.tolist()]
+    return ["" if v != v else str(int(round(v))) for v in values.tolist()]
+
+
+def export_csv(timeline: RideTimeline) -> Iterator[bytes]:
+    timeline.prepare(laps=False)
+    yield b"time,elapsed,power,cadence,heart_rate,target,lap\n"
+    for rows in timeline.chunks():
+        columns = zip(
+            _iso(rows["t"]).tolist(),
+            (rows["t"] - timeline.first).tolist(),
+            _text(rows["power"], 1),
+            _text(rows["cadence"]),
+            _text(rows["heart_rate"]),
+            _text(rows["target"]),
+            rows["lap"].tolist(),
+        )
+        yield "".join(f"{t},{e},{p},{c},{h},{g},{'' if lap < 0 else lap}\n" for t, e, p, c, h, g, lap in columns).encode()
+
+
+TCX_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<TrainingCenterDatabase xmlns="http://www.garmin.com/xmlschemas/TrainingCenterDatabase/v2"'
+    ' xmlns:ns3="http://www.garmin.com/xmlschemas/ActivityExtension/v2">\n'
+    '<Activities>\n<Activity Sport="Biking">\n'
+)
+TCX_FOOTER = "</Activity>\n</Activities>\n</TrainingCenterDatabase>\n"
+
+
+def _tcx_lap_open(lap: dict) -> str:
+    start = _iso(np.array([lap["start"]]))[0]
+    parts = [
+        f'<Lap StartTime="{start}">',
+        f"<TotalTimeSeconds>{lap['end'] - lap['start'] + 1}</TotalTimeSeconds>",
+        "<DistanceMeters>0</DistanceMeters>",
+        f"<Calories>{round(lap['kilojoules'])}</Calories>",
+    ]
+    if lap["avg_hr"] is not None:
+        parts.append(f"<AverageHeartRateBpm><Value>{round(lap['avg_hr'])}</Value></AverageHeartRateBpm>")
+        parts.append(f"<MaximumHeartRateBpm><Value>{round(lap['max_hr'])}</Value></MaximumHeartRateBpm>")
+    parts.append("<Intensity>Active</Intensity>")
+    if lap["avg_cadence"] is not None:
+        parts.append(f"<Cadence>{min(round(lap['avg_cadence']), 254)}</Cadence>")
+    parts.append("<TriggerMethod>Manual</TriggerMethod>\n<Track>\n")
+    return "\n".join(parts)
+
+
+def _tcx_lap_close(lap: dict) -> str:
+    watts = ""
+    if lap["avg_power"] is not None:
+        watts = (
+            f"<Extensions><ns3:LX><ns3:AvgWatts>{round(lap['avg_power'])}</ns3:AvgWatts>"
+            f"<ns3:MaxWatts>{round(lap['max_power'])}</ns3:MaxWatts></ns3:LX></Extensions>\n"
+        )
+    return f"</Track>\n{watts}</Lap>\n"
+
+
+def export_tcx(timeline: RideTimeline) -> Iterator[bytes]:
+    # TCX has no field for the ERG target; it is in the FIT and CSV exports
+    timeline.prepare()
+    yield (TCX_HEADER + f"<Id>{_iso(np.array([timeline.first]))[0]}</Id>\n").encode()
+    laps = iter(timeline.laps)
+    lap = next(laps)
+    parts = [_tcx_lap_open(lap)]
+    for rows in timeline.chunks():
+        for t, time_text, power, cadence, heart_rate in zip(
+            rows["t"].tolist(), _iso(rows["t"]).tolist(),
+            _text(rows["power"]), _text(rows["cadence"]), _text(rows["heart_rate"]),
+        ):
+            if t > lap["end"]:
+                parts.append(_tcx_lap_close(lap))
+                lap = next(laps)
+                parts.append(_tcx_lap_open(lap))
+            point = [f"<Trackpoint><Time>{time_text}</Time>"]
+            if heart_rate:
+                point.append(f"<HeartRateBpm><Value>{heart_rate}</Value></HeartRateBpm>")
+            if cadence:
+                point.append(f"<Cadence>{min(int(cadence), 254)}</Cadence>")
+            if power:
+                point.append(f"<Extensions><ns3:TPX><ns3:Watts>{power}</ns3:Watts></ns3:TPX></Extensions>")
+            point.append("</Trackpoint>\n")
+            parts.append("".join(point))
+        yield "".join(parts).encode()
+        parts = []
+    yield (_tcx_lap_close(lap) + TCX_FOOTER).encode()
+
+
+# --- FIT -------------------------------------------------------------------
+
+FIT_EPOCH = 631065600  # 1989-12-31T00:00:00Z, where FIT timestamps start
+FIT_PROFILE_VERSION = 2132
+FIT_PROTOCOL_VERSION = 0x20  # 2.0, needed for developer fields
+
+ENUM, UINT8, UINT16, UINT32, UINT32Z, STRING, BYTE = 0x00, 0x02, 0x84, 0x86, 0x8C, 0x07, 0x0D
+_INVALID = {ENUM: 0xFF, UINT8: 0xFF, UINT16: 0xFFFF, UINT32: 0xFFFFFFFF, UINT32Z: 0}
+_FORMATS = {ENUM: "B", UINT8: "B", UINT16: "H", UINT32: "I", UINT32Z: "I"}
+
+# global message numbers
+FILE_ID, SESSION, LAP, RECORD, EVENT, ACTIVITY = 0, 18, 19, 20, 21, 34
+FIELD_DESCRIPTION, DEVELOPER_DATA_ID = 206, 207
+TIMESTAMP = 253
+
+
+def _crc_table() -> List[int]:
+    # the FIT checksum is CRC-16/ARC (reflected 0x8005, zero start)
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+        table.append(crc)
+    return table
+
+
+_CRC_TABLE = _crc_table()
+
+
+def fit_crc(data: bytes, crc: int = 0) -> int:
+    table = _CRC_TABLE
+    for byte in data:
+        crc = (crc >> 8) ^ table[(crc ^ byte) & 0xFF]
+    return crc
+
+
+class _Message:
+    # one local message type: its definition and a packer for its data rows;
+    # fields are (field number, base type) or (field number, STRING/BYTE, size)
+    def __init__(self, local: int, global_number: int, fields: list, developer: Optional[list] = None):
+        self.local = local
+        self.fields = fields
+        self.developer = developer or []
+        layout = "<B"
+        definition = [struct.pack("<BBBHB", 0x40 | (0x20 if developer else 0) | local, 0, 0, global_number, len(fields))]
+        for field in fields:
+            number, base = field[0], field[1]
+            size = field[2] if len(field) > 2 else struct.calcsize(_FORMATS[base])
+            layout += f"{size}s" if base in (STRING, BYTE) else _FORMATS[base]
+            definition.append(struct.pack("<BBB", number, size, base))
+        if developer:
+            definition.append(struct.pack("<B", len(developer)))
+            for number, base, index in developer:
+                layout += _FORMATS[base]
+                definition.append(struct.pack("<BBB", number, struct.calcsize(_FORMATS[base]), index))
+        self.definition = b"".join(definition)
+        self.struct = struct.Struct(layout)
+        self.bases = [field[1] for field in fields] + [field[1] for field in self.developer]
+
+    def pack(self, *values) -> bytes:
+        values = [_INVALID[base] if value is None else value for base, value in zip(self.bases, values)]
+        return self.struct.pack(self.local, *values)
+
+
+def _fit_time(unix_seconds: float) -> int:
+    return int(unix_seconds) - FIT_EPOCH
+
+
+def _whole(value: Optional[float], top: int) -> Optional[int]:
+    return None if value is None else min(max(int(round(value)), 0), top)
+
+
+# local message types used by the exporter; records get their own so the
+# per-second rows can be packed as one numpy block
+_FILE_ID = _Message(0, FILE_ID, [(0, ENUM), (1, UINT16), (2, UINT16), (3, UINT32Z), (4, UINT32)])
+_DEVELOPER_ID = _Message(1, DEVELOPER_DATA_ID, [(1, BYTE, 16), (3, UINT8)])
+_FIELD_DESCRIPTION = _Message(
+    2, FIELD_DESCRIPTION, [(0, UINT8), (1, UINT8), (2, UINT8), (3, STRING, 16), (8, STRING, 8)]
+)
+_EVENT = _Message(3, EVENT, [(TIMESTAMP, UINT32), (0, ENUM), (1, ENUM)])
+_LAP = _Message(5, LAP, [
+    (TIMESTAMP, UINT32), (254, UINT16), (0, ENUM), (1, ENUM), (2, UINT32), (7, UINT32), (8, UINT32),
+    (11, UINT16), (15, UINT8), (16, UINT8), (17, UINT8), (19, UINT16), (20, UINT16), (24, ENUM), (25, ENUM),
+])
+_SESSION = _Message(6, SESSION, [
+    (TIMESTAMP, UINT32), (254, UINT16), (0, ENUM), (1, ENUM), (2, UINT32), (5, ENUM), (6, ENUM),
+    (7, UINT32), (8, UINT32), (11, UINT16), (16, UINT8), (17, UINT8), (18, UINT8), (20, UINT16),
+    (21, UINT16), (25, UINT16), (26, UINT16),
+])
+_ACTIVITY = _Message(7, ACTIVITY, [(TIMESTAMP, UINT32), (0, UINT32), (1, UINT16), (2, ENUM), (3, ENUM), (4, ENUM)])
+# record: timestamp, heart_rate, cadence, power + developer field 0 (target power)
+_RECORD = _Message(4, RECORD, [(TIMESTAMP, UINT32), (3, UINT8), (4, UINT8), (7, UINT16)], [(0, UINT16, 0)])
+RECORD_BLOCK = np.dtype(
+    [("header", "u1"), ("t", "<u4"), ("heart_rate", "u1"), ("cadence", "u1"), ("power", "<u2"), ("target", "<u2")]
+)
+APPLICATION_ID = b"IndoorCycMonitor"
+
+EVENT_TIMER, EVENT_LAP, EVENT_SESSION, EVENT_ACTIVITY = 0, 9, 8, 26
+EVENT_START, EVENT_STOP, EVENT_STOP_ALL = 0, 1, 4
+SPORT_CYCLING, SUB_SPORT_INDOOR_CYCLING = 2, 6
+LAP_TRIGGER_MANUAL, LAP_TRIGGER_SESSION_END = 0, 7
+
+
+def _fit_records(rows: np.ndarray) -> bytes:
+    block = np.zeros(len(rows), dtype=RECORD_BLOCK)
+    block["header"] = _RECORD.local
+    block["t"] = rows["t"] - FIT_EPOCH
+    for field, top in (("heart_rate", 0xFF), ("cadence", 0xFF), ("power", 0xFFFF), ("target", 0xFFFF)):
+        values = rows[field]
+        # the largest value of the type means "invalid"
+        block[field] = np.where(np.isnan(values), top, np.clip(np.rint(np.nan_to_num(values)), 0, top - 1))
+    return block.tobytes()
+
+
+def _fit_prefix(timeline: RideTimeline) -> bytes:
+    created = _fit_time(timeline.first)
+    return b"".join([
+        _FILE_ID.definition,
+        _FILE_ID.pack(4, 255, 0, None, created),  # activity file, "development" manufacturer
+        _DEVELOPER_ID.definition,
+        _DEVELOPER_ID.pack(APPLICATION_ID, 0),
+        _FIELD_DESCRIPTION.definition,
+        _FIELD_DESCRIPTION.pack(0, 0, UINT16, b"target_power", b"watts"),
+        _EVENT.definition,
+        _EVENT.pack(created, EVENT_TIMER, EVENT_START),
+        _RECORD.definition,
+    ])
+
+
+def _fit_suffix(timeline: RideTimeline) -> bytes:
+    parts = [_LAP.definition]
+    for index, lap in enumerate(timeline.laps):
+        trigger = LAP_TRIGGER_SESSION_END if index == len(timeline.laps) - 1 else LAP_TRIGGER_MANUAL
+        parts.append(_LAP.pack(
+            _fit_time(lap["end"]), index, EVENT_LAP, EVENT_STOP, _fit_time(lap["start"]),
+            (lap["end"] - lap["start"] + 1) * 1000, lap["seconds"] * 1000,
+            _whole(lap["kilojoules"], 0xFFFE), _whole(lap["avg_hr"], 0xFE), _whole(lap["max_hr"], 0xFE),
+            _whole(lap["avg_cadence"], 0xFE), _whole(lap["avg_power"], 0xFFFE), _whole(lap["max_power"], 0xFFFE),
+            trigger, SPORT_CYCLING,
+        ))
+    ended = _fit_time(timeline.last)
+    totals = _ride_totals(timeline.laps)
+    parts += [
+        _EVENT.pack(ended, EVENT_TIMER, EVENT_STOP_ALL),
+        _SESSION.definition,
+        _SESSION.pack(
+            ended, 0, EVENT_SESSION, EVENT_STOP, _fit_time(timeline.first), SPORT_CYCLING, SUB_SPORT_INDOOR_CYCLING,
+            (timeline.last - timeline.first + 1) * 1000, timeline.seconds * 1000,
+            _whole(totals["kilojoules"], 0xFFFE), _whole(totals["avg_hr"], 0xFE), _whole(totals["max_hr"], 0xFE),
+            _whole(totals["avg_cadence"], 0xFE), _whole(totals["avg_power"], 0xFFFE),
+            _whole(totals["max_power"], 0xFFFE), 0, len(timeline.laps),
+        ),
+        _ACTIVITY.definition,
+        _ACTIVITY.pack(ended, timeline.seconds * 1000, 1, 0, EVENT_ACTIVITY, EVENT_STOP),
+    ]
+    return b"".join(parts)
+
+
+def _ride_totals(laps: List[dict]) -> dict:
+    def mean(prefix):
+        count = sum(lap[f"{prefix}_count"] for lap in laps)
+        return sum(lap[f"{prefix}_sum"] for lap in laps) / count if count else None
+
+    def top(field):
+        values = [lap[field] for lap in laps if lap[field] is not None]
+        return max(values) if values else None
+
+    return {
+        "kilojoules": sum(lap["kilojoules"] for lap in laps),
+        "avg_power": mean("power"),
+        "max_power": top("max_power"),
+        "avg_hr": mean("hr"),
+        "max_hr": top("max_hr"),
+        "avg_cadence": mean("cadence"),
+    }
+
+
+def export_fit(timeline: RideTimeline) -> Iterator[bytes]:
+    # Records are fixed-size and the lap totals are known up front, so the
+    # header's data size is exact before the first record is encoded; the
+    # file CRC is carried across chunks.
+    timeline.prepare()
+    prefix = _fit_prefix(timeline)
+    suffix = _fit_suffix(timeline)
+    data_size = len(prefix) + timeline.seconds * RECORD_BLOCK.itemsize + len(suffix)
+    header = struct.pack("<BBHI4s", 14, FIT_PROTOCOL_VERSION, FIT_PROFILE_VERSION, data_size, b".FIT")
+    header += struct.pack("<H", fit_crc(header))
+    crc = fit_crc(header + prefix)
+    yield header + prefix
+    for rows in timeline.chunks():
+        chunk = _fit_records(rows)
+        crc = fit_crc(chunk, crc)
+        yield chunk
+    crc = fit_crc(suffix, crc)
+    yield suffix + struct.pack("<H", crc)
+
+
+EXPORTERS = {"fit": export_fit, "tcx": export_tcx, "csv": export_csv}
+
+
+class ExportWorker:
+    # encodes on a small pool of its own threads and hands chunks over a
+    # bounded queue, so a slow client or a long ride never blocks a request
+    # thread and only QUEUE_CHUNKS chunks per export are ever held
+    def __init__(self, workers: int = EXPORT_WORKERS):
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ride-export")
+
+    def stream(self, chunks: Iterator[bytes]) -> Iterator[bytes]:
+        buffer: "queue.Queue" = queue.Queue(maxsize=QUEUE_CHUNKS)
+        cancelled = threading.Event()
+        done = object()
+
+        def put(item) -> bool:
+            # the consumer may have gone away; never block on it for good
+            while not cancelled.is_set():
+                try:
+                    buffer.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def produce():
+            try:
+                for chunk in chunks:
+                    if not put(chunk):
+                        return
+                put(done)
+            except Exception as exc:
+                print(f"[export] failed: {exc}")
+                put(exc)
+            finally:
+                chunks.close()
+
+        self._pool.submit(produce)
+
+        def consume():
+            try:
+                while True:
+                    chunk = buffer.get()
+                    if chunk is done:
+                        return
+                    if isinstance(chunk, Exception):
+                        # headers are already out; dropping the connection
+                        # is the only way left to tell the client
+                        raise chunk
+                    yield chunk
+            finally:
+                cancelled.set()
+
+        return consume()
+
+
+exports = ExportWorker()
+
+
+def open_export(ride_id: str, file_format: str) -> Iterator[bytes]:
+    if file_format not in EXPORTERS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(FORMATS)}")
+    # read the ride here so an unknown or empty ride is a 404, not a broken stream
+    timeline = RideTimeline(ride_id)
+    return exports.stream(EXPORTERS[file_format](timeline))
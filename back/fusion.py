@@ -0,0 +1,120 @@
+import math
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from fastapi import HTTPException
+from history import VALUE_FIELDS
+from ride_metrics import MAX_GAP_SECONDS
+
+DEFAULT_STEP_SECONDS = 1.0
+DEFAULT_WINDOW_SECONDS = 60.0
+MAX_TICKS = 7200
+# a value is carried forward into ticks without a fresh page for this long,
+# then the sensor is reported as a gap
+HOLD_SECONDS = MAX_GAP_SECONDS
+
+# Each sensor's pages land in (tick - step, tick]; a tick with pages gets their
+# mean ("fresh"), a tick without gets the last value if it is recent enough
+# ("stale") and nothing otherwise ("gap").
+
+
+def _grid(step: float, window: float, since: Optional[float], now: float) -> np.ndarray:
+    last = math.floor(now / step) * step  # newest tick whose bucket is complete
+    first = last - (math.ceil(window / step) - 1) * step
+    if since is not None:
+        first = max(first, (math.floor(since / step) + 1) * step)
+    count = int(round((last - first) / step)) + 1
+    if count <= 0:
+        return np.zeros(0)
+    return first + step * np.arange(count)
+
+
+def _align(
+    t: np.ndarray, values: np.ndarray, grid: np.ndarray, step: float, hold: float
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # -> (value per tick, fresh mask, age of the newest page at each tick)
+    keep = ~np.isnan(values)
+    t, values = t[keep], values[keep].astype(np.float64)
+    ticks = len(grid)
+    aligned = np.full(ticks, np.nan)
+    age = np.full(ticks, np.nan)
+    if len(t) == 0:
+        return aligned, np.zeros(ticks, dtype=bool), age
+
+    bucket = np.searchsorted(grid, t, side="left")
+    inside = (bucket < ticks) & (t > grid[0] - step)
+    counts = np.bincount(bucket[inside], minlength=ticks)
+    sums = np.bincount(bucket[inside], weights=values[inside], minlength=ticks)
+    fresh = counts > 0
+    aligned[fresh] = sums[fresh] / counts[fresh]
+
+    newest = np.searchsorted(t, grid, side="right") - 1
+    seen = newest >= 0
+    age[seen] = grid[seen] - t[newest[seen]]
+    held = ~fresh & seen & (age <= hold)
+    aligned[held] = values[newest[held]]
+    return aligned, fresh, age
+
+
+def _number(value: float) -> Optional[float]:
+    return None if value != value else round(float(value), 1)
+
+
+def fuse(
+    sessions: List[Tuple[str, object]],
+    step: float = DEFAULT_STEP_SECONDS,
+    window: float = DEFAULT_WINDOW_SECONDS,
+    since: Optional[float] = None,
+    now: Optional[float] = None,
+) -> dict:
+    if step < 0.1 or step > 60:
+        raise HTTPException(status_code=400, detail="step must be between 0.1 and 60 seconds")
+    if window <= 0 or window / step > MAX_TICKS:
+        raise HTTPException(status_code=400, detail=f"window must be positive and at most {MAX_TICKS} steps")
+    grid = _grid(step, window, since, time.time() if now is None else now)
+
+    fields: Dict[str, List[str]] = {}
+    columns = []
+    if len(grid):
+        for name, session in sessions:
+            # only the samples that can reach the grid: one bucket plus the hold
+            history = session.history.window(since=grid[0] - step - HOLD_SECONDS)
+            t = np.concatenate(history["timestamp"]) if history["timestamp"] else np.zeros(0)
+            provided, aligned_fields = [], {}
+            fresh_any = np.zeros(len(grid), dtype=bool)
+            age_min = np.full(len(grid), np.inf)
+            for field in VALUE_FIELDS:
+                values = np.concatenate(history[field]) if history[field] else np.zeros(0)
+                if not len(values) or np.isnan(values).all():
+                    continue
+                aligned, fresh, age = _align(t, values, grid, step, HOLD_SECONDS)
+                provided.append(field)
+                aligned_fields[field] = aligned
+                fresh_any |= fresh
+                age_min = np.fmin(age_min, age)
+            if not provided:
+                continue
+            fields[name] = provided
+            usable = np.zeros(len(grid), dtype=bool)
+            for aligned in aligned_fields.values():
+                usable |= ~np.isnan(aligned)
+            status = np.where(fresh_any, "fresh", np.where(usable, "stale", "gap"))
+            columns.append((name, aligned_fields, status, age_min))
+
+    frames = []
+    for i, tick in enumerate(grid.tolist()):
+        frame = {"t": round(tick, 3)}
+        for name, aligned_fields, status, age in columns:
+            entry = {field: _number(aligned[i]) for field, aligned in aligned_fields.items()}
+            entry["status"] = str(status[i])
+            entry["age"] = None if not np.isfinite(age[i]) else round(float(age[i]), 3)
+            frame[name] = entry
+        frames.append(frame)
+    return {
+        "step": step,
+        "hold_seconds": HOLD_SECONDS,
+        "until": frames[-1]["t"] if frames else since,
+        "sensors": fields,
+        "frames": frames,
+    }
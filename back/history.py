@@ -0,0 +1,107 @@
+import math
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# ~4.5 h of 4 Hz pages per sensor; older samples are overwritten in place
+HISTORY_CAPACITY = 65536
+
+VALUE_FIELDS = ("power", "cadence", "heart_rate")
+
+
+def ring_segments(start: int, stop: int, capacity: int) -> List[Tuple[int, int]]:
+    # logical [start, stop) -> at most two physical slices of a ring buffer
+    if start >= stop:
+        return []
+    lo, hi = start % capacity, stop % capacity
+    if hi == 0:
+        hi = capacity
+    if lo < hi:
+        return [(lo, hi)]
+    return [(lo, capacity), (0, hi)]
+
+
+class SampleHistory:
+    def __init__(self, capacity: int = HISTORY_CAPACITY):
+        self.capacity = capacity
+        self.timestamp = np.zeros(capacity, dtype=np.float64)
+        self.power = np.full(capacity, np.nan, dtype=np.float32)
+        self.cadence = np.full(capacity, np.nan, dtype=np.float32)
+        self.heart_rate = np.full(capacity, np.nan, dtype=np.float32)
+        # total samples ever appended; the ring position is written % capacity
+        self.written = 0
+
+    def __len__(self) -> int:
+        return min(self.written, self.capacity)
+
+    def append(
+        self,
+        timestamp: float,
+        power: Optional[float],
+        cadence: Optional[float],
+        heart_rate: Optional[float],
+    ) -> None:
+        # single writer (the openant callback thread); only scalar stores into
+        # the preallocated columns, the counter is bumped last so readers never
+        # see a half-written row
+        i = self.written % self.capacity
+        if self.written:
+            # searches assume non-decreasing timestamps; a wall clock stepped
+            # back (NTP, DST on Windows) repeats the last one instead
+            timestamp = max(timestamp, self.timestamp[(self.written - 1) % self.capacity])
+        self.timestamp[i] = timestamp
+        self.power[i] = math.nan if power is None else power
+        self.cadence[i] = math.nan if cadence is None else cadence
+        self.heart_rate[i] = math.nan if heart_rate is None else heart_rate
+        self.written += 1
+
+    def oldest_timestamp(self) -> Optional[float]:
+        if self.written == 0:
+            return None
+        return float(self.timestamp[max(0, self.written - self.capacity) % self.capacity])
+
+    def latest_timestamp(self) -> Optional[float]:
+        if self.written == 0:
+            return None
+        return float(self.timestamp[(self.written - 1) % self.capacity])
+
+    def _segments(self, start: int, stop: int) -> List[Tuple[int, int]]:
+        return ring_segments(start, stop, self.capacity)
+
+    def _first_after(self, start: int, stop: int, cutoff: float) -> int:
+        # timestamps are monotonic in logical order, so each physical segment is
+        # sorted and a binary search per segment is enough
+        offset = start
+        for lo, hi in self._segments(start, stop):
+            pos = int(np.searchsorted(self.timestamp[lo:hi], cutoff, side="right"))
+            if pos < hi - lo:
+                return offset + pos
+            offset += hi - lo
+        return stop
+
+    def window(
+        self, since: Optional[float] = None, seconds: Optional[float] = None
+    ) -> Dict[str, List[np.ndarray]]:
+        stop = self.written
+        start = max(0, stop - self.capacity)
+        latest = self.latest_timestamp()
+
+        cutoff = since
+        if seconds is not None and latest is not None:
+            window_start = latest - seconds
+            cutoff = window_start if cutoff is None else max(cutoff, window_start)
+        if cutoff is not None:
+            start = self._first_after(start, stop, cutoff)
+
+        segments = self._segments(start, stop)
+        return {
+            name: [getattr(self, name)[lo:hi] for lo, hi in segments]
+            for name in ("timestamp", *VALUE_FIELDS)
+        }
+
+
+def column_to_list(views: List[np.ndarray]) -> List[Optional[float]]:
+    values: List[Optional[float]] = []
+    for view in views:
+        values.extend(None if v != v else v for v in view.tolist())
+    return values
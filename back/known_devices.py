@@ -0,0 +1,185 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import state
+from discovery import _sensor_key, _sensor_label
+from fastapi import HTTPException
+from models import Sensor
+from openant.devices.common import DeviceType
+from paths import DATA_DIR
+from registry import registry
+from sensor_service import connect_sensor, reopen_sensor
+
+KNOWN_DEVICES_PATH = DATA_DIR / "known_devices.json"
+RECONNECT_WORKERS = 8
+STALE_SECONDS = 10.0
+WATCHDOG_INTERVAL_SECONDS = 2.0
+BACKOFF_INITIAL_SECONDS = 5.0
+BACKOFF_MAX_SECONDS = 120.0
+
+
+def _device_name(dev_type: int) -> str:
+    try:
+        return DeviceType(dev_type).name
+    except ValueError:
+        return str(dev_type)
+
+
+class KnownDevices:
+    # same layout as openant's Scanner.save: {"devices": [{device, id, type, transmission_type}]}
+    def __init__(self, path: Path = KNOWN_DEVICES_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._devices: Dict[str, dict] = {}
+        try:
+            data = json.loads(path.read_text())
+            for entry in data.get("devices", []):
+                key = _sensor_key(entry["type"], entry["transmission_type"], entry["id"])
+                self._devices[key] = entry
+        except (OSError, ValueError, KeyError) as exc:
+            if path.exists():
+                print(f"[known] ignoring unreadable {path}: {exc}")
+
+    def _save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".json.tmp")
+        tmp_path.write_text(json.dumps({"devices": list(self._devices.values())}, indent=4, sort_keys=True))
+        os.replace(tmp_path, self.path)
+
+    def remember(self, session) -> None:
+        sensor = session.sensor
+        if sensor is None or getattr(session.dev, "node", None) is None:
+            return  # replayed sessions have no radio behind them
+        with self._lock:
+            self._devices[sensor.name] = {
+                "device": _device_name(sensor.type),
+                "id": sensor.id,
+                "type": sensor.type,
+                "transmission_type": sensor.trans,
+                "last_connected": round(time.time()),
+            }
+            self._save()
+
+    def forget(self, name: str) -> dict:
+        with self._lock:
+            if self._devices.pop(name, None) is None:
+                raise HTTPException(status_code=404, detail="Unknown device")
+            self._save()
+        return {"status": "forgotten", "sensor": name}
+
+    def names(self) -> set:
+        return set(self._devices)
+
+    def sensors(self) -> List[Sensor]:
+        with self._lock:
+            entries = list(self._devices.values())
+        return [
+            Sensor(
+                name=_sensor_key(entry["type"], entry["transmission_type"], entry["id"]),
+                id=entry["id"],
+                type=entry["type"],
+                trans=entry["transmission_type"],
+                pretty=_sensor_label(entry["type"], entry["id"]),
+            )
+            for entry in entries
+        ]
+
+
+def _try_connect(name: str) -> Tuple[str, Optional[str]]:
+    try:
+        connect_sensor(name)
+        return name, None
+    except HTTPException as exc:
+        return name, exc.detail
+    except Exception as exc:
+        return name, str(exc)
+
+
+def reconnect_known() -> dict:
+    # open a channel for every remembered device straight away: each channel
+    # searches for its own device id, so no scan is needed first
+    sensors = known_devices.sensors()
+    for sensor in sensors:
+        if sensor.name not in state.last_discovered:
+            state.last_discovered[sensor.name] = sensor
+    if not sensors:
+        return {"connected": [], "failed": {}}
+
+    with ThreadPoolExecutor(max_workers=min(RECONNECT_WORKERS, len(sensors))) as pool:
+        results = list(pool.map(_try_connect, [sensor.name for sensor in sensors]))
+    failed = {name: error for name, error in results if error is not None}
+    connected = [name for name, error in results if error is None]
+    print(f"[known] reconnected {len(connected)} device(s), {len(failed)} failed")
+    return {"connected": connected, "failed": failed}
+
+
+class SessionWatchdog:
+    def __init__(self, stale_seconds: float = STALE_SECONDS, interval: float = WATCHDOG_INTERVAL_SECONDS):
+        self.stale_seconds = stale_seconds
+        self.interval = interval
+        self.reconnects = 0
+        self.failures = 0
+        # name -> (next attempt at, delay after that)
+        self._backoff: Dict[str, Tuple[float, float]] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="session-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.check(time.time())
+
+    def check(self, now: float) -> None:
+        for name, session in state.sessions.items():
+            if getattr(session.dev, "node", None) is None:
+                continue
+            sample = session.last_sample
+            if sample is not None and now - sample.timestamp < self.stale_seconds:
+                self._backoff.pop(name, None)
+                continue
+            # a freshly (re)opened channel gets the full window to find its device
+            last = max(sample.timestamp if sample is not None else 0.0, session.connected_at)
+            if now - last < self.stale_seconds:
+                continue
+            next_at, delay = self._backoff.get(name, (0.0, BACKOFF_INITIAL_SECONDS))
+            if now < next_at:
+                continue
+            self._backoff[name] = (now + delay, min(delay * 2, BACKOFF_MAX_SECONDS))
+            try:
+                reopen_sensor(name)
+                self.reconnects += 1
+                print(f"[watchdog] no data from {session.sensor_pretty} for {now - last:.0f}s; reopened channel")
+            except Exception as exc:
+                self.failures += 1
+                print(f"[watchdog] reopening {session.sensor_pretty} failed: {exc}")
+        for name in list(self._backoff):
+            if name not in state.sessions:
+                del self._backoff[name]
+
+    def stats(self) -> dict:
+        return {
+            "running": self._thread is not None and self._thread.is_alive(),
+            "stale_seconds": self.stale_seconds,
+            "reconnects": self.reconnects,
+            "failures": self.failures,
+            "backing_off": sorted(self._backoff),
+        }
+
+
+known_devices = KnownDevices()
+registry.on_connect(known_devices.remember)
+watchdog = SessionWatchdog()
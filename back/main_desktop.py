@@ -1,12 +1,24 @@
+import multiprocessing
 import os
 
-import uvicorn
-from api import app
+# before anything heavy, so its boot timestamp covers the API imports
+import startup  # noqa: F401
 
 
 def main():
+    # imported here rather than at the top so spawned children (ANT_PROCESS)
+    # do not load the API on start
+    import uvicorn
+    from api import app
+    from node_manager import use_ant_process, use_simulator
+
+    if os.environ.get("ANT_SIMULATOR"):
+        use_simulator()
+    if os.environ.get("ANT_PROCESS"):
+        use_ant_process()
     port = int(os.environ.get("APP_PORT", "8000"))
     uvicorn.run(app, host="127.0.0.1", port=port, log_level="info")
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     main()
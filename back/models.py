@@ -1,4 +1,6 @@
-from pydantic import BaseModel
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class Sensor(BaseModel):
@@ -7,3 +9,31 @@ class Sensor(BaseModel):
     type: int
     trans: int
     pretty: str
+
+
+class ProgressiveRange(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+    from_: int = Field(alias="from")
+    to: int
+
+
+class WorkoutStep(BaseModel):
+    ftp_percent: Optional[int] = None
+    duration: int
+    rpm: Optional[int] = None
+    progressive_range: Optional[ProgressiveRange] = None
+
+
+class WorkoutLoad(BaseModel):
+    steps: Optional[List[WorkoutStep]] = None
+    name: Optional[str] = None
+    trainer: Optional[str] = None
+
+
+class ErgBatch(BaseModel):
+    target_watts: Optional[int] = None
+    ftp_percent: Optional[float] = None
+    trainers: Optional[List[str]] = None
+    rider_ftp: Optional[Dict[str, int]] = None
+    deadline_ms: int = 2000
@@ -1,31 +1,86 @@
-import threading
-import time
+import os
+from typing import Callable, List
 
 from fastapi import HTTPException
+from node_pool import ChannelNode, PooledNode, pool
+from openant.base.message import Message
 from openant.devices import ANTPLUS_NETWORK_KEY
+from openant.easy.exception import AntException
 from openant.easy.node import Node
 from state import node
 from usb_patch import patch_usb_errors
 
 ANT_NETWORK_NUMBER = 0x00
 
+node_factory: Callable[[], Node] = Node
+# nodes, sessions and ERG workers live in a child process (see ant_process)
+run_in_process = False
+
+
+def use_simulator() -> None:
+    global node_factory
+    from sim_node import SimulatedNode
+
+    node_factory = SimulatedNode.from_env
+    print("[startup] using simulated ANT node")
+
+
+def use_ant_process() -> None:
+    global run_in_process
+    run_in_process = True
+    print("[startup] running ANT nodes in a separate process")
+
+
+def _bring_up(added: List[PooledNode]) -> None:
+    for pooled in added:
+        # the Node worker asks the stick for its capabilities on start; the answer
+        # means it is taking commands and max_channels is real (simulated nodes
+        # are ready at once)
+        wait = getattr(pooled.node, "wait_for_special", None)
+        if wait is not None:
+            try:
+                wait(Message.ID.RESPONSE_CAPABILITIES)
+            except AntException as exc:
+                print(f"[startup] {pooled.label} did not report capabilities: {exc}")
+        pooled.node.set_network_key(ANT_NETWORK_NUMBER, ANTPLUS_NETWORK_KEY)
+
 
 def start_node() -> Node:
     global node
     if node is not None:
         return node
 
-    patch_usb_errors()
-    ant_node = Node()
-    threading.Thread(target=ant_node.start, daemon=True).start()
-    time.sleep(0.2)
-    ant_node.set_network_key(ANT_NETWORK_NUMBER, ANTPLUS_NETWORK_KEY)
-    node = ant_node
-    print("[startup] ANT node started and network key set")
-    return ant_node
+    if node_factory is Node:
+        patch_usb_errors()
+        added = pool.open_sticks()
+        if not added:
+            # no stick enumerated (e.g. no libusb backend): let openant pick
+            added = [pool.add(ChannelNode(), "usb")]
+    else:
+        count = int(os.environ.get("ANT_SIM_NODES", "1"))
+        added = [pool.add(node_factory(), f"sim:{i}") for i in range(count)]
+    _bring_up(added)
+    node = pool.primary
+    print(f"[startup] {len(added)} ANT node(s) started and network key set")
+    return node
+
+
+def add_new_sticks() -> dict:
+    if node_factory is not Node:
+        return pool.stats()
+    added = pool.open_sticks()
+    if added:
+        _bring_up(added)
+    return pool.stats()
 
 
 def require_node() -> Node:
     if node is None:
         raise HTTPException(status_code=500, detail="ANT node not initialized")
     return node
+
+
+def place_channel() -> Node:
+    # node that should host the next device channel
+    require_node()
+    return pool.least_loaded()
@@ -0,0 +1,216 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+import usb.core
+from fastapi import HTTPException
+from openant.easy.channel import Channel
+from openant.easy.node import Node
+from registry import registry
+
+# vendor/product ids of the ANTUSB2 and ANTUSB-m sticks openant drives
+ANT_USB_IDS = ((0x0FCF, 0x1008), (0x0FCF, 0x1009))
+
+_open_lock = threading.Lock()
+
+
+def list_sticks() -> list:
+    sticks = []
+    for vendor, product in ANT_USB_IDS:
+        try:
+            sticks.extend(usb.core.find(find_all=True, idVendor=vendor, idProduct=product))
+        except (usb.core.NoBackendError, ValueError) as exc:
+            print(f"[nodes] cannot enumerate USB devices: {exc}")
+            return []
+    return sticks
+
+
+def stick_key(device) -> Tuple[int, int]:
+    return (device.bus, device.address)
+
+
+def stick_label(device) -> str:
+    return f"usb:{device.bus}-{device.address}"
+
+
+@contextmanager
+def _pinned_stick(device):
+    # openant's USB driver opens whatever usb.core.find returns first for its
+    # vendor/product id, so answer those lookups with the stick we want
+    original_find = usb.core.find
+
+    def find(*args, **kwargs):
+        if kwargs.get("find_all"):
+            return original_find(*args, **kwargs)
+        if (kwargs.get("idVendor"), kwargs.get("idProduct")) == (device.idVendor, device.idProduct):
+            return device
+        return None
+
+    with _open_lock:
+        usb.core.find = find
+        try:
+            yield
+        finally:
+            usb.core.find = original_find
+
+
+class _DetachedChannel:
+    # sink for pages that arrive after their channel was removed
+    id = None
+
+    def on_broadcast_data(self, data):
+        pass
+
+    on_burst_data = on_broadcast_tx_data = on_acknowledge_data = on_broadcast_data
+
+
+_DETACHED = _DetachedChannel()
+
+
+class ChannelNode(Node):
+    # openant numbers a new channel by len(channels) and Node._main hands pages
+    # to channels[number], which only holds while channels close last-first.
+    # Here the number comes from the registry's free list and channels stays
+    # indexed by number, a closed channel leaving a detached sink in its slot.
+    def __init__(self):
+        self._slots_lock = threading.Lock()
+        super().__init__()
+
+    def new_channel(self, ctype: int, network_number: int = 0x00, ext_assign=None) -> Channel:
+        if network_number >= self.max_networks:
+            raise RuntimeError(f"Cannot create new channel: network {network_number} out of range")
+        channel = Channel(registry.claim_channel(self), self, self.ant)
+        with self._slots_lock:
+            self.channels.extend([_DETACHED] * (channel.id + 1 - len(self.channels)))
+            self.channels[channel.id] = channel
+        try:
+            channel._assign(ctype, network_number, ext_assign)
+        except Exception:
+            self._vacate(channel)
+            raise
+        return channel
+
+    def remove_channel(self, channel: Channel) -> None:
+        try:
+            channel.close()
+            channel._unassign()
+        except Exception as exc:
+            print(f"[nodes] closing channel {channel.id} failed: {exc}")
+        self._vacate(channel)
+
+    def _vacate(self, channel: Channel) -> None:
+        with self._slots_lock:
+            if channel.id < len(self.channels) and self.channels[channel.id] is channel:
+                self.channels[channel.id] = _DETACHED
+        registry.free_channel(self, channel.id)
+
+
+def open_stick(device) -> Node:
+    with _pinned_stick(device):
+        return ChannelNode()
+
+
+class PooledNode:
+    def __init__(self, index: int, node, label: str, key=None):
+        self.index = index
+        self.node = node
+        self.label = label
+        self.key = key
+        self.started_at = time.monotonic()
+        self._last_count = 0
+        self._last_at = self.started_at
+        self.thread = threading.Thread(target=node.start, name=f"ant-node-{index}", daemon=True)
+
+    @property
+    def channels_used(self) -> int:
+        return sum(1 for channel in self.node.channels if channel is not _DETACHED)
+
+    @property
+    def channels_free(self) -> int:
+        return self.node.max_channels - self.channels_used
+
+    def stats(self, sessions: list) -> dict:
+        now = time.monotonic()
+        messages = sum(session.version for session in sessions)
+        # rate since the previous stats call; falls back to lifetime average
+        elapsed = now - self._last_at
+        rate = (messages - self._last_count) / elapsed if elapsed > 0.5 else None
+        if rate is None or rate < 0:
+            lifetime = now - self.started_at
+            rate = messages / lifetime if lifetime > 0 else 0.0
+        self._last_count, self._last_at = messages, now
+        return {
+            "index": self.index,
+            "label": self.label,
+            "reader_alive": self.thread.is_alive(),
+            "channels_used": self.channels_used,
+            "max_channels": self.node.max_channels,
+            "sessions": [session.sensor_name for session in sessions],
+            "messages": messages,
+            "messages_per_second": round(rate, 1),
+        }
+
+
+class NodePool:
+    def __init__(self):
+        self.nodes: List[PooledNode] = []
+        self._lock = threading.Lock()
+
+    @property
+    def primary(self):
+        return self.nodes[0].node if self.nodes else None
+
+    def add(self, node, label: str, key=None) -> PooledNode:
+        with self._lock:
+            pooled = PooledNode(len(self.nodes), node, label, key)
+            self.nodes.append(pooled)
+        pooled.thread.start()
+        print(f"[nodes] {label} added as node {pooled.index}")
+        return pooled
+
+    def open_sticks(self) -> List[PooledNode]:
+        known = {pooled.key for pooled in self.nodes}
+        added = []
+        for device in list_sticks():
+            if stick_key(device) in known:
+                continue
+            try:
+                node = open_stick(device)
+            except Exception as exc:
+                print(f"[nodes] could not open {stick_label(device)}: {exc}")
+                continue
+            added.append(self.add(node, stick_label(device), stick_key(device)))
+        return added
+
+    def least_loaded(self):
+        with self._lock:
+            candidates = [pooled for pooled in self.nodes if pooled.channels_free > 0]
+        if not candidates:
+            if not self.nodes:
+                raise HTTPException(status_code=500, detail="ANT node not initialized")
+            raise HTTPException(status_code=500, detail="No ANT channel available")
+        return max(candidates, key=lambda pooled: (pooled.channels_free, -pooled.index)).node
+
+    def stats(self) -> dict:
+        by_node: Dict[int, list] = {}
+        for session in registry.sessions.values():
+            node = getattr(session.dev, "node", None)
+            if node is not None:
+                by_node.setdefault(id(node), []).append(session)
+        nodes = [pooled.stats(by_node.get(id(pooled.node), [])) for pooled in list(self.nodes)]
+        return {
+            "nodes": nodes,
+            "channels_used": sum(node["channels_used"] for node in nodes),
+            "max_channels": sum(node["max_channels"] for node in nodes),
+        }
+
+    def stop(self) -> None:
+        for pooled in self.nodes:
+            try:
+                pooled.node.stop()
+            except Exception:
+                pass
+
+
+pool = NodePool()
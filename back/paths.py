@@ -0,0 +1,7 @@
+import os
+from pathlib import Path
+
+DATA_DIR = Path(
+    os.environ.get("ICM_DATA_DIR", Path.home() / ".indoorcyclingmonitor")
+).expanduser()
+RECORDINGS_DIR = DATA_DIR / "recordings"
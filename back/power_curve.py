@@ -0,0 +1,255 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from fastapi import HTTPException
+from numpy.lib.stride_tricks import sliding_window_view
+from paths import RECORDINGS_DIR
+from recorder import RideReader, _ride_paths, list_recordings
+
+MAX_DURATION_SECONDS = 7200
+# durations returned unless the caller asks for specific ones (or "all")
+CURVE_DURATIONS = (
+    1, 2, 3, 5, 10, 15, 20, 30, 45, 60, 90, 120, 180, 240, 300, 360, 480, 600,
+    720, 900, 1200, 1500, 1800, 2400, 3600, 4500, 5400, 7200,
+)
+# cap on the (window ends x durations) block built per live update, in elements
+BLOCK_ELEMENTS = 1 << 20
+PARALLEL_MIN_RIDES = 4
+GAP_SECONDS = 5.0  # same dropout rule as ride_metrics.MAX_GAP_SECONDS
+
+
+def _best_sums(padded: np.ndarray, lo: int, hi: int, max_duration: int) -> np.ndarray:
+    # For every duration w in 1..max_duration, the largest cs[e] - cs[e - w]
+    # over window ends e in [lo, hi]. `padded` is the prefix sum cs with
+    # max_duration +inf entries in front, so windows reaching back before the
+    # ride come out as -inf and never win. Row e of the strided view is
+    # cs[e - max_duration:e], i.e. every window start for that end at once.
+    windows = sliding_window_view(padded, max_duration)
+    step = max(1, BLOCK_ELEMENTS // max_duration)
+    best = np.full(max_duration, -np.inf)
+    for first in range(lo, hi + 1, step):
+        last = min(hi, first + step - 1)
+        ends = padded[max_duration + first:max_duration + last + 1]
+        sums = (ends[:, None] - windows[first:last + 1]).max(axis=0)
+        np.maximum(best, sums[::-1], out=best)
+    return best
+
+
+def mean_max(watts: np.ndarray, max_duration: int = MAX_DURATION_SECONDS) -> np.ndarray:
+    # best average power for 1..max_duration seconds over a 1 Hz series;
+    # NaN for durations longer than the series. For a whole ride one
+    # contiguous pass per duration beats the strided block above.
+    watts = np.asarray(watts, dtype=np.float64)
+    n = len(watts)
+    curve = np.full(max_duration, np.nan)
+    if n == 0:
+        return curve
+    cs = np.zeros(n + 1)
+    np.cumsum(watts, out=cs[1:])
+    scratch = np.empty(n)
+    for w in range(1, min(n, max_duration) + 1):
+        curve[w - 1] = np.subtract(cs[w:], cs[:-w], out=scratch[:n + 1 - w]).max() / w
+    return curve
+
+
+def one_hz(timestamps: np.ndarray, power: np.ndarray) -> np.ndarray:
+    # mean power per wall-clock second; missing seconds hold the previous value
+    # across short gaps and count as zero across dropouts, as RideMetrics does
+    keep = ~np.isnan(power)
+    timestamps, power = timestamps[keep], power[keep].astype(np.float64)
+    if len(timestamps) == 0:
+        return np.zeros(0)
+    seconds = np.floor(timestamps).astype(np.int64)
+    index = seconds - seconds.min()
+    length = int(index.max()) + 1
+    counts = np.bincount(index, minlength=length)
+    sums = np.bincount(index, weights=power, minlength=length)
+    have = counts > 0
+    watts = np.zeros(length)
+    watts[have] = sums[have] / counts[have]
+    if have.all():
+        return watts
+
+    positions = np.arange(length)
+    previous = np.maximum.accumulate(np.where(have, positions, -1))
+    following = np.minimum.accumulate(np.where(have, positions, length)[::-1])[::-1]
+    missing = ~have & (previous >= 0) & (following < length)
+    short = missing & (following - previous - 1 <= GAP_SECONDS)
+    watts[short] = watts[previous[short]]
+    return watts
+
+
+class PowerCurve:
+    # live mean-max curve: each closed second only has to be checked as the
+    # end of one window per duration, so an update is O(max_duration)
+    def __init__(self, max_duration: int = MAX_DURATION_SECONDS, capacity: int = 4 * 3600):
+        self.max_duration = max_duration
+        self.seconds = 0
+        self._padded = np.empty(max_duration + capacity + 1)
+        self._padded[:max_duration] = np.inf
+        self._padded[max_duration] = 0.0
+        self._best = np.full(max_duration, -np.inf)
+
+    def extend(self, watts) -> None:
+        watts = np.asarray(watts, dtype=np.float64)
+        if len(watts) == 0:
+            return
+        lo = self.seconds + 1
+        hi = self.seconds + len(watts)
+        needed = self.max_duration + hi + 1
+        if needed > len(self._padded):
+            grown = np.empty(max(needed, 2 * len(self._padded)))
+            grown[:len(self._padded)] = self._padded
+            self._padded = grown
+        start = self.max_duration + lo
+        self._padded[start:start + len(watts)] = self._padded[start - 1] + np.cumsum(watts)
+        np.maximum(self._best, _best_sums(self._padded, lo, hi, self.max_duration), out=self._best)
+        self.seconds = hi
+
+    def curve(self) -> np.ndarray:
+        curve = self._best / np.arange(1, self.max_duration + 1)
+        curve[~np.isfinite(curve)] = np.nan
+        return curve
+
+
+def parse_durations(durations: Optional[str]) -> List[int]:
+    if durations is None:
+        return list(CURVE_DURATIONS)
+    if durations == "all":
+        return list(range(1, MAX_DURATION_SECONDS + 1))
+    try:
+        values = sorted({int(value) for value in durations.split(",") if value.strip()})
+    except ValueError:
+        raise HTTPException(status_code=400, detail="durations must be comma-separated seconds or 'all'")
+    if not values or values[0] < 1 or values[-1] > MAX_DURATION_SECONDS:
+        raise HTTPException(status_code=400, detail=f"durations must be between 1 and {MAX_DURATION_SECONDS} s")
+    return values
+
+
+def _watts(value) -> Optional[float]:
+    return None if value is None or np.isnan(value) else round(float(value), 1)
+
+
+def curve_points(curve: np.ndarray, durations: List[int]) -> dict:
+    return {
+        "durations": durations,
+        "watts": [_watts(curve[d - 1]) for d in durations],
+    }
+
+
+def live_curve(session, durations: List[int]) -> dict:
+    metrics = session.metrics
+    return {
+        "sensor": session.sensor_name,
+        "seconds": metrics.curve.seconds,
+        **curve_points(metrics.curve.curve(), durations),
+    }
+
+
+def _ride_curves(ride_id: str, directory: Path = RECORDINGS_DIR) -> Dict[str, np.ndarray]:
+    reader = RideReader(ride_id, directory)
+    records = reader.records
+    curves = {}
+    for name, index in reader.sensors.items():
+        rows = records[records["sensor"] == index]
+        power = rows["power"]
+        if len(power) == 0 or np.isnan(power).all():
+            continue
+        curves[name] = mean_max(one_hz(rows["t"], power)).astype(np.float32)
+    return curves
+
+
+def _ride_curves_worker(ride_id: str, directory: str) -> Tuple[str, Dict[str, np.ndarray]]:
+    try:
+        return ride_id, _ride_curves(ride_id, Path(directory))
+    except HTTPException:
+        return ride_id, {}
+
+
+class RideCurveCache:
+    # finished rides never change, so a curve is computed once per ride file;
+    # the key includes the file size in case a ride was still being written
+    def __init__(self, directory: Path = RECORDINGS_DIR):
+        self.directory = directory
+        self._curves: Dict[Tuple[str, int], Dict[str, np.ndarray]] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, ride_id: str) -> Tuple[str, int]:
+        data_path, _ = _ride_paths(ride_id, self.directory)
+        try:
+            return ride_id, data_path.stat().st_size
+        except OSError:
+            raise HTTPException(status_code=404, detail="Unknown ride")
+
+    def get(self, ride_id: str) -> Dict[str, np.ndarray]:
+        return self.get_many([ride_id])[ride_id]
+
+    def get_many(self, ride_ids: List[str]) -> Dict[str, Dict[str, np.ndarray]]:
+        keys = {ride_id: self._key(ride_id) for ride_id in ride_ids}
+        with self._lock:
+            found = {ride_id: self._curves.get(key) for ride_id, key in keys.items()}
+        missing = [ride_id for ride_id, curves in found.items() if curves is None]
+        if len(missing) >= PARALLEL_MIN_RIDES:
+            workers = min(len(missing), os.cpu_count() or 1)
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                computed = dict(pool.map(
+                    _ride_curves_worker, missing, [str(self.directory)] * len(missing)
+                ))
+        else:
+            computed = {ride_id: _ride_curves(ride_id, self.directory) for ride_id in missing}
+        with self._lock:
+            for ride_id, curves in computed.items():
+                self._curves[keys[ride_id]] = curves
+        found.update(computed)
+        return found
+
+
+ride_curves = RideCurveCache()
+
+
+def _pick_sensor(curves: Dict[str, np.ndarray], sensor: Optional[str]) -> Optional[str]:
+    if sensor is not None:
+        return sensor if sensor in curves else None
+    # the sensor with the longest power trace
+    return max(curves, key=lambda name: int(np.count_nonzero(~np.isnan(curves[name]))), default=None)
+
+
+def recording_curve(ride_id: str, sensor: Optional[str], durations: List[int]) -> dict:
+    curves = ride_curves.get(ride_id)
+    name = _pick_sensor(curves, sensor)
+    if name is None:
+        raise HTTPException(status_code=404, detail="No power data in ride")
+    return {"ride_id": ride_id, "sensor": name, **curve_points(curves[name], durations)}
+
+
+def best_curve(ride_ids: Optional[List[str]], durations: List[int]) -> dict:
+    # best effort per duration across rides, and which ride set it
+    if ride_ids is None:
+        ride_ids = [meta["id"] for meta in list_recordings(ride_curves.directory) if meta.get("ended_at")]
+    if not ride_ids:
+        return {"rides": 0, "durations": durations, "watts": [None] * len(durations), "ride_ids": [None] * len(durations)}
+    per_ride = ride_curves.get_many(ride_ids)
+    columns, owners = [], []
+    for ride_id, curves in per_ride.items():
+        name = _pick_sensor(curves, None)
+        if name is not None:
+            columns.append(curves[name])
+            owners.append(ride_id)
+    if not columns:
+        raise HTTPException(status_code=404, detail="No power data in rides")
+    stack = np.vstack(columns)
+    filled = np.where(np.isnan(stack), -np.inf, stack)
+    winner = filled.argmax(axis=0)
+    best = filled[winner, np.arange(stack.shape[1])]
+    best[~np.isfinite(best)] = np.nan
+    return {
+        "rides": len(columns),
+        **curve_points(best, durations),
+        "ride_ids": [owners[winner[d - 1]] if not np.isnan(best[d - 1]) else None for d in durations],
+    }
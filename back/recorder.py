@@ -0,0 +1,259 @@
+import json
+import math
+import os
+import queue
+import re
+import struct
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from fastapi import HTTPException
+from paths import RECORDINGS_DIR
+
+MAGIC = b"ICMRIDE1"
+HEADER = struct.Struct("<8sII")  # magic, format version, record size
+FORMAT_VERSION = 1
+
+# one fixed-size little-endian row per decoded sample; NaN marks "not sent"
+RECORD_DTYPE = np.dtype(
+    [
+        ("t", "<f8"),
+        ("sensor", "<u2"),
+        ("lap", "<i2"),
+        ("power", "<f4"),
+        ("cadence", "<f4"),
+        ("heart_rate", "<f4"),
+        ("target", "<f4"),
+    ]
+)
+
+FLUSH_INTERVAL_SECONDS = 0.5
+FSYNC_INTERVAL_SECONDS = 5.0
+# ride ids become file names under the recordings directory
+RIDE_ID_PATTERN = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+
+def check_ride_id(ride_id: str) -> str:
+    if not RIDE_ID_PATTERN.match(ride_id) or ".." in ride_id:
+        raise HTTPException(status_code=400, detail="Invalid ride id")
+    return ride_id
+
+
+def _ride_paths(ride_id: str, directory: Path = RECORDINGS_DIR):
+    check_ride_id(ride_id)
+    return directory / f"{ride_id}.ride", directory / f"{ride_id}.json"
+
+
+def _nan(value) -> float:
+    return math.nan if value is None else float(value)
+
+
+class RideRecorder:
+    def __init__(self, directory: Path = RECORDINGS_DIR):
+        self.directory = directory
+        self.ride_id: Optional[str] = None
+        self.meta: Optional[dict] = None
+        self.samples = 0
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._sensor_index: Dict[str, int] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        # workout position stamped onto every row; set by the workout engine
+        self.lap = -1
+        self.target: Optional[int] = None
+
+    @property
+    def recording(self) -> bool:
+        return self._thread is not None
+
+    def set_workout_position(self, lap: int, target: Optional[int]) -> None:
+        self.lap = lap
+        self.target = target
+
+    def record(self, sensor_name: Optional[str], timestamp: float, power, cadence, heart_rate) -> None:
+        # called on the openant callback thread: a single non-blocking put,
+        # all encoding and disk work happens on the writer thread
+        if self._thread is None or self._stop.is_set() or sensor_name is None:
+            return
+        self._queue.put(
+            (timestamp, sensor_name, self.lap, power, cadence, heart_rate, self.target)
+        )
+
+    def start(self, sensors: Dict[str, dict], ride_id: Optional[str] = None) -> dict:
+        with self._lock:
+            if self._thread is not None:
+                raise HTTPException(status_code=409, detail="A ride is already being recorded")
+            started = datetime.now(timezone.utc)
+            self.ride_id = check_ride_id(ride_id) if ride_id else started.strftime("%Y%m%dT%H%M%SZ")
+            data_path, _ = _ride_paths(self.ride_id, self.directory)
+            if data_path.exists():
+                raise HTTPException(status_code=409, detail="Ride id already exists")
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+            # a put that raced the previous stop's final drain is not this ride's
+            self._discard_pending()
+            self.samples = 0
+            self._sensor_index = {}
+            self.meta = {
+                "id": self.ride_id,
+                "started_at": started.isoformat(),
+                "ended_at": None,
+                "format": {"version": FORMAT_VERSION, "record_size": RECORD_DTYPE.itemsize},
+                "sensors": [],
+                "samples": 0,
+            }
+            for name, sensor in sensors.items():
+                self._register_sensor(name, sensor)
+            self._write_meta()
+
+            handle = open(data_path, "wb")
+            handle.write(HEADER.pack(MAGIC, FORMAT_VERSION, RECORD_DTYPE.itemsize))
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._writer, args=(handle, sensors), name="ride-recorder", daemon=True
+            )
+            self._thread.start()
+        print(f"[recorder] recording ride {self.ride_id}")
+        return self.status()
+
+    def stop(self) -> dict:
+        with self._lock:
+            thread = self._thread
+            if thread is None:
+                raise HTTPException(status_code=409, detail="No ride is being recorded")
+            self._stop.set()
+            thread.join()
+            self._thread = None
+            self.meta["ended_at"] = datetime.now(timezone.utc).isoformat()
+            self.meta["samples"] = self.samples
+            self._write_meta()
+        print(f"[recorder] ride {self.ride_id} saved ({self.samples} samples)")
+        return self.meta
+
+    def status(self) -> dict:
+        return {
+            "recording": self.recording,
+            "ride_id": self.ride_id,
+            "samples": self.samples,
+            "pending": self._queue.qsize(),
+        }
+
+    def _register_sensor(self, name: str, sensor: Optional[dict]) -> int:
+        index = len(self._sensor_index)
+        self._sensor_index[name] = index
+        self.meta["sensors"].append({"index": index, "name": name, **(sensor or {})})
+        return index
+
+    def _write_meta(self) -> None:
+        _, meta_path = _ride_paths(self.ride_id, self.directory)
+        tmp_path = meta_path.with_suffix(".json.tmp")
+        tmp_path.write_text(json.dumps(self.meta, indent=2))
+        os.replace(tmp_path, meta_path)
+
+    def _discard_pending(self) -> None:
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                return
+
+    def _drain(self, sensors: Dict[str, dict]) -> Optional[np.ndarray]:
+        rows = []
+        while True:
+            try:
+                ts, name, lap, power, cadence, heart_rate, target = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            index = self._sensor_index.get(name)
+            if index is None:
+                index = self._register_sensor(name, sensors.get(name))
+                self._write_meta()
+            rows.append(
+                (ts, index, lap, _nan(power), _nan(cadence), _nan(heart_rate), _nan(target))
+            )
+        if not rows:
+            return None
+        return np.array(rows, dtype=RECORD_DTYPE)
+
+    def _writer(self, handle, sensors: Dict[str, dict]) -> None:
+        last_sync = time.monotonic()
+        try:
+            while True:
+                stopping = self._stop.wait(FLUSH_INTERVAL_SECONDS)
+                batch = self._drain(sensors)
+                if batch is not None:
+                    handle.write(batch.tobytes())
+                    self.samples += len(batch)
+                now = time.monotonic()
+                if stopping or now - last_sync >= FSYNC_INTERVAL_SECONDS:
+                    handle.flush()
+                    os.fsync(handle.fileno())
+                    last_sync = now
+                if stopping:
+                    return
+        finally:
+            handle.close()
+
+
+class RideReader:
+    def __init__(self, ride_id: str, directory: Path = RECORDINGS_DIR):
+        data_path, meta_path = _ride_paths(ride_id, directory)
+        if not data_path.exists() or not meta_path.exists():
+            raise HTTPException(status_code=404, detail="Unknown ride")
+        self.ride_id = ride_id
+        self.meta = json.loads(meta_path.read_text())
+        with open(data_path, "rb") as handle:
+            magic, version, record_size = HEADER.unpack(handle.read(HEADER.size))
+        if magic != MAGIC or record_size != RECORD_DTYPE.itemsize:
+            raise HTTPException(status_code=400, detail="Unsupported ride file format")
+
+        count = (data_path.stat().st_size - HEADER.size) // RECORD_DTYPE.itemsize
+        if count == 0:
+            self.records = np.zeros(0, dtype=RECORD_DTYPE)
+        else:
+            # random access without reading the file: pages are faulted in
+            # only for the ranges that are actually queried
+            self.records = np.memmap(
+                data_path, dtype=RECORD_DTYPE, mode="r", offset=HEADER.size, shape=(count,)
+            )
+        self.sensors: Dict[str, int] = {s["name"]: s["index"] for s in self.meta["sensors"]}
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def range(
+        self,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        sensor: Optional[str] = None,
+    ) -> np.ndarray:
+        timestamps = self.records["t"]
+        lo = 0 if start is None else int(np.searchsorted(timestamps, start, side="left"))
+        hi = len(timestamps) if end is None else int(np.searchsorted(timestamps, end, side="right"))
+        rows = self.records[lo:hi]
+        if sensor is not None:
+            index = self.sensors.get(sensor)
+            if index is None:
+                raise HTTPException(status_code=404, detail="Sensor not in ride")
+            rows = rows[rows["sensor"] == index]
+        return rows
+
+
+def list_recordings(directory: Path = RECORDINGS_DIR) -> List[dict]:
+    if not directory.exists():
+        return []
+    rides = []
+    for meta_path in sorted(directory.glob("*.json"), reverse=True):
+        try:
+            rides.append(json.loads(meta_path.read_text()))
+        except (OSError, ValueError):
+            continue
+    return rides
+
+
+recorder = RideRecorder()
@@ -0,0 +1,255 @@
+import threading
+from collections.abc import MutableMapping
+from typing import Callable, Dict, Iterator, List
+
+from fastapi import HTTPException
+
+
+class LabelIndex(MutableMapping):
+    # name -> item, with secondary indexes on the pretty label and device id
+    def __init__(self, id_of: Callable, pretty_of: Callable):
+        self._id_of = id_of
+        self._pretty_of = pretty_of
+        self._lock = threading.RLock()
+        self._by_name: Dict[str, object] = {}
+        self._by_pretty: Dict[str, object] = {}
+        self._by_id: Dict[int, object] = {}
+
+    def __getitem__(self, name: str):
+        with self._lock:
+            return self._by_name[name]
+
+    def __setitem__(self, name: str, item) -> None:
+        with self._lock:
+            if name in self._by_name:
+                self._unindex(self._by_name[name])
+            self._by_name[name] = item
+            self._index(item)
+
+    def __delitem__(self, name: str) -> None:
+        with self._lock:
+            item = self._by_name.pop(name)
+            self._unindex(item)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._by_name))
+
+    def __len__(self) -> int:
+        return len(self._by_name)
+
+    def __contains__(self, name) -> bool:
+        with self._lock:
+            return name in self._by_name
+
+    def get(self, name, default=None):
+        with self._lock:
+            return self._by_name.get(name, default)
+
+    def items(self) -> list:
+        with self._lock:
+            return list(self._by_name.items())
+
+    def values(self) -> list:
+        with self._lock:
+            return list(self._by_name.values())
+
+    def _index(self, item) -> None:
+        pretty, item_id = self._pretty_of(item), self._id_of(item)
+        if pretty is not None:
+            self._by_pretty.setdefault(pretty, item)
+        if item_id is not None:
+            self._by_id.setdefault(item_id, item)
+
+    def _unindex(self, item) -> None:
+        pretty, item_id = self._pretty_of(item), self._id_of(item)
+        if self._by_pretty.get(pretty) is item:
+            del self._by_pretty[pretty]
+            replacement = next((i for i in self._by_name.values() if self._pretty_of(i) == pretty), None)
+            if replacement is not None:
+                self._by_pretty[pretty] = replacement
+        if self._by_id.get(item_id) is item:
+            del self._by_id[item_id]
+            replacement = next((i for i in self._by_name.values() if self._id_of(i) == item_id), None)
+            if replacement is not None:
+                self._by_id[item_id] = replacement
+
+    def by_pretty(self, pretty: str):
+        with self._lock:
+            return self._by_pretty.get(pretty)
+
+    def by_id(self, item_id: int):
+        with self._lock:
+            return self._by_id.get(item_id)
+
+    def lookup(self, identifier: str):
+        # under the lock, so the secondary indexes are never seen mid-update
+        with self._lock:
+            item = self._by_name.get(identifier) or self._by_pretty.get(identifier)
+            if item is None:
+                try:
+                    item = self._by_id.get(int(identifier))
+                except ValueError:
+                    pass
+            return item
+
+
+class SessionRegistry:
+    def __init__(self):
+        self.sessions = LabelIndex(lambda s: s.sensor_id, lambda s: s.sensor_pretty)
+        self.discovered = LabelIndex(lambda s: s.id, lambda s: s.pretty)
+        self._lock = threading.Lock()
+        self._connected = threading.Condition(self._lock)
+        self._connecting: set = set()
+        self._channel_lock = threading.Lock()
+        self._node_locks: Dict[int, threading.Lock] = {}
+        self._channels: Dict[int, set] = {}
+        self._connect_listeners: List[Callable] = []
+        self._release_listeners: List[Callable] = []
+
+    # channel numbers in use per node; ChannelNode takes its numbers from here
+    # instead of openant's len(channels)
+
+    def claim_channel(self, node) -> int:
+        with self._channel_lock:
+            used = self._channels.setdefault(id(node), set())
+            for number in range(node.max_channels):
+                if number not in used:
+                    used.add(number)
+                    return number
+        raise RuntimeError(f"Cannot create new channel: >= supported number of channels {node.max_channels}")
+
+    def free_channel(self, node, number: int) -> None:
+        with self._channel_lock:
+            self._channels.get(id(node), set()).discard(number)
+
+    def on_release(self, callback: Callable) -> None:
+        self._release_listeners.append(callback)
+
+    def on_connect(self, callback: Callable) -> None:
+        self._connect_listeners.append(callback)
+
+    def _node_lock(self, node) -> threading.Lock:
+        with self._channel_lock:
+            return self._node_locks.setdefault(id(node), threading.Lock())
+
+    def _create_on(self, node, create: Callable):
+        # one device setup at a time per node, so a failed setup only ever
+        # leaves its own half-opened channel behind; nodes work in parallel
+        with self._node_lock(node):
+            before = set(map(id, node.channels))
+            try:
+                return create()
+            except RuntimeError:
+                self._drop_new_channels(node, before)
+                raise HTTPException(status_code=500, detail="No ANT channel available")
+            except Exception:
+                self._drop_new_channels(node, before)
+                raise
+
+    @staticmethod
+    def _drop_new_channels(node, before: set) -> None:
+        for channel in list(node.channels):
+            if getattr(channel, "id", None) is None or id(channel) in before:
+                continue
+            try:
+                node.remove_channel(channel)
+            except Exception as exc:
+                print(f"[registry] could not drop channel {channel.id}: {exc}")
+
+    def connect(self, name: str, node, create: Callable):
+        with self._lock:
+            while name in self._connecting:
+                self._connected.wait()
+            existing = self.sessions.get(name)
+            if existing is not None:
+                return existing, False
+            self._connecting.add(name)
+        try:
+            session = self._create_on(node, create)
+            with self._lock:
+                self.sessions[name] = session
+        finally:
+            with self._lock:
+                self._connecting.discard(name)
+                self._connected.notify_all()
+        self._notify(self._connect_listeners, session)
+        return session, True
+
+    def adopt(self, sessions: Dict[str, object]) -> None:
+        # register ready-made sessions (ride replay) all or none, refusing any
+        # name that is connected or being connected live
+        with self._lock:
+            for name in sessions:
+                if name in self._connecting or name in self.sessions:
+                    raise HTTPException(status_code=409, detail=f"Sensor {name} is connected live")
+            for name, session in sessions.items():
+                self.sessions[name] = session
+
+    def release(self, session) -> None:
+        # drop a session registered through adopt, if it is still the one
+        # registered under its name
+        with self._lock:
+            names = [name for name, candidate in self.sessions.items() if candidate is session]
+            for name in names:
+                del self.sessions[name]
+        if names:
+            self._release(session)
+
+    def reopen(self, name: str, place: Callable, create_device: Callable):
+        # swap a fresh channel under an existing session, keeping its history;
+        # marked as connecting so connect/disconnect of the name wait for it
+        with self._lock:
+            while name in self._connecting:
+                self._connected.wait()
+            session = self.sessions.get(name)
+            if session is None:
+                raise HTTPException(status_code=400, detail="Sensor not connected")
+            self._connecting.add(name)
+        try:
+            session.close()
+            node = place()
+            session.rebind(self._create_on(node, lambda: create_device(node)))
+        finally:
+            with self._lock:
+                self._connecting.discard(name)
+                self._connected.notify_all()
+        return session
+
+    def disconnect(self, identifier: str):
+        with self._lock:
+            while True:
+                session = self.sessions.lookup(identifier)
+                if session is None:
+                    raise HTTPException(status_code=400, detail="Sensor not connected")
+                if session.sensor_name not in self._connecting:
+                    break
+                self._connected.wait()
+            for name, candidate in self.sessions.items():
+                if candidate is session:
+                    del self.sessions[name]
+        self._release(session)
+        return session
+
+    def close_all(self) -> List[str]:
+        with self._lock:
+            released = self.sessions.items()
+            for name, _ in released:
+                del self.sessions[name]
+        for _, session in released:
+            self._release(session)
+        return [name for name, _ in released]
+
+    def _notify(self, listeners: List[Callable], session) -> None:
+        for callback in listeners:
+            try:
+                callback(session)
+            except Exception as exc:
+                print(f"[registry] hook failed for {session.sensor_name}: {exc}")
+
+    def _release(self, session) -> None:
+        self._notify(self._release_listeners, session)
+        session.close()
+        print(f"[registry] released {session.sensor_pretty or session.sensor_name}")
+
+
+registry = SessionRegistry()
@@ -0,0 +1,141 @@
+import math
+import threading
+import time
+from typing import Dict, Optional
+
+from fastapi import HTTPException
+from models import Sensor
+from openant.devices.heart_rate import HeartRateData
+from openant.devices.power_meter import PowerData
+from recorder import RideReader
+from registry import registry
+from sessions import AntSession
+
+
+class ReplayDevice:
+    # stands in for an openant device so replayed sessions look connected
+    def __init__(self, sensor: Sensor):
+        self.device_id = sensor.id
+        self.device_type = sensor.type
+        self.channel = None
+        self.on_device_data = None
+
+    def open_channel(self):
+        pass
+
+    def close_channel(self):
+        pass
+
+
+class ReplaySession(AntSession):
+    # replayed pages are old data stamped with the current time; keep them
+    # out of a ride being recorded meanwhile
+    recorded = False
+
+
+class RideReplay:
+    def __init__(self):
+        self.reader: Optional[RideReader] = None
+        self.speed = 1.0
+        self.position = 0
+        self._sessions: Dict[int, AntSession] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, ride_id: str, speed: float = 1.0) -> dict:
+        if speed <= 0:
+            raise HTTPException(status_code=400, detail="Speed must be positive")
+        if self.running:
+            raise HTTPException(status_code=409, detail="A replay is already running")
+        reader = RideReader(ride_id)
+
+        sessions: Dict[int, AntSession] = {}
+        for meta in reader.meta["sensors"]:
+            name = meta["name"]
+            sensor = Sensor(
+                name=name,
+                id=meta.get("id", 0),
+                type=meta.get("type", 0),
+                trans=meta.get("trans", 0),
+                pretty=meta.get("pretty", name),
+            )
+            sessions[meta["index"]] = ReplaySession(ReplayDevice(sensor), sensor)
+        registry.adopt({session.sensor_name: session for session in sessions.values()})
+
+        self.reader, self.speed, self.position = reader, speed, 0
+        self._sessions = sessions
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="ride-replay", daemon=True)
+        self._thread.start()
+        return self.status()
+
+    def stop(self) -> dict:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._release()
+        return self.status()
+
+    def status(self) -> dict:
+        return {
+            "running": self.running,
+            "ride_id": self.reader.ride_id if self.reader else None,
+            "speed": self.speed,
+            "position": self.position,
+            "samples": len(self.reader) if self.reader else 0,
+        }
+
+    def _release(self) -> None:
+        sessions, self._sessions = self._sessions, {}
+        for session in sessions.values():
+            registry.release(session)
+
+    def _run(self) -> None:
+        try:
+            self._play()
+        finally:
+            # a replay that runs to the end frees its sensor names as well
+            self._release()
+
+    def _play(self) -> None:
+        records = self.reader.records
+        if len(records) == 0:
+            return
+        first = float(records[0]["t"])
+        started = time.monotonic()
+        for index, row in enumerate(records):
+            due = started + (float(row["t"]) - first) / self.speed
+            delay = due - time.monotonic()
+            if delay > 0.001 and self._stop.wait(delay):
+                return
+            if self._stop.is_set():
+                return
+            self.position = index + 1
+
+            session = self._sessions.get(int(row["sensor"]))
+            if session is None:
+                continue
+            # rebuild the page objects openant would have produced so the
+            # session takes exactly the same path as live data
+            heart_rate = float(row["heart_rate"])
+            power = float(row["power"])
+            if not math.isnan(heart_rate):
+                session._on_data(session.dev, "heart_rate", HeartRateData(heart_rate=int(heart_rate)))
+            elif not math.isnan(power):
+                cadence = float(row["cadence"])
+                session._on_data(
+                    session.dev,
+                    "standard_power",
+                    PowerData(
+                        instantaneous_power=int(power),
+                        cadence=None if math.isnan(cadence) else int(cadence),
+                    ),
+                )
+
+
+replay = RideReplay()
@@ -0,0 +1,412 @@
+import queue
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+import state
+from fastapi import HTTPException
+from paths import DATA_DIR, RECORDINGS_DIR
+from power_curve import CURVE_DURATIONS, mean_max, one_hz
+from recorder import RideReader, list_recordings
+from ride_metrics import NP_WINDOW_SECONDS
+
+CATALOG_PATH = DATA_DIR / "rides.sqlite3"
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rides (
+    ride_id TEXT PRIMARY KEY,
+    started_at REAL NOT NULL,
+    week TEXT NOT NULL,
+    seconds INTEGER NOT NULL,
+    samples INTEGER NOT NULL,
+    avg_power REAL,
+    max_power REAL,
+    normalized_power REAL,
+    intensity_factor REAL,
+    tss REAL,
+    kilojoules REAL,
+    avg_hr REAL,
+    max_hr REAL,
+    ftp INTEGER
+);
+CREATE INDEX IF NOT EXISTS rides_started ON rides (started_at);
+
+CREATE TABLE IF NOT EXISTS ride_devices (
+    ride_id TEXT NOT NULL REFERENCES rides (ride_id) ON DELETE CASCADE,
+    sensor TEXT NOT NULL,
+    device_id INTEGER,
+    device_type INTEGER,
+    pretty TEXT,
+    PRIMARY KEY (ride_id, sensor)
+);
+CREATE INDEX IF NOT EXISTS ride_devices_sensor ON ride_devices (sensor);
+CREATE INDEX IF NOT EXISTS ride_devices_device ON ride_devices (device_id, device_type);
+
+CREATE TABLE IF NOT EXISTS ride_intervals (
+    ride_id TEXT NOT NULL REFERENCES rides (ride_id) ON DELETE CASCADE,
+    lap INTEGER NOT NULL,
+    started_at REAL NOT NULL,
+    seconds REAL NOT NULL,
+    avg_power REAL,
+    avg_cadence REAL,
+    avg_hr REAL,
+    target REAL,
+    PRIMARY KEY (ride_id, lap)
+);
+
+CREATE TABLE IF NOT EXISTS best_efforts (
+    ride_id TEXT NOT NULL REFERENCES rides (ride_id) ON DELETE CASCADE,
+    duration INTEGER NOT NULL,
+    watts REAL NOT NULL,
+    started_at REAL NOT NULL,
+    PRIMARY KEY (ride_id, duration)
+);
+CREATE INDEX IF NOT EXISTS best_efforts_rank ON best_efforts (duration, watts DESC);
+CREATE INDEX IF NOT EXISTS best_efforts_time ON best_efforts (duration, started_at);
+
+-- rollups maintained on every insert/delete so these are plain reads
+CREATE TABLE IF NOT EXISTS weekly_load (
+    week TEXT PRIMARY KEY,
+    rides INTEGER NOT NULL,
+    seconds INTEGER NOT NULL,
+    tss REAL NOT NULL,
+    kilojoules REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS device_usage (
+    sensor TEXT PRIMARY KEY,
+    device_id INTEGER,
+    device_type INTEGER,
+    pretty TEXT,
+    rides INTEGER NOT NULL,
+    seconds INTEGER NOT NULL,
+    last_ride REAL NOT NULL
+);
+"""
+
+
+def _week(started_at: float) -> str:
+    # Monday of the (UTC) week, e.g. "2026-10-12"
+    day = datetime.fromtimestamp(started_at, timezone.utc).date()
+    return (day - timedelta(days=day.weekday())).isoformat()
+
+
+def _timestamp(value: Optional[str]) -> Optional[float]:
+    # ISO dates without an offset are UTC, like the weeks above
+    if value is None:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid date: {value}")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def _mean(values: np.ndarray) -> Optional[float]:
+    values = values[~np.isnan(values)]
+    return round(float(values.mean()), 1) if len(values) else None
+
+
+def _busiest(reader: RideReader, field: str) -> Optional[np.ndarray]:
+    # rows of the sensor that sent the most values of `field`
+    records = reader.records
+    best, best_count = None, 0
+    for index in reader.sensors.values():
+        rows = records[records["sensor"] == index]
+        count = int(np.count_nonzero(~np.isnan(rows[field])))
+        if count > best_count:
+            best, best_count = rows, count
+    return best
+
+
+def summarize(reader: RideReader, ftp: int) -> dict:
+    # everything the catalog stores for one ride, derived from the recording so
+    # live rides and backfilled ones are summarised the same way
+    records = reader.records
+    started_at = float(records["t"][0]) if len(records) else _timestamp(reader.meta["started_at"])
+    ride = {
+        "ride_id": reader.ride_id,
+        "started_at": started_at,
+        "week": _week(started_at),
+        "seconds": 0,
+        "samples": len(records),
+        "avg_power": None,
+        "max_power": None,
+        "normalized_power": None,
+        "intensity_factor": None,
+        "tss": None,
+        "kilojoules": None,
+        "avg_hr": None,
+        "max_hr": None,
+        "ftp": ftp,
+    }
+    efforts = []
+    power_rows = _busiest(reader, "power")
+    if power_rows is not None:
+        watts = one_hz(power_rows["t"], power_rows["power"])
+        ride["seconds"] = len(watts)
+        ride["avg_power"] = round(float(watts.mean()), 1)
+        ride["max_power"] = round(float(np.nanmax(power_rows["power"])), 1)
+        ride["kilojoules"] = round(float(watts.sum()) / 1000, 2)
+        if len(watts) >= NP_WINDOW_SECONDS:
+            cs = np.concatenate(([0.0], np.cumsum(watts)))
+            rolling = (cs[NP_WINDOW_SECONDS:] - cs[:-NP_WINDOW_SECONDS]) / NP_WINDOW_SECONDS
+            normalized = float(np.mean(rolling ** 4) ** 0.25)
+            intensity = normalized / ftp if ftp else None
+            ride["normalized_power"] = round(normalized, 1)
+            if intensity is not None:
+                ride["intensity_factor"] = round(intensity, 3)
+                ride["tss"] = round(len(watts) * normalized * intensity / (ftp * 3600) * 100, 1)
+        durations = [d for d in CURVE_DURATIONS if d <= len(watts)]
+        if durations:
+            curve = mean_max(watts, durations[-1])
+            efforts = [(reader.ride_id, d, round(float(curve[d - 1]), 1), started_at) for d in durations]
+
+    hr_rows = _busiest(reader, "heart_rate")
+    if hr_rows is not None:
+        heart_rate = hr_rows["heart_rate"]
+        ride["avg_hr"] = _mean(heart_rate)
+        ride["max_hr"] = float(np.nanmax(heart_rate))
+        if not ride["seconds"]:
+            ride["seconds"] = int(hr_rows["t"][-1] - hr_rows["t"][0])
+
+    intervals = []
+    laps = records["lap"]
+    for lap in np.unique(laps[laps >= 0]).tolist():
+        rows = records[laps == lap]
+        intervals.append((
+            reader.ride_id, lap, float(rows["t"][0]), round(float(rows["t"][-1] - rows["t"][0]), 1),
+            _mean(rows["power"]), _mean(rows["cadence"]), _mean(rows["heart_rate"]), _mean(rows["target"]),
+        ))
+
+    devices = [
+        (reader.ride_id, sensor["name"], sensor.get("id"), sensor.get("type"), sensor.get("pretty"))
+        for sensor in reader.meta["sensors"]
+    ]
+    return {"ride": ride, "devices": devices, "intervals": intervals, "efforts": efforts}
+
+
+def _rows(cursor: sqlite3.Cursor) -> List[dict]:
+    names = [column[0] for column in cursor.description]
+    return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+
+class RideCatalog:
+    def __init__(self, path: Path = CATALOG_PATH, recordings: Path = RECORDINGS_DIR):
+        self.path = path
+        self.recordings = recordings
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        # opened on first use; one connection shared under the lock
+        if self._db is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False)
+            db.execute("PRAGMA journal_mode = WAL")
+            db.execute("PRAGMA synchronous = NORMAL")
+            db.execute("PRAGMA foreign_keys = ON")
+            db.executescript(SCHEMA)
+            db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            self._db = db
+        return self._db
+
+    def _query(self, sql: str, params=()) -> List[dict]:
+        with self._lock:
+            return _rows(self._connection().execute(sql, params))
+
+    def _remove(self, db: sqlite3.Connection, ride_id: str) -> None:
+        old = db.execute(
+            "SELECT week, seconds, tss, kilojoules FROM rides WHERE ride_id = ?", (ride_id,)
+        ).fetchone()
+        if old is None:
+            return
+        week, seconds, tss, kilojoules = old
+        db.execute(
+            "UPDATE weekly_load SET rides = rides - 1, seconds = seconds - ?, tss = tss - ?,"
+            " kilojoules = kilojoules - ? WHERE week = ?",
+            (seconds, tss or 0.0, kilojoules or 0.0, week),
+        )
+        db.execute("DELETE FROM weekly_load WHERE week = ? AND rides <= 0", (week,))
+        for (sensor,) in db.execute("SELECT sensor FROM ride_devices WHERE ride_id = ?", (ride_id,)).fetchall():
+            db.execute(
+                "UPDATE device_usage SET rides = rides - 1, seconds = seconds - ?, last_ride = COALESCE("
+                " (SELECT MAX(r.started_at) FROM ride_devices d JOIN rides r USING (ride_id)"
+                "  WHERE d.sensor = ? AND r.ride_id != ?), 0) WHERE sensor = ?",
+                (seconds, sensor, ride_id, sensor),
+            )
+        db.execute("DELETE FROM device_usage WHERE rides <= 0")
+        db.execute("DELETE FROM rides WHERE ride_id = ?", (ride_id,))
+
+    def add(self, summary: dict) -> None:
+        ride = summary["ride"]
+        columns = ", ".join(ride)
+        marks = ", ".join("?" * len(ride))
+        with self._lock:
+            db = self._connection()
+            with db:
+                # re-adding a ride replaces it, rollups included
+                self._remove(db, ride["ride_id"])
+                db.execute(f"INSERT INTO rides ({columns}) VALUES ({marks})", tuple(ride.values()))
+                db.executemany("INSERT INTO ride_devices VALUES (?, ?, ?, ?, ?)", summary["devices"])
+                db.executemany("INSERT INTO ride_intervals VALUES (?, ?, ?, ?, ?, ?, ?, ?)", summary["intervals"])
+                db.executemany("INSERT INTO best_efforts VALUES (?, ?, ?, ?)", summary["efforts"])
+                db.execute(
+                    "INSERT INTO weekly_load VALUES (?, 1, ?, ?, ?) ON CONFLICT (week) DO UPDATE SET"
+                    " rides = rides + 1, seconds = seconds + excluded.seconds,"
+                    " tss = tss + excluded.tss, kilojoules = kilojoules + excluded.kilojoules",
+                    (ride["week"], ride["seconds"], ride["tss"] or 0.0, ride["kilojoules"] or 0.0),
+                )
+                db.executemany(
+                    "INSERT INTO device_usage VALUES (?, ?, ?, ?, 1, ?, ?) ON CONFLICT (sensor) DO UPDATE SET"
+                    " device_id = excluded.device_id, device_type = excluded.device_type,"
+                    " pretty = excluded.pretty, rides = rides + 1, seconds = seconds + excluded.seconds,"
+                    " last_ride = MAX(last_ride, excluded.last_ride)",
+                    [(*device[1:], ride["seconds"], ride["started_at"]) for device in summary["devices"]],
+                )
+
+    def ingest(self, ride_id: str) -> dict:
+        summary = summarize(RideReader(ride_id, self.recordings), state.ftp)
+        self.add(summary)
+        return summary["ride"]
+
+    def delete(self, ride_id: str) -> dict:
+        with self._lock:
+            db = self._connection()
+            with db:
+                if db.execute("SELECT 1 FROM rides WHERE ride_id = ?", (ride_id,)).fetchone() is None:
+                    raise HTTPException(status_code=404, detail="Ride not in catalog")
+                self._remove(db, ride_id)
+        return {"status": "deleted", "ride_id": ride_id}
+
+    # background ingestion, so stopping a ride never waits on the summary
+
+    def submit(self, ride_id: str) -> None:
+        self._queue.put(ride_id)
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="ride-catalog", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            ride_id = self._queue.get()
+            try:
+                self.ingest(ride_id)
+            except Exception as exc:
+                print(f"[catalog] could not add ride {ride_id}: {exc}")
+
+    def sync(self) -> dict:
+        # queue finished recordings the catalog has not seen yet
+        known = {row["ride_id"] for row in self._query("SELECT ride_id FROM rides")}
+        missing = [
+            meta["id"] for meta in list_recordings(self.recordings)
+            if meta.get("ended_at") and meta.get("id") not in known
+        ]
+        for ride_id in missing:
+            self.submit(ride_id)
+        if missing:
+            print(f"[catalog] indexing {len(missing)} recording(s)")
+        return {"queued": missing}
+
+    # queries
+
+    def rides(
+        self,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        device: Optional[str] = None,
+        limit: int = 50,
+        offset: int = 0,
+    ) -> dict:
+        if limit < 1 or limit > 1000 or offset < 0:
+            raise HTTPException(status_code=400, detail="limit must be 1-1000 and offset >= 0")
+        where, params = [], []
+        if since is not None:
+            where.append("r.started_at >= ?")
+            params.append(_timestamp(since))
+        if until is not None:
+            where.append("r.started_at < ?")
+            params.append(_timestamp(until))
+        if device is not None:
+            # a sensor key, a pretty label or a bare ANT device number
+            where.append(
+                "r.ride_id IN (SELECT ride_id FROM ride_devices WHERE sensor = ? OR pretty = ? OR device_id = ?)"
+            )
+            params += [device, device, int(device) if device.isdigit() else None]
+        clause = f"WHERE {' AND '.join(where)}" if where else ""
+        total = self._query(f"SELECT COUNT(*) AS n FROM rides r {clause}", params)[0]["n"]
+        rows = self._query(
+            f"SELECT r.* FROM rides r {clause} ORDER BY r.started_at DESC LIMIT ? OFFSET ?",
+            params + [limit, offset],
+        )
+        return {"total": total, "offset": offset, "rides": rows}
+
+    def ride(self, ride_id: str) -> dict:
+        rows = self._query("SELECT * FROM rides WHERE ride_id = ?", (ride_id,))
+        if not rows:
+            raise HTTPException(status_code=404, detail="Ride not in catalog")
+        return {
+            **rows[0],
+            "devices": self._query(
+                "SELECT sensor, device_id, device_type, pretty FROM ride_devices WHERE ride_id = ?", (ride_id,)
+            ),
+            "intervals": self._query(
+                "SELECT lap, started_at, seconds, avg_power, avg_cadence, avg_hr, target"
+                " FROM ride_intervals WHERE ride_id = ? ORDER BY lap", (ride_id,)
+            ),
+            "best_efforts": self._query(
+                "SELECT duration, watts FROM best_efforts WHERE ride_id = ? ORDER BY duration", (ride_id,)
+            ),
+        }
+
+    def weekly(self, weeks: int = 12) -> List[dict]:
+        if weeks < 1 or weeks > 520:
+            raise HTTPException(status_code=400, detail="weeks must be between 1 and 520")
+        # the last `weeks` calendar weeks up to the current one, empty ones as
+        # zeros, so a 12-week chart always spans 12 weeks
+        rows = self._query(
+            "WITH RECURSIVE weeks (week, n) AS (SELECT ?, 1"
+            " UNION ALL SELECT date(week, '-7 days'), n + 1 FROM weeks WHERE n < ?)"
+            " SELECT week, COALESCE(w.rides, 0) AS rides, COALESCE(w.seconds, 0) AS seconds,"
+            " COALESCE(w.tss, 0.0) AS tss, COALESCE(w.kilojoules, 0.0) AS kilojoules"
+            " FROM weeks LEFT JOIN weekly_load w USING (week) ORDER BY week DESC",
+            (_week(datetime.now(timezone.utc).timestamp()), weeks),
+        )
+        for row in rows:
+            row["tss"] = round(row["tss"], 1)
+            row["kilojoules"] = round(row["kilojoules"], 2)
+        return rows
+
+    def best_efforts(
+        self, duration: int, since: Optional[str] = None, until: Optional[str] = None, limit: int = 10
+    ) -> List[dict]:
+        if duration not in CURVE_DURATIONS:
+            raise HTTPException(status_code=400, detail=f"duration must be one of {list(CURVE_DURATIONS)}")
+        if limit < 1 or limit > 100:
+            raise HTTPException(status_code=400, detail="limit must be between 1 and 100")
+        where, params = ["duration = ?"], [duration]
+        if since is not None:
+            where.append("started_at >= ?")
+            params.append(_timestamp(since))
+        if until is not None:
+            where.append("started_at < ?")
+            params.append(_timestamp(until))
+        return self._query(
+            f"SELECT ride_id, watts, started_at FROM best_efforts WHERE {' AND '.join(where)}"
+            " ORDER BY watts DESC LIMIT ?",
+            params + [limit],
+        )
+
+    def devices(self) -> List[dict]:
+        return self._query("SELECT * FROM device_usage ORDER BY last_ride DESC")
+
+
+catalog = RideCatalog()
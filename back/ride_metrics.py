@@ -0,0 +1,208 @@
+from collections import deque
+from typing import List, Optional
+
+import state
+from fastapi import HTTPException
+from power_curve import PowerCurve
+
+ROLLING_WINDOWS = (3, 10, 30)
+NP_WINDOW_SECONDS = 30
+# a sensor silent for longer than this is treated as a dropout, not as riding
+MAX_GAP_SECONDS = 5.0
+
+# upper bounds of zones 1-4; zone 5 is everything above
+POWER_ZONE_BOUNDS = (0.55, 0.75, 0.90, 1.05)  # fraction of FTP
+HR_ZONE_BOUNDS = (0.60, 0.70, 0.80, 0.90)  # fraction of max heart rate
+
+
+def _zone(value: float, reference: float, bounds) -> int:
+    ratio = value / reference if reference else 0.0
+    for index, bound in enumerate(bounds):
+        if ratio <= bound:
+            return index
+    return len(bounds)
+
+
+class _RollingMean:
+    __slots__ = ("values", "total")
+
+    def __init__(self, size: int):
+        self.values: deque = deque(maxlen=size)
+        self.total = 0.0
+
+    def push(self, value: float) -> None:
+        if len(self.values) == self.values.maxlen:
+            self.total -= self.values[0]
+        self.values.append(value)
+        self.total += value
+
+    @property
+    def full(self) -> bool:
+        return len(self.values) == self.values.maxlen
+
+    def mean(self) -> Optional[float]:
+        return self.total / len(self.values) if self.values else None
+
+
+class RideMetrics:
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.samples = 0
+        self.seconds = 0  # one-second power buckets closed so far
+        self.energy_joules = 0.0
+        self.max_power = 0
+        self.power_zone_seconds: List[float] = [0.0] * (len(POWER_ZONE_BOUNDS) + 1)
+        self.hr_zone_seconds: List[float] = [0.0] * (len(HR_ZONE_BOUNDS) + 1)
+        self._rolling = {window: _RollingMean(window) for window in ROLLING_WINDOWS}
+        self._np_window = self._rolling[NP_WINDOW_SECONDS]
+        self._np_sum4 = 0.0
+        self._np_count = 0
+        self.curve = PowerCurve()
+        self._bucket_second: Optional[int] = None
+        self._bucket_sum = 0.0
+        self._bucket_count = 0
+        self._last_power: Optional[float] = None
+        self._last_power_ts: Optional[float] = None
+        self._last_hr: Optional[float] = None
+        self._last_hr_ts: Optional[float] = None
+
+    def add(self, timestamp: float, power: Optional[float], heart_rate: Optional[float]) -> None:
+        self.samples += 1
+        if power is not None:
+            self._add_power(timestamp, float(power))
+        if heart_rate is not None:
+            self._add_heart_rate(timestamp, float(heart_rate))
+
+    def _add_power(self, timestamp: float, power: float) -> None:
+        if self._last_power_ts is not None:
+            dt = timestamp - self._last_power_ts
+            if 0 < dt <= MAX_GAP_SECONDS:
+                # the previous reading holds until this one arrives
+                self.energy_joules += self._last_power * dt
+                self.power_zone_seconds[
+                    _zone(self._last_power, state.ftp, POWER_ZONE_BOUNDS)
+                ] += dt
+        self._last_power, self._last_power_ts = power, timestamp
+        self.max_power = max(self.max_power, int(power))
+
+        second = int(timestamp)
+        if self._bucket_second is None:
+            self._bucket_second = second
+        elif second > self._bucket_second:
+            self._close_buckets(second)
+        self._bucket_sum += power
+        self._bucket_count += 1
+
+    def _close_buckets(self, second: int) -> None:
+        mean = self._bucket_sum / self._bucket_count
+        self._push_second(mean)
+        # seconds without any page: hold the last value across short gaps,
+        # zero across dropouts; only the last window's worth needs pushing
+        missing = second - self._bucket_second - 1
+        closed = [mean]
+        if missing > 0:
+            fill = mean if missing <= MAX_GAP_SECONDS else 0.0
+            for _ in range(min(missing, NP_WINDOW_SECONDS)):
+                self._push_second(fill)
+            skipped = missing - min(missing, NP_WINDOW_SECONDS)
+            if skipped:
+                # every skipped second rolls over a window of zeros
+                self.seconds += skipped
+                self._np_count += skipped
+            closed += [fill] * missing
+        self.curve.extend(closed)
+        self._bucket_second = second
+        self._bucket_sum = 0.0
+        self._bucket_count = 0
+
+    def _push_second(self, watts: float) -> None:
+        self.seconds += 1
+        for rolling in self._rolling.values():
+            rolling.push(watts)
+        if self._np_window.full:
+            self._np_sum4 += self._np_window.mean() ** 4
+            self._np_count += 1
+
+    def _add_heart_rate(self, timestamp: float, heart_rate: float) -> None:
+        if self._last_hr_ts is not None:
+            dt = timestamp - self._last_hr_ts
+            if 0 < dt <= MAX_GAP_SECONDS:
+                self.hr_zone_seconds[
+                    _zone(self._last_hr, state.max_hr, HR_ZONE_BOUNDS)
+                ] += dt
+        self._last_hr, self._last_hr_ts = heart_rate, timestamp
+
+    @property
+    def normalized_power(self) -> Optional[float]:
+        if self._np_count == 0:
+            return None
+        return (self._np_sum4 / self._np_count) ** 0.25
+
+    def snapshot(self) -> dict:
+        ftp = state.ftp
+        normalized = self.normalized_power
+        intensity = normalized / ftp if normalized is not None and ftp else None
+        tss = (
+            self.seconds * normalized * intensity / (ftp * 3600) * 100
+            if intensity is not None
+            else None
+        )
+        rolling = {
+            f"power_{window}s": None if r.mean() is None else round(r.mean(), 1)
+            for window, r in self._rolling.items()
+        }
+        return {
+            **rolling,
+            "normalized_power": None if normalized is None else round(normalized, 1),
+            "intensity_factor": None if intensity is None else round(intensity, 3),
+            "tss": None if tss is None else round(tss, 1),
+            "kilojoules": round(self.energy_joules / 1000, 2),
+            "max_power": self.max_power,
+            "seconds": self.seconds,
+            "power_zone_seconds": [round(v, 1) for v in self.power_zone_seconds],
+            "hr_zone_seconds": [round(v, 1) for v in self.hr_zone_seconds],
+            "ftp": ftp,
+            "max_hr": state.max_hr,
+        }
+
+    def has_power(self) -> bool:
+        return self._last_power_ts is not None
+
+    def has_heart_rate(self) -> bool:
+        return self._last_hr_ts is not None
+
+
+def set_max_hr(bpm: int) -> dict:
+    if bpm < 100 or bpm > 240:
+        raise HTTPException(status_code=400, detail="Max heart rate must be between 100 and 240 bpm")
+    state.max_hr = bpm
+    return {"ftp": state.ftp, "max_hr": state.max_hr}
+
+
+def ride_summary(sessions) -> dict:
+    per_sensor = {}
+    power = heart_rate = None
+    for name, session in sessions:
+        metrics = session.metrics
+        if metrics.samples == 0:
+            continue
+        per_sensor[name] = metrics.snapshot()
+        if power is None and metrics.has_power():
+            power = name
+        if heart_rate is None and metrics.has_heart_rate():
+            heart_rate = name
+
+    ride = {}
+    if power is not None:
+        ride.update({k: v for k, v in per_sensor[power].items() if k != "hr_zone_seconds"})
+    if heart_rate is not None:
+        ride["hr_zone_seconds"] = per_sensor[heart_rate]["hr_zone_seconds"]
+    return {
+        "ride": ride or None,
+        "power_sensor": power,
+        "heart_rate_sensor": heart_rate,
+        "sensors": per_sensor,
+    }
+
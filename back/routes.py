@@ -0,0 +1,421 @@
+from typing import List, Optional
+
+import ant_process
+import node_manager
+import state
+import telemetry
+from discovery import discovery
+from erg_service import (get_erg_command, get_erg_stats, set_erg_batch,
+                         set_erg_mode)
+from exporters import MEDIA_TYPES, open_export
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from known_devices import known_devices, reconnect_known, watchdog
+from models import ErgBatch, Sensor, WorkoutLoad
+from node_manager import add_new_sticks
+from node_pool import pool
+from power_curve import best_curve, parse_durations, recording_curve
+from recorder import RideReader, list_recordings, recorder
+from replay import replay
+from ride_catalog import catalog
+from ride_metrics import set_max_hr
+from sensor_service import (close_all_sensors, connect_sensor,
+                            disconnect_sensor, get_all_sensor_data_json,
+                            get_fused_data, get_power_curve,
+                            get_ride_summary, get_sensor_chart,
+                            get_sensor_data_json, get_sensor_history,
+                            reset_ride_metrics, scan_sensors,
+                            sensor_changes)
+from stream import check_rate, live_stream, parse_rates
+from workout_engine import engine
+from workout_library import library
+
+# Everything that needs the ANT, numpy and storage stack. api mounts this
+# router once the modules are imported, which happens in the background
+# after the server is already answering /health.
+router = APIRouter()
+
+telemetry.Gauge(
+    "icm_sessions", "Connected sensor sessions", (),
+    lambda: {(): len(state.sessions)},
+)
+telemetry.Gauge(
+    "icm_node_channels_used", "ANT channels open per node", ("node",),
+    lambda: {(pooled.label,): pooled.channels_used for pooled in pool.nodes},
+)
+
+
+def start_nodes() -> None:
+    if node_manager.run_in_process:
+        ant_process.start_client(simulate=node_manager.node_factory is not node_manager.Node)
+        return
+    discovery.start(node_manager.start_node())
+
+
+def start_sensors() -> None:
+    if ant_process.client is not None:
+        return
+    reconnect_known()
+    watchdog.start()
+
+
+@router.get("/nodes")
+def list_nodes_endpoint():
+    if ant_process.client is not None:
+        return {**ant_process.client.call("nodes"), "process": ant_process.client.stats()}
+    return pool.stats()
+
+
+@router.post("/nodes/rescan")
+def rescan_nodes_endpoint():
+    if ant_process.client is not None:
+        return ant_process.client.call("rescan")
+    return add_new_sticks()
+
+
+@router.get("/sensors/known")
+def list_known_sensors_endpoint():
+    if ant_process.client is not None:
+        known = ant_process.client.call("known")
+        names = {device["name"] for device in known["devices"]}
+        return {**known, "connected": [name for name in state.sessions if name in names]}
+    return {
+        "devices": known_devices.sensors(),
+        "connected": [name for name in state.sessions if name in known_devices.names()],
+        "watchdog": watchdog.stats(),
+    }
+
+
+@router.delete("/sensors/known/{sensor_name}")
+def forget_known_sensor_endpoint(sensor_name: str):
+    if ant_process.client is not None:
+        return ant_process.client.call("forget", sensor_name)
+    return known_devices.forget(sensor_name)
+
+
+@router.get("/sensors", response_model=List[Sensor])
+def list_sensors():
+    return scan_sensors()
+
+
+@router.get("/sensors/changes")
+def sensor_changes_endpoint(since: int = 0):
+    return sensor_changes(since)
+
+
+@router.post("/sensors/{sensor_name}/connect")
+def connect_sensor_endpoint(sensor_name: str):
+    result = connect_sensor(sensor_name)
+    sensor_info = result["sensor"]
+    return {
+        "status": "connected" if result["created"] else "already connected",
+        "sensor": sensor_info.pretty,
+        "channel": result["channel"],
+    }
+
+
+@router.post("/sensors/{sensor_identifier}/disconnect")
+def disconnect_sensor_endpoint(sensor_identifier: str):
+    return disconnect_sensor(sensor_identifier)
+
+
+@router.post("/sensors/close")
+def close_all_sensors_endpoint():
+    return close_all_sensors()
+
+
+@router.get("/sensors/stream")
+async def stream_sensor_data_endpoint(rate: float = 4.0, rates: Optional[str] = None):
+    try:
+        check_rate(rate)
+        per_sensor_rates = parse_rates(rates)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    subscriber = live_stream.subscribe(rate, per_sensor_rates)
+    snapshot = {
+        name: session.last_data
+        for name, session in list(state.sessions.items())
+        if session.last_data is not None
+    }
+    return StreamingResponse(
+        live_stream.events(subscriber, snapshot),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _cached_json(request: Request, etag: str, body: bytes) -> Response:
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+
+@router.get("/sensors/fused")
+def fused_sensor_data_endpoint(
+    step: float = 1.0,
+    window: float = 60.0,
+    since: Optional[float] = None,
+    sensors: Optional[str] = None,
+):
+    names = [name for name in sensors.split(",") if name] if sensors else None
+    return get_fused_data(step, window, since, names)
+
+
+@router.get("/sensors/{sensor_name}/data")
+def get_sensor_data_endpoint(sensor_name: str, request: Request):
+    return _cached_json(request, *get_sensor_data_json(sensor_name))
+
+
+@router.get("/sensors/{sensor_name}/history")
+def get_sensor_history_endpoint(
+    sensor_name: str, since: Optional[float] = None, window: Optional[float] = None
+):
+    # bypass jsonable_encoder: the payload is already plain lists of floats
+    return JSONResponse(get_sensor_history(sensor_name, since, window))
+
+
+@router.get("/sensors/{sensor_name}/chart")
+def get_sensor_chart_endpoint(
+    sensor_name: str,
+    field: str = "power",
+    points: int = 800,
+    method: str = "minmax",
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    window: Optional[float] = None,
+):
+    return JSONResponse(get_sensor_chart(sensor_name, field, points, method, start, end, window))
+
+
+@router.get("/sensors/data")
+def get_all_sensor_data_endpoint(request: Request):
+    return _cached_json(request, *get_all_sensor_data_json())
+
+
+@router.post("/sensors/{sensor_identifier}/erg/{target_watts}")
+def set_erg_mode_endpoint(sensor_identifier: str, target_watts: int):
+    return set_erg_mode(sensor_identifier, target_watts)
+
+
+@router.get("/erg/commands/{command_id}")
+def get_erg_command_endpoint(command_id: int):
+    return get_erg_command(command_id)
+
+
+@router.post("/erg/batch")
+def set_erg_batch_endpoint(batch: ErgBatch):
+    return set_erg_batch(batch)
+
+
+@router.get("/erg/stats")
+def get_erg_stats_endpoint():
+    return get_erg_stats()
+
+
+@router.get("/workouts")
+def list_workouts_endpoint(
+    offset: int = 0,
+    limit: int = 50,
+    sort: str = "name",
+    order: str = "asc",
+    q: Optional[str] = None,
+    min_duration: Optional[int] = None,
+    max_duration: Optional[int] = None,
+    max_tss: Optional[float] = None,
+    zone: Optional[int] = None,
+):
+    return library.query(
+        offset, limit, sort, order, q, min_duration, max_duration, max_tss, zone
+    )
+
+
+@router.get("/workouts/{name}")
+def get_workout_endpoint(name: str):
+    return library.get(name)
+
+
+@router.post("/workout/load")
+def load_workout_endpoint(payload: WorkoutLoad):
+    if payload.steps is not None:
+        steps = [step.model_dump(by_alias=True) for step in payload.steps]
+    elif payload.name is not None:
+        steps = library.steps(payload.name)
+    else:
+        raise HTTPException(status_code=400, detail="Provide either steps or a workout name")
+    return engine.load(steps, payload.trainer)
+
+
+@router.post("/workout/start")
+def start_workout_endpoint():
+    return engine.start()
+
+
+@router.post("/workout/pause")
+def pause_workout_endpoint():
+    return engine.pause()
+
+
+@router.post("/workout/resume")
+def resume_workout_endpoint():
+    return engine.resume()
+
+
+@router.post("/workout/skip")
+def skip_workout_step_endpoint():
+    return engine.skip()
+
+
+@router.post("/workout/stop")
+def stop_workout_endpoint():
+    return engine.stop()
+
+
+@router.post("/workout/ftp/{ftp_watts}")
+def set_workout_ftp_endpoint(ftp_watts: int):
+    return engine.set_ftp(ftp_watts)
+
+
+@router.get("/workout/status")
+def workout_status_endpoint():
+    return engine.progress()
+
+
+@router.post("/ride/start")
+def start_ride_endpoint(ride_id: Optional[str] = None):
+    sensors = {
+        name: session.sensor.model_dump()
+        for name, session in list(state.sessions.items())
+        if session.sensor is not None and session.recorded
+    }
+    result = recorder.start(sensors, ride_id)
+    reset_ride_metrics()
+    return result
+
+
+@router.get("/ride/summary")
+def ride_summary_endpoint():
+    return get_ride_summary()
+
+
+@router.get("/ride/power-curve")
+def ride_power_curve_endpoint(sensor: Optional[str] = None, durations: Optional[str] = None):
+    return get_power_curve(sensor, parse_durations(durations))
+
+
+@router.post("/ride/max-hr/{bpm}")
+def set_max_hr_endpoint(bpm: int):
+    return set_max_hr(bpm)
+
+
+@router.post("/ride/stop")
+def stop_ride_endpoint():
+    result = recorder.stop()
+    catalog.submit(result["id"])
+    return result
+
+
+@router.get("/ride/status")
+def ride_status_endpoint():
+    return recorder.status()
+
+
+@router.get("/recordings")
+def list_recordings_endpoint():
+    return list_recordings()
+
+
+@router.get("/recordings/power-curve")
+def best_power_curve_endpoint(rides: Optional[str] = None, durations: Optional[str] = None):
+    ride_ids = [ride for ride in rides.split(",") if ride] if rides else None
+    return best_curve(ride_ids, parse_durations(durations))
+
+
+@router.get("/recordings/{ride_id}/power-curve")
+def recording_power_curve_endpoint(
+    ride_id: str, sensor: Optional[str] = None, durations: Optional[str] = None
+):
+    return recording_curve(ride_id, sensor, parse_durations(durations))
+
+
+@router.get("/recordings/{ride_id}/export")
+def export_recording_endpoint(ride_id: str, format: str = "fit"):
+    chunks = open_export(ride_id, format)
+    return StreamingResponse(
+        chunks,
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{ride_id}.{format}"'},
+    )
+
+
+@router.get("/recordings/{ride_id}/samples")
+def recording_samples_endpoint(
+    ride_id: str,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    sensor: Optional[str] = None,
+):
+    rows = RideReader(ride_id).range(start, end, sensor)
+    columns = {
+        field: [None if v != v else v for v in rows[field].tolist()]
+        for field in rows.dtype.names
+    }
+    return JSONResponse({"ride_id": ride_id, "count": len(rows), **columns})
+
+
+@router.get("/rides")
+def list_rides_endpoint(
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    device: Optional[str] = None,
+    limit: int = 50,
+    offset: int = 0,
+):
+    return catalog.rides(since, until, device, limit, offset)
+
+
+@router.get("/rides/weekly")
+def weekly_load_endpoint(weeks: int = 12):
+    return catalog.weekly(weeks)
+
+
+@router.get("/rides/best")
+def best_efforts_endpoint(
+    duration: int = 1200, since: Optional[str] = None, until: Optional[str] = None, limit: int = 10
+):
+    return catalog.best_efforts(duration, since, until, limit)
+
+
+@router.get("/rides/devices")
+def ride_devices_endpoint():
+    return catalog.devices()
+
+
+@router.post("/rides/sync")
+def sync_rides_endpoint():
+    return catalog.sync()
+
+
+@router.get("/rides/{ride_id}")
+def get_ride_endpoint(ride_id: str):
+    return catalog.ride(ride_id)
+
+
+@router.delete("/rides/{ride_id}")
+def delete_ride_endpoint(ride_id: str):
+    return catalog.delete(ride_id)
+
+
+@router.post("/recordings/{ride_id}/replay")
+def start_replay_endpoint(ride_id: str, speed: float = 1.0):
+    return replay.start(ride_id, speed)
+
+
+@router.post("/replay/stop")
+def stop_replay_endpoint():
+    return replay.stop()
+
+
+@router.get("/replay/status")
+def replay_status_endpoint():
+    return replay.status()
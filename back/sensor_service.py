@@ -1,100 +1,95 @@
+import itertools
 import time
-from typing import Dict, List, Optional
+from typing import List, Optional, Tuple
 
+import ant_process
 import state
+from discovery import discovery
+from downsample import chart_series
 from fastapi import HTTPException
+from fusion import fuse
+from history import VALUE_FIELDS, column_to_list
 from models import Sensor
-from node_manager import require_node
+from node_manager import place_channel, require_node
 from openant.devices.common import DeviceType
 from openant.devices.fitness_equipment import FitnessEquipment
 from openant.devices.heart_rate import HeartRate
-from openant.devices.scanner import Scanner
 from openant.devices.utilities import auto_create_device
-from sessions import AntSession
+from power_curve import live_curve
+from registry import registry
+from ride_metrics import ride_summary
+from sessions import AntSession, encode_json
 
+# distinguishes ETags issued by this process from a previous run's
+_BOOT = f"{int(time.time()):x}"
+_generations = itertools.count(1)
+_all_data_cache: Tuple[tuple, str, bytes] = ((), "", b"")
 
-def _sensor_key(dev_type: int, trans: int, dev_id: int) -> str:
-    return f"{DeviceType(dev_type).name}_{trans}_{dev_id}"
+# the ANT process swaps in a session class that publishes to shared memory
+session_factory = AntSession
 
 
-def _sensor_label(dev_type: int, dev_id: int) -> str:
-    return f"{DeviceType(dev_type).name}:{dev_id}"
+def scan_sensors() -> List[Sensor]:
+    if ant_process.client is not None:
+        return [Sensor(**sensor) for sensor in ant_process.client.call("devices")]
+    if not discovery.running:
+        discovery.start(require_node())
+    return discovery.devices()
 
 
-def scan_sensors(timeout: float = 5.0) -> List[Sensor]:
-    found: Dict[str, Sensor] = {}
-    ant_node = require_node()
+def sensor_changes(since: int = 0) -> dict:
+    if ant_process.client is not None:
+        return ant_process.client.call("changes", since)
+    if not discovery.running:
+        discovery.start(require_node())
+    return discovery.changes(since)
 
-    def on_found(device_tuple):
-        dev_id, dev_type, dev_trans = device_tuple
-        key = _sensor_key(dev_type, dev_trans, dev_id)
-        if key in found:
-            return
 
-        sensor = Sensor(
-            name=key,
-            id=dev_id,
-            type=dev_type,
-            trans=dev_trans,
-            pretty=_sensor_label(dev_type, dev_id),
-        )
-        found[key] = sensor
-        print(f"[scan] found {sensor.pretty} → key={key}")
-
-    scanner = Scanner(ant_node, device_id=0, device_type=0)
-    scanner.on_found = on_found
-    scanner.open_channel()
-    state.last_discovered = {}
-    try:
-        require_node()
-        time.sleep(timeout)
-    finally:
-        scanner.close_channel()
-
-    state.last_discovered = found
-    print(f"[scan] complete: {len(found)} sensor(s)")
-    return list(found.values())
-
-
-def get_next_free_channel() -> int:
-    used = {sess.dev.channel for sess in state.sessions.values()}
-    for ch in range(8):
-        if ch not in used:
-            return ch
-    raise HTTPException(status_code=500, detail="No ANT channel available")
-
-
-def _session_for_sensor_id(sensor_id: int) -> Optional[AntSession]:
-    for sess in state.sessions.values():
-        if sess.sensor_id == sensor_id:
-            return sess
-    return None
+def create_device(ant_node, info: Sensor):
+    # openant devices open their own channel when constructed
+    if info.type == DeviceType.HeartRate.value:
+        return HeartRate(ant_node, device_id=info.id)
+    if info.type == DeviceType.FitnessEquipment.value:
+        return FitnessEquipment(ant_node, device_id=info.id, trans_type=info.trans or 0)
+    return auto_create_device(ant_node, info.id, info.type, info.trans)
 
 
 def connect_sensor(sensor_name: str) -> dict:
+    if ant_process.client is not None:
+        return ant_process.client.connect(sensor_name)
     info = state.last_discovered.get(sensor_name)
     if not info:
         raise HTTPException(
             status_code=404,
-            detail="Sensor not in last scan; please call GET /sensors first",
+            detail="Sensor not discovered; make sure it is awake and in range",
         )
 
-    ant_node = require_node()
-    channel = get_next_free_channel()
-    if info.type == DeviceType.HeartRate.value:
-        dev = HeartRate(ant_node, device_id=info.id)
-    elif info.type == DeviceType.FitnessEquipment.value:
-        dev = FitnessEquipment(
-            ant_node, device_id=info.id, trans_type=info.trans or 0
-        )
-    else:
-        dev = auto_create_device(ant_node, info.id, info.type, info.trans)
+    ant_node = place_channel()
+    session, created = registry.connect(
+        sensor_name, ant_node, lambda: session_factory(create_device(ant_node, info), info)
+    )
+    return {"session": session, "sensor": info, "channel": session.channel, "created": created}
+
+
+def reopen_sensor(sensor_name: str) -> AntSession:
+    session = state.sessions.get(sensor_name)
+    if session is None or session.sensor is None:
+        raise HTTPException(status_code=400, detail="Sensor not connected")
+    info = session.sensor
+    return registry.reopen(sensor_name, place_channel, lambda node: create_device(node, info))
+
+
+def disconnect_sensor(identifier: str) -> dict:
+    if ant_process.client is not None:
+        return ant_process.client.call("disconnect", identifier)
+    session = registry.disconnect(identifier)
+    return {"status": "disconnected", "sensor": session.sensor_pretty, "channel": session.channel}
 
-    session = AntSession(dev, info)
-    session.connect()
-    state.sessions[sensor_name] = session
 
-    return {"session": session, "sensor": info, "channel": channel}
+def close_all_sensors() -> dict:
+    if ant_process.client is not None:
+        return ant_process.client.call("close_all")
+    return {"status": "closed", "sensors": registry.close_all()}
 
 
 def get_sensor_data(sensor_name: str):
@@ -104,41 +99,115 @@ def get_sensor_data(sensor_name: str):
     return session.read()
 
 
+def get_sensor_data_json(sensor_name: str) -> Tuple[str, bytes]:
+    session = state.sessions.get(sensor_name)
+    if not session:
+        raise HTTPException(status_code=400, detail="Sensor not connected")
+    etag = f'"{_BOOT}-{session.serial}-{session.version}"'
+    session.record_read(time.time())
+    return etag, session.read_json()
+
+
+def get_sensor_history(
+    sensor_name: str, since: Optional[float] = None, window: Optional[float] = None
+) -> dict:
+    session = state.sessions.get(sensor_name)
+    if not session:
+        raise HTTPException(status_code=400, detail="Sensor not connected")
+    if window is not None and window <= 0:
+        raise HTTPException(status_code=400, detail="Window must be positive")
+
+    columns = session.history.window(since=since, seconds=window)
+    timestamps = [t for view in columns["timestamp"] for t in view.tolist()]
+    return {
+        "sensor": sensor_name,
+        "count": len(timestamps),
+        "until": timestamps[-1] if timestamps else since,
+        "timestamp": timestamps,
+        **{field: column_to_list(columns[field]) for field in VALUE_FIELDS},
+    }
+
+
+def get_sensor_chart(
+    sensor_name: str,
+    field: str,
+    points: int,
+    method: str,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    window: Optional[float] = None,
+) -> dict:
+    return chart_series(get_session_by_identifier(sensor_name), field, points, method, start, end, window)
+
+
 def get_all_sensor_data():
-    data, errs = {}, {}
+    data, timestamps, metrics, errs = {}, {}, {}, {}
     for name, session in state.sessions.items():
-        try:
-            data[name] = session.read()
-        except Exception as exc:
-            errs[name] = str(exc)
-    return {"data": data, "errors": errs or None}
+        # one read of last_sample, so values and timestamp come from one page
+        sample = session.last_sample
+        if sample is None:
+            errs[name] = "No data yet"
+        else:
+            data[name] = sample.to_dict()
+            timestamps[name] = sample.timestamp
+        if session.metrics.samples:
+            metrics[name] = session.metrics.snapshot()
+    return {"data": data, "timestamps": timestamps, "metrics": metrics, "errors": errs or None}
+
+
+def get_all_sensor_data_json() -> Tuple[str, bytes]:
+    # rebuilt only when some session saw a new page (or rider settings changed),
+    # so the per-request cost is one version check per session
+    global _all_data_cache
+    now = time.time()
+    for session in state.sessions.values():
+        session.record_read(now)
+    key = (
+        tuple((name, session.serial, session.version) for name, session in state.sessions.items()),
+        state.ftp,
+        state.max_hr,
+    )
+    cached_key, etag, body = _all_data_cache
+    if cached_key != key:
+        etag = f'"{_BOOT}-{next(_generations)}"'
+        body = encode_json(get_all_sensor_data())
+        _all_data_cache = (key, etag, body)
+    return etag, body
+
+
+def get_fused_data(
+    step: float, window: float, since: Optional[float] = None, sensors: Optional[List[str]] = None
+) -> dict:
+    if sensors is None:
+        selected = list(state.sessions.items())
+    else:
+        selected = []
+        for identifier in sensors:
+            session = get_session_by_identifier(identifier)
+            selected.append((session.sensor_name, session))
+    return fuse(selected, step, window, since)
 
 
-def get_session_by_identifier(identifier: str) -> AntSession:
-    session = state.sessions.get(identifier)
-    if session:
-        return session
-
-    sensor_match: Optional[Sensor] = state.last_discovered.get(identifier)
-    if sensor_match is None:
-        sensor_match = next(
-            (sensor for sensor in state.last_discovered.values() if sensor.pretty == identifier),
-            None,
-        )
+def get_ride_summary():
+    return ride_summary(list(state.sessions.items()))
 
-    if sensor_match:
-        session = _session_for_sensor_id(sensor_match.id)
-        if session:
-            return session
 
-    try:
-        device_id = int(identifier)
-    except ValueError:
-        device_id = None
+def get_power_curve(identifier: Optional[str], durations: List[int]) -> dict:
+    if identifier is not None:
+        return live_curve(get_session_by_identifier(identifier), durations)
+    for session in state.sessions.values():
+        if session.metrics.has_power():
+            return live_curve(session, durations)
+    raise HTTPException(status_code=404, detail="No power data in this ride yet")
 
-    if device_id is not None:
-        session = _session_for_sensor_id(device_id)
-        if session:
-            return session
 
-    raise HTTPException(status_code=400, detail="Sensor not connected")
+def reset_ride_metrics():
+    for session in list(state.sessions.values()):
+        session.metrics.reset()
+
+
+def get_session_by_identifier(identifier: str) -> AntSession:
+    session = state.sessions.lookup(identifier)
+    if session is None:
+        raise HTTPException(status_code=400, detail="Sensor not connected")
+    return session
@@ -1,38 +1,165 @@
-from typing import Optional
+import itertools
+import json
+import time
+from enum import Enum
+from typing import Callable, Dict, Optional
 
+from downsample import ChartTiers
 from fastapi import HTTPException
+from history import SampleHistory
 from models import Sensor
 from openant.devices.heart_rate import HeartRateData
+from recorder import recorder
+from ride_metrics import RideMetrics
+from stream import live_stream
+from telemetry import CALLBACK_SECONDS, PAGE_GAP, PAGES, SAMPLE_AGE
+
+_session_serial = itertools.count(1)
+
+
+class Sample:
+    # immutable-by-convention copy of one page; openant reuses its data objects
+    __slots__ = ("timestamp", "power", "cadence", "heart_rate", "fields")
+
+    def __init__(self, timestamp: float, power=None, cadence=None, heart_rate=None,
+                 fields: Optional[dict] = None):
+        self.timestamp = timestamp
+        self.power = power
+        self.cadence = cadence
+        self.heart_rate = heart_rate
+        self.fields = fields
+
+    def to_dict(self) -> dict:
+        if self.fields is not None:
+            return dict(self.fields)
+        if self.heart_rate is not None:
+            return {"heart_rate": self.heart_rate}
+        return {"power": self.power, "cadence": self.cadence}
+
+
+def _heart_rate_sample(now: float, data) -> Sample:
+    return Sample(now, heart_rate=data.heart_rate)
+
+
+def _power_sample(now: float, data) -> Sample:
+    return Sample(now, power=data.instantaneous_power, cadence=getattr(data, "cadence", None))
+
+
+def _plain(value):
+    return value.value if isinstance(value, Enum) else value
+
+
+def _fields_sample(now: float, data) -> Sample:
+    return Sample(now, fields={key: _plain(value) for key, value in vars(data).items()})
+
+
+# data class -> extractor, filled the first time a page type is seen
+_extractors: Dict[type, Callable[[float, object], Sample]] = {}
+
+
+def _extractor_for(data) -> Callable[[float, object], Sample]:
+    extractor = _extractors.get(type(data))
+    if extractor is None:
+        if isinstance(data, HeartRateData) or hasattr(data, "heart_rate"):
+            extractor = _heart_rate_sample
+        elif hasattr(data, "instantaneous_power"):
+            extractor = _power_sample
+        else:
+            extractor = _fields_sample
+        _extractors[type(data)] = extractor
+    return extractor
+
+
+def encode_json(payload) -> bytes:
+    return json.dumps(payload, separators=(",", ":"), default=str).encode("utf-8")
 
 
 class AntSession:
+    # replayed sessions set this False so their pages stay out of recordings
+    recorded = True
+
     def __init__(self, dev, sensor: Optional[Sensor] = None):
         self.dev = dev
         self.sensor = sensor
         self.sensor_id = getattr(sensor, "id", None)
         self.sensor_name = getattr(sensor, "name", None)
         self.sensor_pretty = getattr(sensor, "pretty", None)
-        self.last_data: Optional[dict] = None
+        self.serial = next(_session_serial)
+        self.last_sample: Optional[Sample] = None
+        self.version = 0
+        self._encoded = (-1, b"")
+        self.history = SampleHistory()
+        self.tiers = ChartTiers()
+        self.metrics = RideMetrics()
+        self.connected_at = time.time()
+        label = self.sensor_name or "unknown"
+        self._pages = PAGES.labels(label)
+        self._page_gap = PAGE_GAP.labels(label)
+        self._callback_seconds = CALLBACK_SECONDS.labels(label)
+        self._sample_age = SAMPLE_AGE.labels(label)
+        dev.on_device_data = self._on_data
+
+    def rebind(self, dev) -> None:
+        self.dev = dev
+        self.connected_at = time.time()
         dev.on_device_data = self._on_data
 
     def _on_data(self, device, page_name, data):
-        if isinstance(data, HeartRateData) or hasattr(data, "heart_rate"):
-            self.last_data = {"heart_rate": data.heart_rate}
-        elif hasattr(data, "instantaneous_power"):
-            self.last_data = {
-                "power": data.instantaneous_power,
-                "cadence": getattr(data, "cadence", None),
-            }
-        else:
-            self.last_data = data.__dict__
+        started = time.perf_counter()
+        self._ingest(_extractor_for(data)(time.time(), data))
+        self._callback_seconds.observe(time.perf_counter() - started)
+
+    def _ingest(self, sample: Sample) -> None:
+        previous = self.last_sample
+        if previous is not None:
+            # time.time() can step back; keep the history, chart tiers and
+            # recording in order by holding at the previous stamp
+            if sample.timestamp < previous.timestamp:
+                sample.timestamp = previous.timestamp
+            self._page_gap.observe(sample.timestamp - previous.timestamp)
+        self._pages.inc()
+        self.last_sample = sample
+        if sample.fields is None:
+            self._store(sample.timestamp, sample.power, sample.cadence, sample.heart_rate)
+        self.version += 1
+        live_stream.publish(self.sensor_name, sample.to_dict())
 
-    def connect(self):
-        self.dev.open_channel()
+    def _store(self, now: float, power, cadence, heart_rate) -> None:
+        self.history.append(now, power, cadence, heart_rate)
+        self.tiers.append(now, power, cadence, heart_rate)
+        self.metrics.add(now, power, heart_rate)
+        if self.recorded:
+            recorder.record(self.sensor_name, now, power, cadence, heart_rate)
+
+    @property
+    def channel(self) -> Optional[int]:
+        channel = getattr(self.dev, "channel", None)
+        return getattr(channel, "id", None)
+
+    @property
+    def last_data(self) -> Optional[dict]:
+        sample = self.last_sample
+        return sample.to_dict() if sample is not None else None
 
     def read(self):
-        if self.last_data is None:
+        if self.last_sample is None:
             raise HTTPException(status_code=500, detail="No data yet")
-        return self.last_data
+        return self.last_sample.to_dict()
+
+    def record_read(self, now: float) -> None:
+        sample = self.last_sample
+        if sample is not None:
+            self._sample_age.observe(now - sample.timestamp)
+
+    def read_json(self) -> bytes:
+        # version is read before the sample, so a racing update can only make
+        # the cached bytes newer than their version, never staler
+        version = self.version
+        cached_version, body = self._encoded
+        if cached_version != version:
+            body = encode_json(self.read())
+            self._encoded = (version, body)
+        return body
 
     def close(self):
         try:
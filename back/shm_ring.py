@@ -0,0 +1,104 @@
+from multiprocessing import shared_memory
+from typing import Optional, Tuple
+
+import numpy as np
+
+# One writer (the ANT process) appends samples; any number of readers copy
+# them out without locks. Each record carries a sequence word: odd while the
+# writer is filling it, 2 * n + 2 once record n is complete. A reader keeps a
+# record only if that word matches before and after copying it, so records
+# overwritten while being read are dropped instead of returned torn.
+RING_DTYPE = np.dtype(
+    [
+        ("seq", "<u8"),
+        ("t", "<f8"),
+        ("power", "<f4"),
+        ("cadence", "<f4"),
+        ("heart_rate", "<f4"),
+        ("slot", "<u2"),
+        ("pad", "<u2"),
+    ]
+)
+MAGIC = 0x31474E5249524349  # b"ICMRING1" little-endian
+HEADER_BYTES = 64
+
+
+class SampleRing:
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool):
+        self._shm = shm
+        self._owner = owner
+        header = np.ndarray((3,), dtype="<u8", buffer=shm.buf)
+        if owner:
+            header[0] = MAGIC
+        elif header[0] != MAGIC:
+            raise ValueError(f"{shm.name} is not a sample ring")
+        self.capacity = int(header[1])
+        self._head = header[2:3]
+        self.records = np.ndarray(
+            (self.capacity,), dtype=RING_DTYPE, buffer=shm.buf, offset=HEADER_BYTES
+        )
+        self._seq = self.records["seq"]
+        self._t = self.records["t"]
+        self._power = self.records["power"]
+        self._cadence = self.records["cadence"]
+        self._heart_rate = self.records["heart_rate"]
+        self._slot = self.records["slot"]
+
+    @classmethod
+    def create(cls, capacity: int = 16384) -> "SampleRing":
+        shm = shared_memory.SharedMemory(create=True, size=HEADER_BYTES + capacity * RING_DTYPE.itemsize)
+        header = np.ndarray((3,), dtype="<u8", buffer=shm.buf)
+        header[1] = capacity
+        header[2] = 0
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> "SampleRing":
+        return cls(shared_memory.SharedMemory(name=name), owner=False)
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    @property
+    def head(self) -> int:
+        return int(self._head[0])
+
+    def write(self, slot: int, t: float, power, cadence, heart_rate) -> None:
+        n = int(self._head[0])
+        i = n % self.capacity
+        self._seq[i] = 2 * n + 1
+        self._t[i] = t
+        self._power[i] = np.nan if power is None else power
+        self._cadence[i] = np.nan if cadence is None else cadence
+        self._heart_rate[i] = np.nan if heart_rate is None else heart_rate
+        self._slot[i] = slot
+        self._seq[i] = 2 * n + 2
+        self._head[0] = n + 1
+
+    def read_new(self, cursor: int) -> Tuple[np.ndarray, int, int]:
+        # returns (records, new cursor, records lost to overwrite)
+        head = int(self._head[0])
+        dropped = 0
+        if head - cursor > self.capacity:
+            dropped = head - self.capacity - cursor
+            cursor = head - self.capacity
+        if cursor >= head:
+            return self.records[:0].copy(), head, dropped
+        numbers = np.arange(cursor, head, dtype=np.uint64)
+        index = numbers % self.capacity
+        rows = self.records[index]
+        expected = 2 * numbers + 2
+        valid = (rows["seq"] == expected) & (self._seq[index] == expected)
+        if not valid.all():
+            dropped += int((~valid).sum())
+            rows = rows[valid]
+        return rows, head, dropped
+
+    def close(self, unlink: Optional[bool] = None) -> None:
+        # drop numpy views first; SharedMemory refuses to close exported buffers
+        self.records = self._seq = self._t = self._power = None
+        self._cadence = self._heart_rate = self._slot = self._head = None
+        self._shm.close()
+        if self._owner if unlink is None else unlink:
+            self._shm.unlink()
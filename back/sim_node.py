@@ -0,0 +1,313 @@
+import array
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+from openant.devices.common import DeviceType
+from openant.easy.exception import AntException
+
+DEFAULT_RATE_HZ = 4.0
+
+
+class SimDevice:
+    device_type = DeviceType.Unknown.value
+    trans_type = 0
+
+    def __init__(self, device_id: int, rate_hz: float = DEFAULT_RATE_HZ):
+        self.device_id = device_id
+        self.period = 1.0 / rate_hz
+        self._count = 0
+
+    def extended(self, page: List[int]) -> array.array:
+        # 8 payload bytes + flag byte + device number, type and transmission type,
+        # the layout openant expects from extended messages
+        return array.array(
+            "B",
+            [
+                *page,
+                0x80,
+                self.device_id & 0xFF,
+                (self.device_id >> 8) & 0xFF,
+                self.device_type,
+                self.trans_type,
+            ],
+        )
+
+    def next_page(self, now: float) -> List[int]:
+        raise NotImplementedError
+
+    def on_acknowledged(self, data: List[int]) -> Optional[List[int]]:
+        return None
+
+
+class SimHeartRate(SimDevice):
+    device_type = DeviceType.HeartRate.value
+    trans_type = 1
+
+    def __init__(self, device_id: int, rate_hz: float = DEFAULT_RATE_HZ, bpm: int = 120):
+        super().__init__(device_id, rate_hz)
+        self.bpm = bpm
+        self._beats = 0
+        self._beat_time = 0.0
+
+    def next_page(self, now: float) -> List[int]:
+        self._count += 1
+        heart_rate = max(40, min(220, self.bpm + int(6 * random.random()) - 3))
+        self._beat_time += 60.0 / heart_rate
+        self._beats = (self._beats + 1) & 0xFF
+        beat_ticks = int(self._beat_time * 1024) & 0xFFFF
+        toggle = 0x80 if (self._count // 4) % 2 else 0x00
+        return [toggle | 0x04, 0xFF, beat_ticks & 0xFF, beat_ticks >> 8,
+                beat_ticks & 0xFF, beat_ticks >> 8, self._beats, heart_rate]
+
+
+class SimFitnessEquipment(SimDevice):
+    device_type = DeviceType.FitnessEquipment.value
+    trans_type = 5
+
+    def __init__(self, device_id: int, rate_hz: float = DEFAULT_RATE_HZ, watts: int = 150):
+        super().__init__(device_id, rate_hz)
+        self.power = float(watts)
+        self.target: Optional[int] = None
+        self.cadence = 90
+        self._events = 0
+        self._accumulated = 0
+        self._last_command = 0xFF
+        self._command_seq = 0xFF
+
+    def next_page(self, now: float) -> List[int]:
+        self._count += 1
+        if self._count % 16 == 0:
+            # general FE page interleaved like a real trainer
+            return [0x10, 25, 0x04, 0, 0x10, 0x27, 0xFF, 0x30]
+
+        if self.target is not None:
+            # trainers settle toward the ERG target over a couple of seconds
+            self.power += (self.target - self.power) * 0.3
+        watts = max(0, int(self.power + 8 * random.random() - 4))
+        self._events = (self._events + 1) & 0xFF
+        self._accumulated = (self._accumulated + watts) & 0xFFFF
+        return [0x19, self._events, self.cadence, self._accumulated & 0xFF,
+                self._accumulated >> 8, watts & 0xFF, (watts >> 8) & 0x0F, 0x30]
+
+    def on_acknowledged(self, data: List[int]) -> Optional[List[int]]:
+        page = data[0]
+        if page == 0x31:
+            self.target = (data[6] + (data[7] << 8)) // 4
+            self._last_command = page
+            self._command_seq = (self._command_seq + 1) & 0xFF
+        elif page == 0x30:
+            self.target = None
+            self._last_command = page
+            self._command_seq = (self._command_seq + 1) & 0xFF
+        elif page == 0x46 and data[6] == 0x47:
+            # command status reply: last command, sequence, status "pass", echo
+            target = (self.target or 0) * 4
+            return [0x47, self._last_command, self._command_seq, 0x00,
+                    0xFF, 0xFF, target & 0xFF, (target >> 8) & 0xFF]
+        return None
+
+
+class SimChannel:
+    def __init__(self, channel_id: int, node: "SimulatedNode"):
+        self.id = channel_id
+        self._node = node
+        self.device_number = 0
+        self.device_type = 0
+        self.transmission_type = 0
+        self.is_open = False
+        self.device: Optional[SimDevice] = None
+
+    def on_broadcast_data(self, data):
+        pass
+
+    def on_burst_data(self, data):
+        pass
+
+    def on_acknowledge(self, data):
+        pass
+
+    def on_acknowledge_data(self, data):
+        pass
+
+    def on_broadcast_tx_data(self, data):
+        pass
+
+    def set_id(self, device_number, device_type, transmission_type):
+        self.device_number = device_number
+        self.device_type = device_type
+        self.transmission_type = transmission_type
+
+    def set_period(self, period):
+        pass
+
+    def set_search_timeout(self, timeout):
+        pass
+
+    def set_rf_freq(self, freq):
+        pass
+
+    def enable_extended_messages(self, enable):
+        pass
+
+    def open(self):
+        self.is_open = True
+        self.device = self._node._bind(self)
+
+    def close(self):
+        self.is_open = False
+        self.device = None
+
+    def _unassign(self):
+        pass
+
+    def send_acknowledged_data(self, data):
+        self._node._acknowledged(self, list(data))
+
+
+class SimulatedNode:
+    def __init__(
+        self,
+        devices: List[SimDevice],
+        ack_delay: float = 0.0,
+        ack_failure_rate: float = 0.0,
+        response_delay: float = 0.05,
+        max_channels: int = 8,
+    ):
+        self.devices = devices
+        self.ack_delay = ack_delay
+        self.ack_failure_rate = ack_failure_rate
+        self.response_delay = response_delay
+        self.max_channels = max_channels
+        self.max_networks = 8
+        self.channels: List[SimChannel] = []
+        self._cond = threading.Condition()
+        self._heap: list = []
+        self._order = itertools.count()
+        self._running = True
+        self.pages_sent = 0
+        self.callback_seconds = 0.0
+        self.max_lag = 0.0
+        self._lags: deque = deque(maxlen=1024)
+        self.acks_failed = 0
+        now = time.monotonic()
+        for device in devices:
+            # spread first pages so devices do not all fire in phase
+            self._push(now + random.random() * device.period, device, None)
+
+    @classmethod
+    def from_env(cls) -> "SimulatedNode":
+        rate = float(os.environ.get("ANT_SIM_RATE_HZ", DEFAULT_RATE_HZ))
+        devices: List[SimDevice] = []
+        for i in range(int(os.environ.get("ANT_SIM_HR", "1"))):
+            devices.append(SimHeartRate(1000 + i, rate))
+        for i in range(int(os.environ.get("ANT_SIM_FE", "1"))):
+            devices.append(SimFitnessEquipment(2000 + i, rate))
+        return cls(
+            devices,
+            ack_delay=float(os.environ.get("ANT_SIM_ACK_DELAY_MS", "0")) / 1000,
+            ack_failure_rate=float(os.environ.get("ANT_SIM_ACK_FAILURE", "0")),
+            max_channels=int(os.environ.get("ANT_SIM_CHANNELS", "8")),
+        )
+
+    def set_network_key(self, network, key):
+        pass
+
+    def new_channel(self, ctype, network_number=0x00, ext_assign=None) -> SimChannel:
+        if len(self.channels) >= self.max_channels:
+            raise RuntimeError(
+                f"Cannot create new channel: >= supported number of channels {self.max_channels}"
+            )
+        # hardware channel numbers are slots, reused once freed
+        used = {channel.id for channel in self.channels}
+        channel = SimChannel(min(set(range(self.max_channels)) - used), self)
+        self.channels.append(channel)
+        return channel
+
+    def remove_channel(self, channel: SimChannel):
+        channel.close()
+        if channel in self.channels:
+            self.channels.remove(channel)
+
+    def _bind(self, channel: SimChannel) -> Optional[SimDevice]:
+        # a wildcard type (scanner) listens to everything; otherwise pair with
+        # the requested device, or the first one of that type for id 0
+        if channel.device_type == 0:
+            return None
+        for device in self.devices:
+            if device.device_type != channel.device_type:
+                continue
+            if channel.device_number in (0, device.device_id):
+                return device
+        return None
+
+    def _push(self, due: float, device: SimDevice, payload) -> None:
+        heapq.heappush(self._heap, (due, next(self._order), device, payload))
+
+    def _acknowledged(self, channel: SimChannel, data: List[int]) -> None:
+        if self.ack_delay:
+            time.sleep(self.ack_delay)
+        device = channel.device
+        if device is None or random.random() < self.ack_failure_rate:
+            self.acks_failed += 1
+            raise AntException("Failed to get acknowledgement of acknowledged data")
+        reply = device.on_acknowledged(data)
+        if reply is not None:
+            with self._cond:
+                self._push(time.monotonic() + self.response_delay, device, reply)
+                self._cond.notify()
+
+    def _deliver(self, device: SimDevice, page: List[int]) -> None:
+        data = device.extended(page)
+        for channel in list(self.channels):
+            if not channel.is_open:
+                continue
+            if channel.device is device or channel.device_type == 0:
+                channel.on_broadcast_data(data)
+
+    def start(self):
+        while self._running:
+            with self._cond:
+                if not self._heap:
+                    self._cond.wait(1.0)
+                    continue
+                due = self._heap[0][0]
+                delay = due - time.monotonic()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                due, _, device, payload = heapq.heappop(self._heap)
+                if payload is None:
+                    self._push(due + device.period, device, None)
+
+            now = time.monotonic()
+            self._lags.append(now - due)
+            self.max_lag = max(self.max_lag, now - due)
+            page = payload if payload is not None else device.next_page(now)
+            self._deliver(device, page)
+            self.callback_seconds += time.monotonic() - now
+            self.pages_sent += 1
+
+    def stop(self):
+        self._running = False
+        with self._cond:
+            self._cond.notify()
+
+    def stats(self) -> Dict[str, float]:
+        # lag = how late each page was delivered; percentiles over recent pages
+        lags = sorted(self._lags)
+        return {
+            "devices": len(self.devices),
+            "channels": len(self.channels),
+            "pages_sent": self.pages_sent,
+            "callback_seconds": round(self.callback_seconds, 6),
+            "max_lag_ms": round(self.max_lag * 1000, 3),
+            "lag_p50_ms": round(lags[len(lags) // 2] * 1000, 3) if lags else None,
+            "lag_p99_ms": round(lags[int(len(lags) * 0.99)] * 1000, 3) if lags else None,
+            "acks_failed": self.acks_failed,
+        }
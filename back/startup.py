@@ -0,0 +1,77 @@
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+# (name, step, names of the steps it needs)
+Step = Tuple[str, Callable[[], None], Tuple[str, ...]]
+
+# taken when main_desktop first imports this module, before FastAPI and the
+# services are loaded, so the "imports" phase covers them
+BOOT = time.monotonic()
+
+
+class StartupRunner:
+    # Runs the boot sequence on its own thread so the server answers /health
+    # while nodes come up; every phase is timed and reported there.
+    def __init__(self):
+        self.phases: List[dict] = []
+        self.ready = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _record(self, name: str, state: str, seconds: Optional[float] = None, error: Optional[str] = None) -> dict:
+        phase = {"name": name, "state": state, "seconds": seconds, "error": error}
+        with self._lock:
+            self.phases.append(phase)
+        return phase
+
+    def run(self, steps: List[Step]) -> None:
+        if self._thread is not None:
+            return
+        self._record("imports", "done", round(time.monotonic() - BOOT, 3))
+        self._thread = threading.Thread(target=self._run, args=(steps,), name="startup", daemon=True)
+        self._thread.start()
+
+    def _run(self, steps: List[Step]) -> None:
+        # a failed step only skips the steps that name it (or a skipped step)
+        # in their `after`; the others still run
+        failed = set()
+        for name, step, after in steps:
+            blocked = failed.intersection(after)
+            if blocked:
+                self._record(name, "skipped", error=f"needs {', '.join(sorted(blocked))}")
+                failed.add(name)
+                continue
+            phase = self._record(name, "running")
+            started = time.monotonic()
+            try:
+                step()
+            except Exception as exc:
+                phase.update(state="failed", seconds=round(time.monotonic() - started, 3), error=str(exc))
+                print(f"[startup] {name} failed: {exc}")
+                failed.add(name)
+                continue
+            phase.update(state="done", seconds=round(time.monotonic() - started, 3))
+        print(f"[startup] finished in {time.monotonic() - BOOT:.2f}s")
+        self.ready.set()
+
+    def wait(self, timeout: float) -> None:
+        # no-op when the startup event never ran (e.g. a TestClient without
+        # lifespan), so callers do not sit out the timeout
+        if self._thread is not None:
+            self.ready.wait(timeout)
+
+    def status(self) -> dict:
+        with self._lock:
+            phases = [dict(phase) for phase in self.phases]
+        running = [phase["name"] for phase in phases if phase["state"] == "running"]
+        return {
+            "ok": not any(phase["state"] == "failed" for phase in phases),
+            "ready": self.ready.is_set(),
+            "phase": running[0] if running else None,
+            "uptime_seconds": round(time.monotonic() - BOOT, 3),
+            "phases": phases,
+        }
+
+
+runner = StartupRunner()
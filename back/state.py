@@ -1,11 +1,11 @@
-from typing import Dict, Optional, TYPE_CHECKING
+from typing import Optional
 
 from openant.easy.node import Node
-
-if TYPE_CHECKING:
-    from .models import Sensor
-    from .sessions import AntSession
+from registry import registry
 
 node: Optional[Node] = None
-last_discovered: Dict[str, "Sensor"] = {}
-sessions: Dict[str, "AntSession"] = {}
+# name -> Sensor / AntSession, also indexed by pretty label and device id
+last_discovered = registry.discovered
+sessions = registry.sessions
+ftp: int = 250
+max_hr: int = 190
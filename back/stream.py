@@ -0,0 +1,161 @@
+import asyncio
+import json
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+KEEPALIVE_SECONDS = 15.0
+MAX_RATE_HZ = 50.0
+
+
+def check_rate(hz: float) -> float:
+    # a rate of 0 would mean "uncapped"; every rate goes through MAX_RATE_HZ
+    if not hz > 0:
+        raise ValueError(f"Rate must be positive, got {hz}")
+    return hz
+
+
+def parse_rates(raw: Optional[str]) -> Dict[str, float]:
+    # "HeartRate:1,FitnessEquipment:4,FitnessEquipment_5_7504:2"
+    rates: Dict[str, float] = {}
+    if not raw:
+        return rates
+    for part in raw.split(","):
+        key, sep, value = part.strip().rpartition(":")
+        if not sep or not key:
+            raise ValueError(f"Invalid rate spec '{part}', expected <sensor>:<hz>")
+        try:
+            rates[key] = check_rate(float(value))
+        except ValueError as exc:
+            raise ValueError(f"Invalid rate spec '{part}': {exc}") from exc
+    return rates
+
+
+def _encode(sensor_name: str, data: dict) -> str:
+    return json.dumps({"sensor": sensor_name, "data": data, "ts": time.time()}, default=str)
+
+
+class _Subscriber:
+    def __init__(self, loop: asyncio.AbstractEventLoop, rate_hz: float, rates: Dict[str, float]):
+        self.loop = loop
+        self.default_interval = self._interval(rate_hz)
+        self.intervals = {key: self._interval(hz) for key, hz in rates.items()}
+        self.pending: Dict[str, str] = {}
+        self.last_sent: Dict[str, float] = {}
+        self.coalesced = 0
+        self.wakeup = asyncio.Event()
+        self._lock = threading.Lock()
+        self._wake_scheduled = False
+
+    @staticmethod
+    def _interval(hz: float) -> float:
+        return 1.0 / min(check_rate(hz), MAX_RATE_HZ)
+
+    def interval_for(self, sensor_name: str) -> float:
+        interval = self.intervals.get(sensor_name)
+        if interval is None:
+            # sensor keys are "<DeviceType>_<trans>_<id>", so a bare device type
+            # name applies to every sensor of that kind
+            interval = self.intervals.get(sensor_name.split("_", 1)[0])
+        return self.default_interval if interval is None else interval
+
+    def offer(self, sensor_name: str, encoded: str) -> bool:
+        # False once the subscriber's event loop has closed
+        with self._lock:
+            if sensor_name in self.pending:
+                self.coalesced += 1
+            self.pending[sensor_name] = encoded
+            if self._wake_scheduled:
+                return True
+            self._wake_scheduled = True
+        try:
+            self.loop.call_soon_threadsafe(self._wake)
+        except RuntimeError:
+            return False
+        return True
+
+    def _wake(self) -> None:
+        with self._lock:
+            self._wake_scheduled = False
+        self.wakeup.set()
+
+    def take_due(self, now: float) -> Tuple[List[str], Optional[float]]:
+        ready: List[str] = []
+        next_due: Optional[float] = None
+        with self._lock:
+            for name in list(self.pending):
+                due = self.last_sent.get(name, 0.0) + self.interval_for(name)
+                if due <= now:
+                    ready.append(self.pending.pop(name))
+                    self.last_sent[name] = now
+                elif next_due is None or due < next_due:
+                    next_due = due
+        return ready, next_due
+
+
+class LiveStream:
+    def __init__(self):
+        self._subscribers: List[_Subscriber] = []
+        self._lock = threading.Lock()
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, sensor_name: Optional[str], data: Optional[dict]) -> None:
+        # runs on the openant callback thread: encode once, hand the same bytes
+        # to every subscriber and never block on a slow client
+        subscribers = self._subscribers
+        if not subscribers or sensor_name is None or data is None:
+            return
+        encoded = _encode(sensor_name, data)
+        for subscriber in subscribers:
+            if not subscriber.offer(sensor_name, encoded):
+                # its loop is gone; never raise into the openant callback
+                self.unsubscribe(subscriber)
+
+    def subscribe(self, rate_hz: float, rates: Dict[str, float]) -> _Subscriber:
+        subscriber = _Subscriber(asyncio.get_running_loop(), rate_hz, rates)
+        with self._lock:
+            self._subscribers = [*self._subscribers, subscriber]
+        return subscriber
+
+    def unsubscribe(self, subscriber: _Subscriber) -> None:
+        with self._lock:
+            self._subscribers = [s for s in self._subscribers if s is not subscriber]
+
+    async def events(self, subscriber: _Subscriber, snapshot: Dict[str, dict]):
+        loop = asyncio.get_running_loop()
+        timer: Optional[asyncio.TimerHandle] = None
+        try:
+            for name, data in snapshot.items():
+                subscriber.offer(name, _encode(name, data))
+
+            while True:
+                try:
+                    await asyncio.wait_for(subscriber.wakeup.wait(), KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                subscriber.wakeup.clear()
+
+                ready, next_due = subscriber.take_due(time.monotonic())
+                for encoded in ready:
+                    yield f"event: sample\ndata: {encoded}\n\n"
+
+                if next_due is not None and timer is None:
+                    # rate-limited sensors still have a pending value; come back
+                    # when the earliest one is due instead of spinning
+                    def _fire():
+                        nonlocal timer
+                        timer = None
+                        subscriber.wakeup.set()
+
+                    timer = loop.call_later(max(next_due - time.monotonic(), 0.0), _fire)
+        finally:
+            if timer is not None:
+                timer.cancel()
+            self.unsubscribe(subscriber)
+
+
+live_stream = LiveStream()
@@ -0,0 +1,252 @@
+import math
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter as StackCounter
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+# Minimal Prometheus text-format metrics. Each labelled child is resolved once
+# by its owner (a session, an ERG worker) and then updated without lookups.
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "count", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = labels
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in list(self._children.items()):
+            lines.extend(self._render_child(key, child))
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def _render_child(self, key, child) -> List[str]:
+        return [f"{self.name}{_label_text(self.label_names, key)} {_number(child.value)}"]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = ()):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def _render_child(self, key, child) -> List[str]:
+        with child._lock:
+            counts, total, count = list(child.counts), child.sum, child.count
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+            cumulative += bucket_count
+            le = 'le="' + _number(bound) + '"'
+            lines.append(f"{self.name}_bucket{_label_text(self.label_names, key, le)} {cumulative}")
+        labels = _label_text(self.label_names, key)
+        lines.append(f"{self.name}_sum{labels} {_number(total)}")
+        lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...], collect: Callable[[], Dict[tuple, float]]):
+        super().__init__(name, help_text, labels)
+        self._collect = collect
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        try:
+            values = self._collect()
+        except Exception as exc:
+            print(f"[telemetry] gauge {self.name} failed: {exc}")
+            values = {}
+        for key, value in values.items():
+            lines.append(f"{self.name}{_label_text(self.label_names, key)} {_number(value)}")
+        return lines
+
+
+REGISTRY: List[_Metric] = []
+
+PAGES = Counter("icm_ant_pages_total", "ANT data pages received", ("sensor",))
+PAGE_GAP = Histogram(
+    "icm_ant_page_gap_seconds", "Time between consecutive pages from one sensor", ("sensor",),
+    (0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0),
+)
+CALLBACK_SECONDS = Histogram(
+    "icm_ant_callback_seconds", "Time spent handling one page in AntSession._on_data", ("sensor",),
+    (0.00001, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.005, 0.01, 0.05),
+)
+SAMPLE_AGE = Histogram(
+    "icm_sample_age_seconds", "Age of the latest sample when a client reads it", ("sensor",),
+    (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0),
+)
+ERG_COMMANDS = Counter("icm_erg_commands_total", "ERG commands by final status", ("trainer", "status"))
+ERG_RETRIES = Counter("icm_erg_retries_total", "ERG command retries", ("trainer",))
+ERG_ACK_SECONDS = Histogram(
+    "icm_erg_ack_seconds", "Time from sending an ERG target to the trainer echoing it", ("trainer",),
+    (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0),
+)
+USB_ERRORS_IGNORED = Counter("icm_usb_errors_ignored_total", "USB errors swallowed by usb_patch", ("call", "errno"))
+HTTP_REQUESTS = Counter("icm_http_requests_total", "HTTP requests", ("method", "route", "status"))
+HTTP_SECONDS = Histogram(
+    "icm_http_request_seconds", "HTTP request latency", ("method", "route"),
+    (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+
+
+def render() -> str:
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class SamplingProfiler:
+    # samples every thread's stack on a timer and counts folded stacks
+    # ("a;b;c N" lines, the input flamegraph tools expect)
+    def __init__(self):
+        self.interval = 0.01
+        self.samples = 0
+        self.started_at: Optional[float] = None
+        self._stacks: StackCounter = StackCounter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval_ms: float = 10.0) -> dict:
+        if interval_ms < 1 or interval_ms > 1000:
+            raise HTTPException(status_code=400, detail="interval_ms must be between 1 and 1000")
+        if self.running:
+            raise HTTPException(status_code=409, detail="Profiler already running")
+        self.interval = interval_ms / 1000
+        self.samples = 0
+        self.started_at = time.monotonic()
+        self._stacks = StackCounter()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self.status()
+
+    def stop(self) -> dict:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.status()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            if len(names) != threading.active_count():
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self._stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def status(self) -> dict:
+        return {
+            "running": self.running,
+            "interval_ms": round(self.interval * 1000, 3),
+            "samples": self.samples,
+            "stacks": len(self._stacks),
+        }
+
+    def folded(self, limit: int = 500) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self._stacks.most_common(limit))
+
+
+profiler = SamplingProfiler()
@@ -1,5 +1,6 @@
 import usb.core
 import usb.util
+from telemetry import USB_ERRORS_IGNORED
 
 
 def patch_usb_errors() -> None:
@@ -8,7 +9,9 @@ def patch_usb_errors() -> None:
             try:
                 return func(*args, **kwargs)
             except usb.core.USBError as exc:
-                if getattr(exc, "errno", None) in allowed_errnos:
+                errno = getattr(exc, "errno", None)
+                if errno in allowed_errnos:
+                    USB_ERRORS_IGNORED.labels(label, errno).inc()
                     print(f"[warn] {label}: {exc}; ignoring")
                     return None
                 raise
@@ -0,0 +1,235 @@
+import math
+import threading
+import time
+from typing import List, Optional
+
+import numpy as np
+import state
+from erg_service import find_trainer_session, submit_erg_target
+from fastapi import HTTPException
+from recorder import recorder
+from stream import live_stream
+
+TICK_SECONDS = 1.0
+STREAM_NAME = "workout"
+
+
+class CompiledWorkout:
+    def __init__(self, steps: List[dict]):
+        fractions = []
+        step_index = []
+        self.step_starts: List[int] = []
+        self.steps = steps
+        offset = 0
+        for index, step in enumerate(steps):
+            duration = max(int(step.get("duration") or 0), 0)
+            self.step_starts.append(offset)
+            progressive = step.get("progressive_range")
+            if progressive:
+                fractions.append(
+                    np.linspace(
+                        progressive["from"] / 100, progressive["to"] / 100, duration,
+                        dtype=np.float32,
+                    )
+                )
+            else:
+                # NaN marks free-ride seconds: no power target, trainer released
+                percent = step.get("ftp_percent")
+                fraction = np.nan if percent is None else percent / 100
+                fractions.append(np.full(duration, fraction, dtype=np.float32))
+            step_index.append(np.full(duration, index, dtype=np.int32))
+            offset += duration
+
+        # one row per second of the workout: target as a fraction of FTP and
+        # the step it belongs to, so any lookup is a single index
+        self.ftp_fraction = np.concatenate(fractions) if fractions else np.zeros(0, np.float32)
+        self.step_index = np.concatenate(step_index) if step_index else np.zeros(0, np.int32)
+        self.total = offset
+
+    def target_at(self, elapsed: float, ftp: int) -> Optional[int]:
+        second = int(elapsed)
+        if second < 0 or second >= self.total:
+            return None
+        fraction = float(self.ftp_fraction[second])
+        return None if math.isnan(fraction) else int(round(fraction * ftp))
+
+    def free_ride_at(self, elapsed: float) -> bool:
+        second = int(elapsed)
+        return 0 <= second < self.total and math.isnan(float(self.ftp_fraction[second]))
+
+    def step_at(self, elapsed: float) -> int:
+        second = min(max(int(elapsed), 0), self.total - 1)
+        return int(self.step_index[second])
+
+
+class WorkoutEngine:
+    def __init__(self):
+        self.workout: Optional[CompiledWorkout] = None
+        self.trainer: Optional[str] = None
+        self.status = "idle"
+        self._lock = threading.RLock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._anchor = 0.0  # monotonic time at which elapsed == 0
+        self._paused_elapsed = 0.0
+        self._last_target: Optional[int] = None
+        # whether _last_target reached the trainer (None then means released)
+        self._target_sent = False
+
+    def load(self, steps: List[dict], trainer: Optional[str] = None) -> dict:
+        compiled = CompiledWorkout(steps)
+        if compiled.total == 0:
+            raise HTTPException(status_code=400, detail="Workout has no duration")
+        with self._lock:
+            self._stop_thread()
+            self.workout = compiled
+            self.trainer = trainer
+            self.status = "ready"
+            self._paused_elapsed = 0.0
+            self._last_target = None
+            self._target_sent = False
+        return self.progress()
+
+    def _require_workout(self) -> CompiledWorkout:
+        if self.workout is None:
+            raise HTTPException(status_code=400, detail="No workout loaded")
+        return self.workout
+
+    def elapsed(self) -> float:
+        if self.status == "running":
+            return time.monotonic() - self._anchor
+        return self._paused_elapsed
+
+    def start(self) -> dict:
+        with self._lock:
+            self._require_workout()
+            self._stop_thread()
+            self._paused_elapsed = 0.0
+            self._run_from(0.0)
+        return self.progress()
+
+    def pause(self) -> dict:
+        with self._lock:
+            if self.status == "running":
+                self._paused_elapsed = self.elapsed()
+                self.status = "paused"
+                self._stop_thread()
+        return self.progress()
+
+    def resume(self) -> dict:
+        with self._lock:
+            if self.status == "paused":
+                self._run_from(self._paused_elapsed)
+        return self.progress()
+
+    def stop(self) -> dict:
+        with self._lock:
+            self._stop_thread()
+            if self.workout is not None:
+                self.status = "ready"
+            self._paused_elapsed = 0.0
+        return self.progress()
+
+    def skip(self) -> dict:
+        with self._lock:
+            workout = self._require_workout()
+            elapsed = self.elapsed()
+            index = workout.step_at(elapsed) + 1
+            target = workout.step_starts[index] if index < len(workout.step_starts) else workout.total
+            if self.status == "running":
+                self._anchor -= target - elapsed
+                self._wake.set()
+            else:
+                self._paused_elapsed = float(target)
+        return self.progress()
+
+    def set_ftp(self, ftp_watts: int) -> dict:
+        if ftp_watts <= 0:
+            raise HTTPException(status_code=400, detail="FTP must be a positive integer")
+        state.ftp = ftp_watts
+        self._wake.set()
+        return self.progress()
+
+    def _run_from(self, elapsed: float) -> None:
+        self._anchor = time.monotonic() - elapsed
+        self._last_target = None
+        self._target_sent = False
+        self.status = "running"
+        self._wake.clear()
+        self._thread = threading.Thread(target=self._loop, name="workout-engine", daemon=True)
+        self._thread.start()
+
+    def _stop_thread(self) -> None:
+        # the loop exits as soon as it notices it is no longer the active thread
+        if self._thread is not None:
+            self._thread = None
+            self._wake.set()
+
+    def _loop(self) -> None:
+        me = threading.current_thread()
+        tick = 0
+        while self._thread is me:
+            self._on_tick()
+            if self.status != "running":
+                return
+            # absolute deadlines on the monotonic clock: a late wakeup never
+            # pushes later ticks back, so the schedule cannot drift
+            tick = max(tick + 1, int(self.elapsed() / TICK_SECONDS) + 1)
+            delay = self._anchor + tick * TICK_SECONDS - time.monotonic()
+            if self._wake.wait(max(delay, 0.0)):
+                self._wake.clear()
+                tick = int(self.elapsed() / TICK_SECONDS)
+
+    def _on_tick(self) -> None:
+        with self._lock:
+            workout = self.workout
+            if self._thread is not threading.current_thread() or workout is None:
+                return
+            elapsed = self.elapsed()
+            if elapsed >= workout.total:
+                self._paused_elapsed = float(workout.total)
+                self.status = "finished"
+                self._thread = None
+            target = workout.target_at(elapsed, state.ftp)
+            free_ride = workout.free_ride_at(elapsed)
+            recorder.set_workout_position(workout.step_at(elapsed), target)
+
+        # a free-ride second submits None, which hands the trainer back to
+        # resistance mode instead of holding a made-up ERG target
+        if (target is not None or free_ride) and (not self._target_sent or target != self._last_target):
+            try:
+                session = find_trainer_session(self.trainer)
+            except HTTPException:
+                session = None  # trainer dropped out; keep the clock running
+            if session is not None:
+                submit_erg_target(session, target)
+                self._last_target = target
+                self._target_sent = True
+        live_stream.publish(STREAM_NAME, self.progress())
+
+    def progress(self) -> dict:
+        workout = self.workout
+        if workout is None:
+            return {"status": self.status}
+        elapsed = min(self.elapsed(), float(workout.total))
+        index = workout.step_at(elapsed)
+        step = workout.steps[index]
+        step_start = workout.step_starts[index]
+        step_end = step_start + int(step.get("duration") or 0)
+        return {
+            "status": self.status,
+            "elapsed": round(elapsed, 3),
+            "total": workout.total,
+            "step_index": index,
+            "step_count": len(workout.steps),
+            "step_elapsed": round(elapsed - step_start, 3),
+            "step_remaining": round(max(step_end - elapsed, 0.0), 3),
+            "target_watts": workout.target_at(elapsed, state.ftp),
+            "free_ride": workout.free_ride_at(elapsed),
+            "target_rpm": step.get("rpm"),
+            "ftp": state.ftp,
+            "trainer": self.trainer,
+        }
+
+
+engine = WorkoutEngine()
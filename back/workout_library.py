@@ -0,0 +1,220 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from fastapi import HTTPException
+from paths import DATA_DIR
+from ride_metrics import NP_WINDOW_SECONDS, POWER_ZONE_BOUNDS
+from workout_engine import CompiledWorkout
+
+_REPO_DIR = Path(__file__).resolve().parent.parent
+WORKOUT_DIR_CANDIDATES = [
+    _REPO_DIR / "scrapping" / "workouts",
+    _REPO_DIR / "front" / "src" / "constants" / "workouts",
+]
+INDEX_PATH = DATA_DIR / "workout_index.json"
+INDEX_VERSION = 2
+REFRESH_INTERVAL_SECONDS = 10.0
+
+ZONE_BOUNDS = np.array(POWER_ZONE_BOUNDS)
+SORT_KEYS = ("name", "duration", "tss", "intensity_factor", "step_count", "max_ramp")
+
+
+def default_workout_dir() -> Path:
+    override = os.environ.get("WORKOUTS_DIR")
+    if override:
+        return Path(override).expanduser()
+    for candidate in WORKOUT_DIR_CANDIDATES:
+        if candidate.is_dir():
+            return candidate
+    return WORKOUT_DIR_CANDIDATES[0]
+
+
+def workout_metadata(steps: List[dict]) -> dict:
+    compiled = CompiledWorkout(steps)
+    duration = compiled.total
+    # free-ride seconds (NaN) have no target and stay out of IF, TSS and zones
+    fractions = compiled.ftp_fraction.astype(np.float64)
+    structured = fractions[~np.isnan(fractions)]
+    free_ride_seconds = duration - len(structured)
+    if len(structured) == 0:
+        return {"duration": duration, "step_count": len(steps), "intensity_factor": 0.0, "tss": 0.0,
+                "zone_seconds": [0] * (len(ZONE_BOUNDS) + 1), "dominant_zone": None, "max_ramp": 0.0,
+                "free_ride_seconds": free_ride_seconds}
+
+    # normalized power over the target trace, expressed directly as IF
+    if len(structured) >= NP_WINDOW_SECONDS:
+        cumulative = np.concatenate(([0.0], np.cumsum(structured)))
+        rolling = (cumulative[NP_WINDOW_SECONDS:] - cumulative[:-NP_WINDOW_SECONDS]) / NP_WINDOW_SECONDS
+    else:
+        rolling = np.array([structured.mean()])
+    intensity_factor = float(np.mean(rolling ** 4) ** 0.25)
+    zone_seconds = np.bincount(
+        np.searchsorted(ZONE_BOUNDS, structured, side="left"), minlength=len(ZONE_BOUNDS) + 1
+    )
+    # ramps between consecutive targeted seconds of the trace
+    ramps = np.abs(np.diff(fractions))
+    ramps = ramps[~np.isnan(ramps)]
+    return {
+        "duration": duration,
+        "step_count": len(steps),
+        "intensity_factor": round(intensity_factor, 3),
+        "tss": round(len(structured) / 3600 * intensity_factor ** 2 * 100, 1),
+        "zone_seconds": zone_seconds.tolist(),
+        "dominant_zone": int(np.argmax(zone_seconds)) + 1,
+        # largest second-to-second change in target, in % FTP
+        "max_ramp": round(float(ramps.max()) * 100, 1) if len(ramps) else 0.0,
+        "free_ride_seconds": free_ride_seconds,
+    }
+
+
+class WorkoutLibrary:
+    def __init__(self, directory: Optional[Path] = None, index_path: Path = INDEX_PATH):
+        self.directory = directory or default_workout_dir()
+        self.index_path = index_path
+        self._lock = threading.Lock()
+        self._entries: Optional[Dict[str, dict]] = None
+        self._sorted: Dict[str, List[dict]] = {}
+        self._checked_at = 0.0
+
+    def _load_index(self) -> Dict[str, dict]:
+        try:
+            data = json.loads(self.index_path.read_text())
+        except (OSError, ValueError):
+            return {}
+        if data.get("version") != INDEX_VERSION or data.get("directory") != str(self.directory):
+            return {}
+        return {entry["name"]: entry for entry in data["workouts"]}
+
+    def _save_index(self, entries: Dict[str, dict]) -> None:
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_path.with_suffix(".json.tmp")
+        tmp_path.write_text(
+            json.dumps(
+                {"version": INDEX_VERSION, "directory": str(self.directory),
+                 "workouts": list(entries.values())},
+                separators=(",", ":"),
+            )
+        )
+        os.replace(tmp_path, self.index_path)
+
+    def refresh(self, force: bool = False) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            if not force and self._entries is not None and now - self._checked_at < REFRESH_INTERVAL_SECONDS:
+                return {"rebuilt": 0, "removed": 0, "total": len(self._entries)}
+            self._checked_at = now
+
+            entries = self._entries if self._entries is not None else self._load_index()
+            seen = set()
+            rebuilt = 0
+            if self.directory.is_dir():
+                with os.scandir(self.directory) as listing:
+                    for item in listing:
+                        if not item.name.endswith(".json") or not item.is_file():
+                            continue
+                        name = item.name[: -len(".json")]
+                        seen.add(name)
+                        stat = item.stat()
+                        current = entries.get(name)
+                        if current and current["mtime_ns"] == stat.st_mtime_ns and current["size"] == stat.st_size:
+                            continue
+                        try:
+                            steps = json.loads(Path(item.path).read_text())
+                        except (OSError, ValueError):
+                            continue
+                        # valid JSON that is not a list of steps is skipped like
+                        # an unreadable file rather than failing every query
+                        if not isinstance(steps, list) or not all(isinstance(step, dict) for step in steps):
+                            continue
+                        try:
+                            metadata = workout_metadata(steps)
+                        except (TypeError, ValueError, KeyError):
+                            continue
+                        entries[name] = {
+                            "name": name,
+                            "title": name.replace("-", " ").replace("_", " ").title(),
+                            "mtime_ns": stat.st_mtime_ns,
+                            "size": stat.st_size,
+                            **metadata,
+                        }
+                        rebuilt += 1
+
+            removed = [name for name in entries if name not in seen]
+            for name in removed:
+                del entries[name]
+            if rebuilt or removed or self._entries is None:
+                self._sorted = {}
+                if rebuilt or removed:
+                    self._save_index(entries)
+            self._entries = entries
+            return {"rebuilt": rebuilt, "removed": len(removed), "total": len(entries)}
+
+    def _sorted_by(self, key: str) -> List[dict]:
+        # under the lock: refresh() updates _entries in place and resets _sorted
+        with self._lock:
+            ordered = self._sorted.get(key)
+            if ordered is None:
+                ordered = sorted(self._entries.values(), key=lambda entry: (entry[key], entry["name"]))
+                self._sorted[key] = ordered
+            return ordered
+
+    def query(
+        self,
+        offset: int = 0,
+        limit: int = 50,
+        sort: str = "name",
+        order: str = "asc",
+        q: Optional[str] = None,
+        min_duration: Optional[int] = None,
+        max_duration: Optional[int] = None,
+        max_tss: Optional[float] = None,
+        zone: Optional[int] = None,
+    ) -> dict:
+        if sort not in SORT_KEYS:
+            raise HTTPException(status_code=400, detail=f"sort must be one of {', '.join(SORT_KEYS)}")
+        if order not in ("asc", "desc"):
+            raise HTTPException(status_code=400, detail="order must be asc or desc")
+        if limit <= 0 or limit > 500 or offset < 0:
+            raise HTTPException(status_code=400, detail="Invalid offset/limit")
+
+        self.refresh()
+        ordered = self._sorted_by(sort)
+        if order == "desc":
+            ordered = ordered[::-1]
+        needle = q.lower() if q else None
+        matches = [
+            entry
+            for entry in ordered
+            if (needle is None or needle in entry["title"].lower() or needle in entry["name"].lower())
+            and (min_duration is None or entry["duration"] >= min_duration)
+            and (max_duration is None or entry["duration"] <= max_duration)
+            and (max_tss is None or entry["tss"] <= max_tss)
+            and (zone is None or entry["dominant_zone"] == zone)
+        ]
+        return {
+            "total": len(matches),
+            "offset": offset,
+            "limit": limit,
+            "items": matches[offset: offset + limit],
+        }
+
+    def steps(self, name: str) -> List[dict]:
+        path = self.directory / f"{name}.json"
+        if "/" in name or "\\" in name or not path.is_file():
+            raise HTTPException(status_code=404, detail="Unknown workout")
+        return json.loads(path.read_text())
+
+    def get(self, name: str) -> dict:
+        self.refresh()
+        entry = self._entries.get(name)
+        if entry is None:
+            raise HTTPException(status_code=404, detail="Unknown workout")
+        return {**entry, "steps": self.steps(name)}
+
+
+library = WorkoutLibrary()
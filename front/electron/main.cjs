@@ -33,7 +33,7 @@ async function waitForHealth(port, timeoutMs = 10000) {
   const start = Date.now()
   while (Date.now() - start < timeoutMs) {
     if (await checkHealth(port)) return true
-    await new Promise((resolve) => setTimeout(resolve, 300))
+    await new Promise((resolve) => setTimeout(resolve, 100))
   }
   return false
 }
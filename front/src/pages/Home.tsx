@@ -188,55 +188,57 @@ export default function Home() {
     safeStep && (safeStep.ftp_percent != null || safeStep.progressive_range)
 
   useEffect(() => {
-    let isMounted = true
-
-    const fetchSensorData = async () => {
-      try {
-        const response = await fetch(`${API_BASE_URL}/sensors/data`)
-        if (!response.ok) {
-          throw new Error(`Failed to fetch sensor data (${response.status})`)
+    // Latest reading per sensor; the backend pushes one sensor at a time
+    const sensorReadings: Record<string, any> = {}
+
+    const applyReadings = () => {
+      let nextPower: number | null = null
+      let nextCadence: number | null = null
+      let nextHeartRate: number | null = null
+      let nextTrainerSensor: string | null = null
+
+      Object.entries(sensorReadings).forEach(([sensorName, reading]) => {
+        if (typeof reading?.power === 'number') {
+          nextPower = reading.power
+          nextTrainerSensor = sensorName
         }
-        const payload = await response.json()
-        if (!isMounted) return
-
-        const sensorReadings: Record<string, any> = payload?.data ?? {}
-        let nextPower: number | null = null
-        let nextCadence: number | null = null
-        let nextHeartRate: number | null = null
-        let nextTrainerSensor: string | null = null
-
-        Object.entries(sensorReadings).forEach(([sensorName, reading]) => {
-          if (typeof reading?.power === 'number') {
-            nextPower = reading.power
-            nextTrainerSensor = sensorName
-          }
-          if (typeof reading?.cadence === 'number') {
-            nextCadence = reading.cadence
-          }
-          if (typeof reading?.heart_rate === 'number') {
-            nextHeartRate = reading.heart_rate
-          }
-        })
-
-        setCyclingData({
-          power: nextPower,
-          heartRate: nextHeartRate,
-          cadence: nextCadence
-        })
-        if (nextTrainerSensor) {
-          setTrainerSensorName(nextTrainerSensor)
+        if (typeof reading?.cadence === 'number') {
+          nextCadence = reading.cadence
         }
-      } catch (error) {
-        console.error('Failed to load sensor data', error)
+        if (typeof reading?.heart_rate === 'number') {
+          nextHeartRate = reading.heart_rate
+        }
+      })
+
+      setCyclingData({
+        power: nextPower,
+        heartRate: nextHeartRate,
+        cadence: nextCadence
+      })
+      if (nextTrainerSensor) {
+        setTrainerSensorName(nextTrainerSensor)
       }
     }
 
-    fetchSensorData()
-    const interval = setInterval(fetchSensorData, 1000)
+    const source = new EventSource(
+      `${API_BASE_URL}/sensors/stream?rates=FitnessEquipment:4,PowerMeter:4,HeartRate:1`
+    )
+    source.addEventListener('sample', (event) => {
+      try {
+        const payload = JSON.parse((event as MessageEvent).data)
+        sensorReadings[payload.sensor] = payload.data
+        applyReadings()
+      } catch (error) {
+        console.error('Failed to parse sensor data', error)
+      }
+    })
+    source.onerror = (error) => {
+      // EventSource reconnects on its own
+      console.error('Sensor stream interrupted', error)
+    }
 
     return () => {
-      isMounted = false
-      clearInterval(interval)
+      source.close()
     }
   }, [setCyclingData, setTrainerSensorName])
 
@@ -0,0 +1,100 @@
+import argparse
+import email.utils
+import hashlib
+import json
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict
+
+from bench_workout import synthetic_texts
+from training_scrapper import scrape_urls
+
+# Offline harness: serves generated collection pages from localhost with
+# ETag/Last-Modified support, then scrapes them cold and warm.
+
+
+def build_fixtures(pages: int, workouts_per_page: int) -> Dict[str, bytes]:
+    texts = iter(synthetic_texts(pages * workouts_per_page, steps=20))
+    fixtures = {}
+    for page in range(pages):
+        articles = []
+        for index in range(workouts_per_page):
+            bars = "".join(
+                f'<div class="textbar">{line}</div>' for line in next(texts).splitlines()
+            )
+            articles.append(f'<article id="plan-{page}-{index}">{bars}</article>')
+        fixtures[f"/plans/{page}"] = (
+            f"<html><body>{''.join(articles)}</body></html>".encode("utf-8")
+        )
+    return fixtures
+
+
+def make_handler(fixtures: Dict[str, bytes], latency: float):
+    modified = email.utils.formatdate(time.time() - 3600, usegmt=True)
+    etags = {path: f'"{hashlib.md5(body).hexdigest()}"' for path, body in fixtures.items()}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency)
+            body = fixtures.get(self.path)
+            if body is None:
+                self.send_error(404)
+                return
+            if self.headers.get("If-None-Match") == etags[self.path]:
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("ETag", etags[self.path])
+            self.send_header("Last-Modified", modified)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def timed(label: str, **kwargs) -> dict:
+    started = time.perf_counter()
+    totals = scrape_urls(**kwargs)
+    return {"run": label, "seconds": round(time.perf_counter() - started, 3), **totals}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline bulk scraper benchmark")
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--workouts-per-page", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="simulated server latency")
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    fixtures = build_fixtures(args.pages, args.workouts_per_page)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(fixtures, args.latency_ms / 1000))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    urls = [base + path for path in fixtures]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        out_dir = Path(tmp) / "workouts"
+        cache_path = Path(tmp) / "cache.json"
+        report = [
+            timed("serial_no_cache", urls=urls, out_dir=Path(tmp) / "serial", workers=1),
+            timed("pooled_cold", urls=urls, out_dir=out_dir, workers=args.workers, cache_path=cache_path),
+            timed("pooled_warm", urls=urls, out_dir=out_dir, workers=args.workers, cache_path=cache_path),
+        ]
+    server.shutdown()
+
+    print(json.dumps(report, indent=2))
+    if report[2]["written"] != 0:
+        raise SystemExit("warm run rewrote workouts that had not changed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+import argparse
+import json
+import os
+import random
+import re
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from workout import parse_many
+
+FRONT_WORKOUTS = Path(__file__).resolve().parent.parent / "front" / "src" / "constants" / "workouts"
+
+
+def legacy_parse(raw_text: str) -> List[Dict]:
+    # the previous two-pass implementation, kept here as the reference output
+    def parse_duration(duration_str: str) -> int:
+        match = re.match(r'(\d+)(min|sec)', duration_str)
+        if match:
+            value, unit = match.groups()
+            return int(value) * 60 if unit == 'min' else int(value)
+        return 0
+
+    progressive_pattern = re.compile(
+        r'(?P<duration>\d+(?:min|sec))\s+from\s+'
+        r'(?P<from_ftp>\d+)\s*to\s*(?P<to_ftp>\d+)\s*%\s*FTP',
+        re.IGNORECASE
+    )
+    step_pattern = re.compile(
+        r'(?P<duration>\d+(?:min|sec))\s*'
+        r'(?:@\s*(?P<rpm>\d+)\s*rpm)?\s*,?\s*'
+        r'(?P<ftp>\d+)\s*%\s*FTP',
+        re.IGNORECASE
+    )
+    all_matches = []
+    for match in progressive_pattern.finditer(raw_text):
+        all_matches.append((match.start(), {
+            "ftp_percent": None,
+            "duration": parse_duration(match.group("duration")),
+            "rpm": None,
+            "progressive_range": {
+                "from": int(match.group("from_ftp")),
+                "to": int(match.group("to_ftp")),
+            },
+        }))
+    for match in step_pattern.finditer(raw_text):
+        if progressive_pattern.match(raw_text[match.start():match.end()]):
+            continue
+        all_matches.append((match.start(), {
+            "ftp_percent": int(match.group("ftp")),
+            "duration": parse_duration(match.group("duration")),
+            "rpm": int(match.group("rpm")) if match.group("rpm") else None,
+            "progressive_range": None,
+        }))
+    all_matches.sort(key=lambda x: x[0])
+    return [step for _, step in all_matches]
+
+
+def _format_duration(seconds: int) -> str:
+    if seconds % 60 == 0 and seconds:
+        return f"{seconds // 60}min"
+    return f"{seconds}sec"
+
+
+def render_steps(steps: List[Dict]) -> str:
+    # the textbar wording whatsonzwift pages use
+    lines = []
+    for step in steps:
+        duration = _format_duration(step["duration"])
+        ramp = step.get("progressive_range")
+        if ramp:
+            lines.append(f"{duration} from {ramp['from']} to {ramp['to']}% FTP")
+        elif step.get("rpm"):
+            lines.append(f"{duration} @ {step['rpm']}rpm, {step['ftp_percent']}% FTP")
+        elif step.get("ftp_percent") is not None:
+            lines.append(f"{duration} @ {step['ftp_percent']}% FTP")
+    return "\n".join(lines)
+
+
+def real_texts() -> List[str]:
+    return [
+        render_steps(json.loads(path.read_text()))
+        for path in sorted(FRONT_WORKOUTS.glob("*.json"))
+    ]
+
+
+def synthetic_texts(count: int, steps: int, seed: int = 7) -> List[str]:
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(count):
+        lines = []
+        for _ in range(steps):
+            duration = rng.choice(["30sec", "1min", "2min", "5min", "10min", "15sec"])
+            kind = rng.random()
+            if kind < 0.2:
+                lines.append(f"{duration} from {rng.randint(40, 80)} to {rng.randint(60, 120)}% FTP")
+            elif kind < 0.5:
+                lines.append(f"{duration} @ {rng.randint(60, 120)}rpm, {rng.randint(40, 150)}% FTP")
+            else:
+                lines.append(f"{duration} @ {rng.randint(40, 150)}% FTP")
+        texts.append("\n".join(lines))
+    return texts
+
+
+def _throughput(label: str, texts: List[str], parse) -> Dict:
+    started = time.perf_counter()
+    results = parse(texts)
+    elapsed = time.perf_counter() - started
+    return {
+        "parser": label,
+        "workouts": len(texts),
+        "seconds": round(elapsed, 4),
+        "workouts_per_s": round(len(texts) / elapsed, 1),
+    }, results
+
+
+def bench(name: str, texts: List[str], processes: int) -> Dict:
+    legacy, expected = _throughput("legacy", texts, lambda ts: [legacy_parse(t) for t in ts])
+    single, got = _throughput("single_pass", texts, parse_many)
+    runs = [legacy, single]
+    identical = got == expected
+    if processes > 1:
+        pooled, pooled_got = _throughput(
+            f"pool_{processes}", texts, lambda ts: parse_many(ts, processes=processes)
+        )
+        runs.append(pooled)
+        identical = identical and pooled_got == expected
+    return {"corpus": name, "identical_output": identical, "runs": runs}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark workout text parsing")
+    parser.add_argument("--synthetic", type=int, default=5000, help="synthetic workouts")
+    parser.add_argument("--steps", type=int, default=40, help="steps per synthetic workout")
+    parser.add_argument("--repeat-real", type=int, default=50, help="times to repeat the real corpus")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    report = [
+        bench("real", real_texts() * args.repeat_real, args.processes),
+        bench("synthetic", synthetic_texts(args.synthetic, args.steps), args.processes),
+    ]
+    print(json.dumps(report, indent=2))
+    if not all(entry["identical_output"] for entry in report):
+        raise SystemExit("single-pass parser output differs from the legacy parser")
+
+
+if __name__ == "__main__":
+    main()
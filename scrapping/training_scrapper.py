@@ -1,38 +1,117 @@
 import argparse
+import hashlib
 import json
+import os
 import re
+import tempfile
+import threading
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Dict, Iterable, List, Optional
 
 import requests
 from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
 
 from workout import Workout
 
+CACHE_FILE_NAME = ".scrape_cache.json"
+
 
 def slugify(value: str) -> str:
     cleaned = re.sub(r"[^A-Za-z0-9_-]+", "_", value.strip().lower())
     return cleaned.strip("_") or "workout"
 
-def main() -> None:
-    parser = argparse.ArgumentParser(
-        description="Scrape workout steps from a What's On Zwift page."
-    )
-    parser.add_argument("url", help="Workout URL to scrape")
-    parser.add_argument(
-        "--out-dir",
-        default=str(Path(__file__).resolve().parent / "workouts"),
-        help="Directory to write workout JSON files",
-    )
-    args = parser.parse_args()
 
-    out_dir = Path(args.out_dir)
-    out_dir.mkdir(parents=True, exist_ok=True)
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def atomic_write(path: Path, data: bytes) -> None:
+    # write next to the target and rename so readers never see a partial file
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            handle.write(data)
+        os.replace(tmp_name, path)
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
 
-    response = requests.get(args.url, timeout=15)
+
+class ScrapeCache:
+    # url -> {"etag", "last_modified", "sha256"} and output file -> content hash
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            data = json.loads(path.read_text())
+        except (OSError, ValueError):
+            data = {}
+        self.pages: Dict[str, dict] = data.get("pages", {})
+        self.files: Dict[str, str] = data.get("files", {})
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        entry = self.pages.get(url, {})
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def page_unchanged(self, url: str, digest: str) -> bool:
+        with self._lock:
+            return self.pages.get(url, {}).get("sha256") == digest
+
+    def file_unchanged(self, path: Path, digest: str) -> bool:
+        with self._lock:
+            return self.files.get(str(path)) == digest and path.exists()
+
+    def commit(
+        self, url: str, response: requests.Response, digest: str, files: Dict[Path, str]
+    ) -> None:
+        # only once every file of the page is on disk, so a failed page is
+        # fetched and extracted again on the next run
+        with self._lock:
+            self.pages[url] = {
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "sha256": digest,
+            }
+            for path, file_digest in files.items():
+                self.files[str(path)] = file_digest
+
+    def save(self) -> None:
+        with self._lock:
+            payload = json.dumps({"pages": self.pages, "files": self.files}, indent=1)
+        atomic_write(self.path, payload.encode("utf-8"))
+
+
+def make_session(workers: int) -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def sitemap_urls(session: requests.Session, sitemap_url: str, match: Optional[str] = None) -> List[str]:
+    response = session.get(sitemap_url, timeout=15)
     response.raise_for_status()
-    soup = BeautifulSoup(response.text, "html.parser")
+    root = ET.fromstring(response.content)
+    urls = [
+        loc.text.strip()
+        for loc in root.iter()
+        if loc.tag.endswith("loc") and loc.text
+    ]
+    return [url for url in urls if not match or match in url]
 
-    created = 0
+
+def extract_workouts(html: str) -> Dict[str, List[dict]]:
+    soup = BeautifulSoup(html, "html.parser")
+    workouts = {}
     for article in soup.select("article[id]"):
         article_id = article["id"].strip()
 
@@ -41,16 +120,114 @@ def main() -> None:
             continue
 
         steps = [tb.get_text(" ", strip=True) for tb in textbars]
-        workout = Workout("\n".join(steps))
+        workouts[slugify(article_id)] = Workout("\n".join(steps)).to_list()
+    return workouts
+
 
-        output_path = out_dir / f"{slugify(article_id)}.json"
-        with output_path.open("w", encoding="utf-8") as handle:
-            json.dump(workout.to_list(), handle, indent=2, ensure_ascii=True)
-            handle.write("\n")
-        created += 1
+def scrape_url(
+    session: requests.Session, url: str, out_dir: Path, cache: Optional[ScrapeCache]
+) -> Dict[str, int]:
+    stats = {"pages": 1, "not_modified": 0, "unchanged_pages": 0, "written": 0, "skipped": 0}
+    headers = cache.conditional_headers(url) if cache else {}
+    response = session.get(url, timeout=15, headers=headers)
+    if response.status_code == 304:
+        stats["not_modified"] = 1
+        return stats
+    response.raise_for_status()
+
+    page_digest = _sha256(response.content)
+    if cache and cache.page_unchanged(url, page_digest):
+        stats["unchanged_pages"] = 1
+        return stats
+
+    files = {}
+    for slug, steps in extract_workouts(response.text).items():
+        output_path = out_dir / f"{slug}.json"
+        payload = (json.dumps(steps, indent=2, ensure_ascii=True) + "\n").encode("utf-8")
+        digest = files[output_path] = _sha256(payload)
+        if cache and cache.file_unchanged(output_path, digest):
+            stats["skipped"] += 1
+            continue
+        atomic_write(output_path, payload)
+        stats["written"] += 1
         print(f"Wrote {output_path}")
+    if cache:
+        cache.commit(url, response, page_digest, files)
+    return stats
+
+
+def scrape_urls(
+    urls: Iterable[str],
+    out_dir: Path,
+    workers: int = 8,
+    cache_path: Optional[Path] = None,
+    session: Optional[requests.Session] = None,
+) -> Dict[str, int]:
+    out_dir.mkdir(parents=True, exist_ok=True)
+    cache = ScrapeCache(cache_path) if cache_path else None
+    session = session or make_session(workers)
+    totals = {"pages": 0, "not_modified": 0, "unchanged_pages": 0, "written": 0, "skipped": 0, "failed": 0}
+
+    def run(url: str) -> Dict[str, int]:
+        try:
+            return scrape_url(session, url, out_dir, cache)
+        except (requests.RequestException, ValueError, OSError) as exc:
+            print(f"Failed {url}: {exc}")
+            return {"pages": 1, "failed": 1}
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for stats in pool.map(run, dict.fromkeys(urls)):
+                for key, value in stats.items():
+                    totals[key] += value
+    finally:
+        if cache:
+            cache.save()
+    return totals
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Scrape workout steps from What's On Zwift pages."
+    )
+    parser.add_argument("urls", nargs="*", help="Workout URLs to scrape")
+    parser.add_argument("--urls-file", help="File with one URL per line")
+    parser.add_argument("--sitemap", help="Sitemap URL to read workout pages from")
+    parser.add_argument("--match", help="Only keep sitemap URLs containing this text")
+    parser.add_argument(
+        "--out-dir",
+        default=str(Path(__file__).resolve().parent / "workouts"),
+        help="Directory to write workout JSON files",
+    )
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent requests")
+    parser.add_argument(
+        "--no-cache", action="store_true", help="Ignore and do not update the HTTP cache"
+    )
+    args = parser.parse_args()
+
+    out_dir = Path(args.out_dir)
+    session = make_session(args.workers)
 
-    print(f"Done. Wrote {created} workouts to {out_dir}")
+    urls = list(args.urls)
+    if args.urls_file:
+        urls.extend(
+            line.strip()
+            for line in Path(args.urls_file).read_text().splitlines()
+            if line.strip() and not line.startswith("#")
+        )
+    if args.sitemap:
+        urls.extend(sitemap_urls(session, args.sitemap, args.match))
+    if not urls:
+        parser.error("no URLs given (pass URLs, --urls-file or --sitemap)")
+
+    cache_path = None if args.no_cache else out_dir / CACHE_FILE_NAME
+    totals = scrape_urls(urls, out_dir, args.workers, cache_path, session)
+
+    print(
+        f"Done. Wrote {totals['written']} workouts to {out_dir} "
+        f"({totals['pages']} pages, {totals['not_modified'] + totals['unchanged_pages']} unchanged, "
+        f"{totals['skipped']} workouts unchanged, {totals['failed']} failed)"
+    )
 
 
 if __name__ == "__main__":
@@ -1,5 +1,6 @@
 import re
-from typing import Dict, List, Optional
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional
 
 
 class Step:
@@ -23,71 +24,78 @@ class Step:
             "progressive_range": self.progressive_range
         }
 
+
+# Progressive ramps are tried first at every position so a ramp is never
+# mistaken for a steady step; one scan yields steps already in text order.
+_STEP_TOKEN = re.compile(
+    r'(?P<ramp_value>\d+)(?P<ramp_unit>min|sec)\s+from\s+'
+    r'(?P<from_ftp>\d+)\s*to\s*(?P<to_ftp>\d+)\s*%\s*FTP'
+    r'|'
+    r'(?P<value>\d+)(?P<unit>min|sec)\s*'
+    r'(?:@\s*(?P<rpm>\d+)\s*rpm)?\s*,?\s*'
+    r'(?P<ftp>\d+)\s*%\s*FTP',
+    re.IGNORECASE
+)
+
+_UNIT_SECONDS = {'min': 60, 'sec': 1}
+
+
+def _duration_seconds(value: str, unit: str) -> int:
+    # units are matched case-insensitively but only lowercase ones carry a
+    # duration, as with the original `(\d+)(min|sec)` parsing
+    return int(value) * _UNIT_SECONDS.get(unit, 0)
+
+
 class Workout:
     def __init__(self, raw_text: str):
         self.raw_text = raw_text
         self.steps: List[Step] = []
         self._parse()
 
-    def _parse_duration(self, duration_str: str) -> int:
-        match = re.match(r'(\d+)(min|sec)', duration_str)
-        if match:
-            value, unit = match.groups()
-            return int(value) * 60 if unit == 'min' else int(value)
-        return 0
-
     def _parse(self):
-        progressive_pattern = re.compile(
-            r'(?P<duration>\d+(?:min|sec))\s+from\s+'
-            r'(?P<from_ftp>\d+)\s*to\s*(?P<to_ftp>\d+)\s*%\s*FTP',
-            re.IGNORECASE
-        )
-
-        step_pattern = re.compile(
-            r'(?P<duration>\d+(?:min|sec))\s*'
-            r'(?:@\s*(?P<rpm>\d+)\s*rpm)?\s*,?\s*'
-            r'(?P<ftp>\d+)\s*%\s*FTP',
-            re.IGNORECASE
-        )
-
-        all_matches = []
-
-        # Capture progressive steps with their position
-        for match in progressive_pattern.finditer(self.raw_text):
-            duration = self._parse_duration(match.group("duration"))
-            step = Step(
-                ftp_percent=None,
-                duration_sec=duration,
-                rpm=None,
-                progressive_range={
-                    "from": int(match.group("from_ftp")),
-                    "to": int(match.group("to_ftp")),
-                },
-            )
-            all_matches.append((match.start(), step))
-
-        # Capture regular steps with position
-        for match in step_pattern.finditer(self.raw_text):
-            # Skip if it overlaps with a progressive pattern
-            if progressive_pattern.match(self.raw_text[match.start():match.end()]):
-                continue
-
-            ftp = int(match.group("ftp"))
-            duration = self._parse_duration(match.group("duration"))
-            rpm = int(match.group("rpm")) if match.group("rpm") else None
-            step = Step(
-                ftp_percent=ftp,
-                duration_sec=duration,
-                rpm=rpm,
-            )
-            all_matches.append((match.start(), step))
-
-        # Sort all steps by original text position
-        all_matches.sort(key=lambda x: x[0])
-        self.steps = [step for _, step in all_matches]
+        steps = []
+        for match in _STEP_TOKEN.finditer(self.raw_text):
+            if match.group('ramp_value') is not None:
+                steps.append(Step(
+                    ftp_percent=None,
+                    duration_sec=_duration_seconds(
+                        match.group('ramp_value'), match.group('ramp_unit')
+                    ),
+                    rpm=None,
+                    progressive_range={
+                        "from": int(match.group("from_ftp")),
+                        "to": int(match.group("to_ftp")),
+                    },
+                ))
+            else:
+                rpm = match.group("rpm")
+                steps.append(Step(
+                    ftp_percent=int(match.group("ftp")),
+                    duration_sec=_duration_seconds(
+                        match.group('value'), match.group('unit')
+                    ),
+                    rpm=int(rpm) if rpm else None,
+                ))
+        self.steps = steps
 
     def to_list(self):
         return [step.to_dict() for step in self.steps]
 
     def get_workout_steps(self):
         return [step.to_dict() for step in self.steps]
+
+
+def _parse_to_list(raw_text: str) -> List[Dict]:
+    return Workout(raw_text).to_list()
+
+
+def parse_many(
+    raw_texts: Iterable[str], processes: Optional[int] = None, chunksize: int = 64
+) -> List[List[Dict]]:
+    # results are plain lists so they cross the process boundary cheaply
+    texts = list(raw_texts)
+    if not processes or processes <= 1 or len(texts) < chunksize:
+        return [_parse_to_list(text) for text in texts]
+
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        return list(pool.map(_parse_to_list, texts, chunksize=chunksize))